@@ -124,7 +124,7 @@ async def ingest_knowledge_base(db: AsyncSession = Depends(get_db)):
         
         # Ingest into vector store
         ingest_result = await data_ingestion_service.ingest_knowledge_to_vector_store(
-            db, knowledge_result["data"]
+            db, knowledge_result["data"], knowledge_result.get("failed_files")
         )
         
         if ingest_result.get("success"):
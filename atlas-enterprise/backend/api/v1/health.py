@@ -12,7 +12,9 @@ from sqlalchemy import text
 from core.database import get_db
 from core.config import settings
 from core.logging import get_logger
+from core.http_client import http_clients
 from schemas.common import HealthResponse
+from services.calculation_audit_writer import calculation_audit_writer
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/health", tags=["health"])
@@ -82,6 +84,35 @@ async def detailed_health_check(db: AsyncSession = Depends(get_db)):
     )
 
 
+@router.get("/audit-queue")
+async def audit_queue_status():
+    """
+    Calculation audit write-behind metrics.
+    
+    Reports queue depth against capacity plus rows and batches written.
+    """
+    return {
+        "success": True,
+        "message": "Calculation audit queue status",
+        "data": calculation_audit_writer.get_stats()
+    }
+
+
+@router.get("/http-clients")
+async def http_client_status():
+    """
+    Outbound HTTP pool metrics.
+    
+    Reports per-host request counts, latency percentiles and pool
+    utilization for the shared integration clients.
+    """
+    return {
+        "success": True,
+        "message": "Outbound HTTP client status",
+        "data": http_clients.get_stats()
+    }
+
+
 @router.get("/ready")
 async def readiness_check(db: AsyncSession = Depends(get_db)):
     """
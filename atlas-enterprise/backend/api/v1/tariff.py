@@ -5,13 +5,26 @@ HTS code search, tariff calculations, and sourcing comparisons.
 
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import os
+import shutil
+import tempfile
+from fastapi import (
+    APIRouter, Depends, HTTPException, Query, Path, Header, Response,
+    UploadFile, File, Form
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db
 from core.logging import get_logger
 from services.tariff_database_service import TariffDatabaseService
 from services.tariff_calculation_engine import TariffCalculationEngine
+from services.tariff_snapshot import tariff_snapshot_service
+from services.landed_cost_cache import landed_cost_cache
+from services.hts_popularity_tracker import hts_popularity_tracker
+from services.manifest_pricing_service import manifest_pricing_service
+from services.real_tariff_service import real_tariff_service
 from schemas.tariff import (
     HTSSearchRequest,
     HTSSearchResponse,
@@ -20,22 +33,47 @@ from schemas.tariff import (
     TariffCalculationResponse,
     SourcingComparisonRequest,
     SourcingComparisonResponse,
+    LandedCostSweepRequest,
+    LandedCostSweepResponse,
+    HTSBatchValidationRequest,
+    HTSLocalRateBatchRequest,
     ChapterSummaryResponse,
-    ChapterSummary
+    ChapterSummary,
+    HTSRollup,
+    HTSRollupResponse
 )
 from schemas.common import SuccessResponse, ErrorResponse
-from api.dependencies import get_current_user
+from api.dependencies import get_current_user, require_admin
 from models.user import User
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/tariff", tags=["tariff"])
 
+_MANIFEST_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Clients must revalidate, which costs a 304 while the data is unchanged
+_ROLLUP_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak If-None-Match comparison against the current ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
 
 @router.get("/hts/search", response_model=HTSSearchResponse)
 async def search_hts_codes(
     query: str = Query(..., description="Search query (code or description)"),
     chapter: Optional[str] = Query(None, description="Filter by chapter (2 digits)"),
     limit: int = Query(20, ge=1, le=100, description="Maximum results to return"),
+    mode: str = Query("prefix", pattern="^(prefix|fulltext)$", description="Search mode"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -45,13 +83,17 @@ async def search_hts_codes(
     - **query**: Search term to find HTS codes
     - **chapter**: Optional chapter filter (e.g., "01", "84")
     - **limit**: Maximum number of results (1-100)
+    - **mode**: "prefix" (default) matches code prefixes and description words,
+      falling back to codes or descriptions containing the query anywhere
+      (e.g. "0110" finds 0101.10...) when nothing matches; "fulltext" for ranked description search
+      supporting stemming, "quoted phrases" and -exclusions
     """
     try:
         start_time = datetime.utcnow()
         
         # Perform search
         hts_codes = await TariffDatabaseService.search_hts_codes(
-            db, query, limit, chapter
+            db, query, limit, chapter, mode
         )
         
         # Convert to response format
@@ -99,6 +141,7 @@ async def get_hts_code(
                 detail=f"HTS code not found: {hts_code}"
             )
         
+        hts_popularity_tracker.record(hts_obj.hts_code)
         response_data = HTSCodeResponse.model_validate(hts_obj)
         
         return SuccessResponse(
@@ -119,18 +162,30 @@ async def get_hts_code(
 
 @router.get("/chapters", response_model=ChapterSummaryResponse)
 async def get_chapters_summary(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get summary of all HTS chapters with code counts.
+    Get summary of all HTS chapters with code counts and MFN rate statistics.
+    
+    Supports conditional requests: send the returned ETag as If-None-Match
+    to get 304 Not Modified while the tariff schedule is unchanged.
     """
     try:
-        chapters_data = await TariffDatabaseService.get_chapters_summary(db)
+        rows, etag = await TariffDatabaseService.get_hts_rollup(db, "chapter")
+        if _etag_matches(if_none_match, etag):
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Cache-Control": _ROLLUP_CACHE_CONTROL}
+            )
         
         response_data = [
-            ChapterSummary(**chapter) for chapter in chapters_data
+            ChapterSummary(chapter=row["code"], **row) for row in rows
         ]
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = _ROLLUP_CACHE_CONTROL
         
         return ChapterSummaryResponse(
             success=True,
@@ -146,6 +201,76 @@ async def get_chapters_summary(
         )
 
 
+@router.get("/rollups/{level}", response_model=HTSRollupResponse)
+async def get_hts_rollup(
+    response: Response,
+    level: str = Path(..., pattern="^(chapter|hts_4|hts_6)$", description="Rollup level"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get code counts and MFN rate min/avg/max per chapter, heading or subheading.
+    
+    - **level**: "chapter", "hts_4" (headings) or "hts_6" (subheadings)
+    
+    Supports If-None-Match / ETag like /tariff/chapters.
+    """
+    try:
+        rows, etag = await TariffDatabaseService.get_hts_rollup(db, level)
+        if _etag_matches(if_none_match, etag):
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Cache-Control": _ROLLUP_CACHE_CONTROL}
+            )
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = _ROLLUP_CACHE_CONTROL
+        
+        return HTSRollupResponse(
+            success=True,
+            message=f"Retrieved {len(rows)} {level} rollups",
+            level=level,
+            data=[HTSRollup(**row) for row in rows]
+        )
+        
+    except Exception as e:
+        logger.error(f"Error getting {level} rollup: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error getting {level} rollup: {str(e)}"
+        )
+
+
+@router.get("/hierarchy")
+@router.get("/hierarchy/{code}")
+async def get_hts_hierarchy_node(
+    code: str = "",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Drill down the HTS tree without touching the database.
+    
+    - **code**: 2, 4, 6, 8 or 10 digits (dots optional); omit for all chapters
+    
+    Returns the node's ancestors, aggregates over every code below it
+    (code count, MFN rate distribution, AD/CVD presence) and its children.
+    """
+    try:
+        node = TariffDatabaseService.get_hierarchy_node(code)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"HTS node not found: {code}")
+    
+    return {
+        "success": True,
+        "message": f"Retrieved {node['level']} node with {len(node['children'])} children",
+        "data": node
+    }
+
+
 @router.post("/calculate", response_model=TariffCalculationResponse)
 async def calculate_tariff(
     request: TariffCalculationRequest,
@@ -174,7 +299,8 @@ async def calculate_tariff(
             insurance_cost=request.insurance_cost,
             other_costs=request.other_costs,
             currency=request.currency,
-            user_id=current_user.id
+            user_id=current_user.id,
+            as_of=request.as_of
         )
         
         if not result["success"]:
@@ -251,6 +377,107 @@ async def compare_sourcing_options(
         )
 
 
+@router.post("/sweep", response_model=LandedCostSweepResponse)
+async def sweep_landed_cost(
+    request: LandedCostSweepRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Price every combination of product value, freight cost and FX shock.
+    
+    - **product_value** / **freight_cost** / **fx_shock**: axis as explicit
+      `values` or `start`/`stop`/`steps`
+    - **format**: "columnar" returns one flat array per cost component in
+      C order over `shape` (product_value, freight_cost, fx_shock);
+      "rows" returns one object per cell
+    """
+    try:
+        result = await TariffCalculationEngine.calculate_landed_cost_sweep(
+            db=db,
+            hts_code=request.hts_code,
+            country_code=request.country_code,
+            product_values=request.product_value.to_values(),
+            freight_costs=request.freight_cost.to_values(),
+            fx_shocks=request.fx_shock.to_values(),
+            quantity=request.quantity,
+            insurance_cost=request.insurance_cost,
+            other_costs=request.other_costs,
+            currency=request.currency,
+            columnar=request.format == "columnar"
+        )
+        
+        if not result["success"]:
+            raise HTTPException(
+                status_code=400,
+                detail=result.get("error", "Sweep failed")
+            )
+        
+        return LandedCostSweepResponse(
+            success=True,
+            message=f"Priced {result['cell_count']} scenarios",
+            data=result
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating landed cost sweep: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error calculating landed cost sweep: {str(e)}"
+        )
+
+
+@router.post("/calculate/manifest")
+async def price_manifest(
+    file: UploadFile = File(..., description="CSV or XLSX shipment manifest"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="Output format"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Price every row of a shipment manifest, streaming results back.
+    
+    - **file**: .csv or .xlsx with a header row; hts_code, country_code and
+      product_value are required, quantity, freight_cost, insurance_cost,
+      other_costs and currency are optional
+    - **format**: "csv" or "ndjson"
+    
+    Rows are read and priced in chunks, so manifests of any length run in
+    constant memory. Each output row carries its data row number, status
+    and error alongside the landed-cost breakdown.
+    """
+    filename = file.filename or "manifest.csv"
+    
+    # The stream outlives this handler, so it prices from its own copy of the upload
+    manifest = tempfile.TemporaryFile()
+    try:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, manifest)
+        manifest.seek(0)
+        missing = await asyncio.to_thread(
+            manifest_pricing_service.missing_columns, manifest, filename
+        )
+    except Exception as e:
+        manifest.close()
+        raise HTTPException(status_code=400, detail=f"Could not read manifest {filename}: {str(e)}")
+    
+    if missing:
+        manifest.close()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Manifest is missing required columns: {', '.join(missing)}"
+        )
+    
+    stem = os.path.splitext(os.path.basename(filename))[0] or "manifest"
+    return StreamingResponse(
+        manifest_pricing_service.stream_priced_manifest(
+            manifest, filename, format, current_user.id
+        ),
+        media_type=_MANIFEST_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{stem}_priced.{format}"'}
+    )
+
+
 @router.get("/popular-codes", response_model=SuccessResponse[List[HTSCodeResponse]])
 async def get_popular_hts_codes(
     limit: int = Query(10, ge=1, le=50, description="Number of codes to return"),
@@ -258,7 +485,7 @@ async def get_popular_hts_codes(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get most popular/frequently used HTS codes.
+    Get the most used HTS codes, ranked by recent lookups and calculations.
     
     - **limit**: Maximum number of codes to return (1-50)
     """
@@ -307,4 +534,178 @@ async def validate_hts_code(
         raise HTTPException(
             status_code=500,
             detail=f"Error validating HTS code: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+
+@router.post("/validate/batch")
+async def validate_hts_codes_batch(
+    request: HTSBatchValidationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Validate and format a list of HTS codes in one request.
+    
+    - **hts_codes**: Up to 100,000 codes
+    - **check_existence**: Also flag codes missing from the active schedule
+    
+    Each result has the fields of /validate/{hts_code} plus the input value
+    and whether the code exists, in input order.
+    """
+    try:
+        validation_result = await TariffDatabaseService.validate_hts_codes(
+            db, request.hts_codes, request.check_existence
+        )
+        
+        return {
+            "success": True,
+            "message": f"Validated {validation_result['total']} HTS codes",
+            "data": validation_result
+        }
+        
+    except Exception as e:
+        logger.error(f"Error validating HTS code batch: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error validating HTS codes: {str(e)}"
+        )
+
+
+@router.post("/validate/batch/upload")
+async def validate_hts_codes_upload(
+    file: UploadFile = File(..., description="CSV or Excel file"),
+    column: Optional[str] = Form(None, description="Column holding HTS codes (default: first column)"),
+    check_existence: bool = Form(True),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Validate and format a column of HTS codes from an uploaded CSV or Excel file.
+    
+    - **file**: .csv, .xlsx or .xls upload
+    - **column**: Column name; the first column is used if omitted
+    - **check_existence**: Also flag codes missing from the active schedule
+    """
+    try:
+        content = await file.read()
+        try:
+            hts_codes = await asyncio.to_thread(
+                TariffDatabaseService.read_hts_code_column,
+                content, file.filename or "", column
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Could not read HTS codes from {file.filename}: {str(e)}"
+            )
+        
+        if not hts_codes:
+            raise HTTPException(status_code=400, detail="Uploaded file has no rows")
+        
+        validation_result = await TariffDatabaseService.validate_hts_codes(
+            db, hts_codes, check_existence
+        )
+        
+        return {
+            "success": True,
+            "message": f"Validated {validation_result['total']} HTS codes from {file.filename}",
+            "data": validation_result
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error validating uploaded HTS codes: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error validating HTS codes: {str(e)}"
+        )
+
+
+@router.post("/reference-rates/batch")
+async def get_reference_rates_batch(
+    request: HTSLocalRateBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Look up many HTS codes in the local reference tariff workbook.
+    
+    - **hts_codes**: Up to 100,000 codes
+    
+    Codes match exactly, else on their 6-digit subheading. USITC is not
+    called; unmatched codes are listed in `missing`.
+    """
+    try:
+        rates = await real_tariff_service.get_local_tariff_rates(request.hts_codes)
+        missing = [hts_code for hts_code, rate in rates.items() if rate is None]
+        
+        return {
+            "success": True,
+            "message": f"Matched {len(rates) - len(missing)} of {len(rates)} HTS codes",
+            "data": {"rates": rates, "missing": missing}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error looking up reference rates: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error looking up reference rates: {str(e)}"
+        )
+
+
+@router.get("/snapshot")
+async def get_tariff_snapshot_status(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the version and size of the in-memory tariff snapshot.
+    """
+    return {
+        "success": True,
+        "message": "Tariff snapshot status",
+        "data": tariff_snapshot_service.get_stats()
+    }
+
+
+@router.get("/calculation-cache")
+async def get_calculation_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get hit/miss counters of the landed-cost result cache for this worker.
+    """
+    return {
+        "success": True,
+        "message": "Calculation cache statistics",
+        "data": landed_cost_cache.get_stats()
+    }
+
+
+@router.post("/snapshot/reload")
+async def reload_tariff_snapshot(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Load the current tariff schedule into a new snapshot (Admin only).
+    
+    Requests keep using the previous snapshot until the new one is swapped in.
+    The shared data version is bumped first, so the other workers reload too
+    and cached calculations of the old schedule stop matching.
+    """
+    try:
+        await landed_cost_cache.invalidate()
+        snapshot = await tariff_snapshot_service.reload(db)
+        
+        return {
+            "success": True,
+            "message": f"Tariff snapshot v{snapshot.version} loaded",
+            "data": tariff_snapshot_service.get_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error reloading tariff snapshot: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading tariff snapshot: {str(e)}"
+        )
@@ -69,6 +69,15 @@ class Settings(BaseSettings):
     chroma_db_path: str = Field(default="./data/chroma", env="CHROMA_DB_PATH")
     chroma_collection_name: str = Field(default="atlas_documents", env="CHROMA_COLLECTION_NAME")
     
+    # Embedding ingestion pipeline
+    embedding_batch_size: int = Field(default=64, env="EMBEDDING_BATCH_SIZE")
+    embedding_workers: int = Field(default=2, env="EMBEDDING_WORKERS")
+    embedding_queue_size: int = Field(default=4, env="EMBEDDING_QUEUE_SIZE")  # Batches per stage
+    embedding_process_pool: bool = Field(default=False, env="EMBEDDING_PROCESS_POOL")  # Embed in worker processes
+    embedding_cache_dir: str = Field(default="./data/cache/embeddings", env="EMBEDDING_CACHE_DIR")
+    embedding_cache_dtype: str = Field(default="float32", env="EMBEDDING_CACHE_DTYPE")  # float32 or float16
+    embedding_cache_max_rows: int = Field(default=1_000_000, env="EMBEDDING_CACHE_MAX_ROWS")  # Per model
+    
     # Tariff APIs
     usitc_api_url: str = Field(
         default="https://hts.usitc.gov/api",
@@ -93,6 +102,7 @@ class Settings(BaseSettings):
     upload_dir: str = Field(default="./uploads", env="UPLOAD_DIR")
     max_file_size: int = Field(default=10 * 1024 * 1024, env="MAX_FILE_SIZE")  # 10MB
     data_dir: str = Field(default="./data", env="DATA_DIR")
+    tariff_cache_dir: str = Field(default="./data/cache/tariff_workbook", env="TARIFF_CACHE_DIR")
     
     # Rate Limiting
     rate_limit_per_minute: int = Field(default=60, env="RATE_LIMIT_PER_MINUTE")
@@ -100,6 +110,22 @@ class Settings(BaseSettings):
     # Cache Settings
     cache_ttl: int = Field(default=3600, env="CACHE_TTL")  # 1 hour
     
+    # Calculation audit write-behind
+    audit_batch_size: int = Field(default=200, env="AUDIT_BATCH_SIZE")
+    audit_flush_interval_ms: int = Field(default=250, env="AUDIT_FLUSH_INTERVAL_MS")
+    audit_queue_size: int = Field(default=10000, env="AUDIT_QUEUE_SIZE")
+    
+    # Outbound HTTP connection pools (per host)
+    http_timeout_seconds: float = Field(default=10.0, env="HTTP_TIMEOUT_SECONDS")
+    http_max_connections_per_host: int = Field(default=20, env="HTTP_MAX_CONNECTIONS_PER_HOST")
+    http_max_keepalive_per_host: int = Field(default=10, env="HTTP_MAX_KEEPALIVE_PER_HOST")
+    http_max_concurrency_per_host: int = Field(default=20, env="HTTP_MAX_CONCURRENCY_PER_HOST")
+    http_keepalive_expiry_seconds: float = Field(default=30.0, env="HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    
+    # HTS popularity tracking
+    popularity_half_life_hours: float = Field(default=168.0, env="POPULARITY_HALF_LIFE_HOURS")  # 1 week
+    popularity_persist_interval_seconds: int = Field(default=60, env="POPULARITY_PERSIST_INTERVAL_SECONDS")
+    
     @validator("cors_origins", pre=True)
     def assemble_cors_origins(cls, v):
         if isinstance(v, str) and not v.startswith("["):
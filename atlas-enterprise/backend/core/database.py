@@ -205,6 +205,43 @@ class CacheManager:
             logger.warning(f"Cache delete error for key {key}: {e}")
             return False
     
+    async def increment(self, key: str) -> Optional[int]:
+        """Atomically increment an integer counter (no TTL)."""
+        try:
+            return await self.redis.incr(key)
+        except Exception as e:
+            logger.warning(f"Cache increment error for key {key}: {e}")
+            return None
+
+    async def update(self, key: str, func, ttl: Optional[int] = None, max_attempts: int = 10) -> Optional[Any]:
+        """
+        Atomically replace a cached value with func(current value).
+
+        The key is watched while func runs and the write is retried if another
+        client changed it meanwhile, so concurrent updates are never lost.
+        func receives None when the key is missing and may run more than once.
+
+        Returns:
+            The stored value, or None if the update failed
+        """
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for _ in range(max_attempts):
+                    try:
+                        await pipe.watch(key)
+                        current = await pipe.get(key)
+                        value = func(json.loads(current) if current else None)
+                        pipe.multi()
+                        pipe.setex(key, ttl or self.default_ttl, json.dumps(value, default=str))
+                        await pipe.execute()
+                        return value
+                    except redis.WatchError:
+                        continue
+            logger.warning(f"Cache update for key {key} gave up after {max_attempts} conflicts")
+        except Exception as e:
+            logger.warning(f"Cache update error for key {key}: {e}")
+        return None
+
     async def get_or_set(self, key: str, func, ttl: Optional[int] = None) -> Any:
         """Get cached value or set if not exists."""
         value = await self.get(key)
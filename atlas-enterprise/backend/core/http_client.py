@@ -0,0 +1,312 @@
+"""
+Shared HTTP Client Registry for ATLAS Enterprise
+Pooled, keep-alive httpx clients per host for outbound integrations.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Deque, Dict, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+from .config import settings
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Latency samples kept per host for percentiles
+_LATENCY_WINDOW = 512
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class HostConfig:
+    """Connection settings for one host."""
+
+    timeout: float
+    max_connections: int
+    max_keepalive_connections: int
+    max_concurrency: int
+
+
+class _HostClient:
+    """A host's pooled client plus its request metrics."""
+
+    def __init__(self, host: str, config: HostConfig):
+        self.host = host
+        self.config = config
+        self.loop = asyncio.get_running_loop()
+        self.client = httpx.AsyncClient(
+            timeout=config.timeout,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry_seconds
+            ),
+            http2=HTTP2_AVAILABLE
+        )
+        self.semaphore = asyncio.Semaphore(config.max_concurrency)
+
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.latencies_ms: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.last_error: Optional[str] = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+
+        # httpcore does not expose pool size publicly; read it when present
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        open_connections = len(pool.connections) if pool is not None and hasattr(pool, "connections") else None
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 2) if latencies else None
+            },
+            "pool": {
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "open_connections": open_connections,
+                "max_connections": self.config.max_connections,
+                "utilization": round(self.in_flight / self.config.max_connections, 3)
+            },
+            "timeout_seconds": self.config.timeout,
+            "max_concurrency": self.config.max_concurrency,
+            "http2": HTTP2_AVAILABLE
+        }
+
+
+class HTTPSession:
+    """
+    Request defaults (headers, timeout) over the shared pools.
+
+    Used like httpx.AsyncClient in an async with block, but leaving the
+    block does not close any connection.
+    """
+
+    def __init__(
+        self,
+        registry: "HTTPClientRegistry",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ):
+        self._registry = registry
+        self._headers = headers or {}
+        self._timeout = timeout
+
+    async def __aenter__(self) -> "HTTPSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request with the session defaults; per-call options win."""
+        if self._headers:
+            kwargs["headers"] = {**self._headers, **(kwargs.get("headers") or {})}
+        if self._timeout is not None:
+            kwargs.setdefault("timeout", self._timeout)
+        return await self._registry.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+
+class HTTPClientRegistry:
+    """
+    One pooled httpx.AsyncClient per host, shared by every integration.
+
+    Connections are kept alive between requests, so repeat calls skip
+    TCP and TLS setup; HTTP/2 is negotiated when the h2 package is
+    installed. Each host has its own pool, timeout and concurrency limit
+    (requests beyond the limit wait for a slot), configured with
+    configure_host or taken from settings. Clients are created lazily
+    per event loop and host, and must be closed on their own loop:
+    close() runs at application shutdown, and code starting its own
+    loop (e.g. a Celery task) uses run() instead of asyncio.run.
+    """
+
+    def __init__(self):
+        """Initialize HTTPClientRegistry."""
+        self._hosts: Dict[Tuple[asyncio.AbstractEventLoop, str], _HostClient] = {}
+        self._configs: Dict[str, HostConfig] = {}
+
+    def default_config(self) -> HostConfig:
+        """Host settings used when a host has no configure_host entry."""
+        return HostConfig(
+            timeout=settings.http_timeout_seconds,
+            max_connections=settings.http_max_connections_per_host,
+            max_keepalive_connections=settings.http_max_keepalive_per_host,
+            max_concurrency=settings.http_max_concurrency_per_host
+        )
+
+    def configure_host(
+        self,
+        host: str,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> None:
+        """
+        Override connection settings for one host.
+
+        Takes effect for clients created afterwards.
+
+        Args:
+            host: Host name, e.g. "api.exchangerate-api.com"
+            timeout: Default request timeout in seconds
+            max_connections: Pool size
+            max_concurrency: Requests in flight at once
+        """
+        default = self.default_config()
+        connections = max_connections or default.max_connections
+        self._configs[host] = HostConfig(
+            timeout=timeout or default.timeout,
+            max_connections=connections,
+            max_keepalive_connections=min(default.max_keepalive_connections, connections),
+            max_concurrency=max_concurrency or connections
+        )
+
+    def _host_client(self, host: str) -> _HostClient:
+        """The host's client on the running loop, created on first use."""
+        key = (asyncio.get_running_loop(), host)
+        entry = self._hosts.get(key)
+        if entry is None or entry.client.is_closed:
+            self._drop_closed_loops()
+            entry = _HostClient(host, self._configs.get(host) or self.default_config())
+            self._hosts[key] = entry
+        return entry
+
+    def _drop_closed_loops(self) -> None:
+        """Forget clients whose loop ended without closing them."""
+        for key, entry in list(self._hosts.items()):
+            if entry.loop.is_closed():
+                # Their sockets belong to the dead loop and cannot be closed from this one
+                if not entry.client.is_closed:
+                    logger.warning(f"HTTP client for {entry.host} outlived its event loop; use http_clients.run()")
+                del self._hosts[key]
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request through the host's pooled client.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            **kwargs: httpx request options (params, headers, json, timeout, ...)
+
+        Returns:
+            The response, fully read
+
+        Raises:
+            httpx.HTTPError: On connection errors and timeouts
+        """
+        entry = self._host_client(urlsplit(url).hostname or "")
+        async with entry.semaphore:
+            entry.in_flight += 1
+            entry.peak_in_flight = max(entry.peak_in_flight, entry.in_flight)
+            start = time.perf_counter()
+            try:
+                response = await entry.client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                entry.errors += 1
+                entry.last_error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                entry.in_flight -= 1
+                entry.requests += 1
+                entry.latencies_ms.append((time.perf_counter() - start) * 1000)
+        return response
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a GET request; see request."""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a POST request; see request."""
+        return await self.request("POST", url, **kwargs)
+
+    def session(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> HTTPSession:
+        """
+        Scope default headers and timeout to a group of requests.
+
+        Args:
+            headers: Headers sent with every request
+            timeout: Timeout in seconds, overriding the host setting
+
+        Returns:
+            HTTPSession usable as an async context manager
+        """
+        return HTTPSession(self, headers=headers, timeout=timeout)
+
+    async def close(self) -> None:
+        """Close every client owned by the running loop."""
+        loop = asyncio.get_running_loop()
+        for key, entry in list(self._hosts.items()):
+            if entry.loop is loop:
+                await entry.client.aclose()
+                del self._hosts[key]
+        self._drop_closed_loops()
+        logger.info("HTTP client pools closed")
+
+    def run(self, main: Awaitable[T]) -> T:
+        """
+        asyncio.run(main), closing the clients it opened before the loop ends.
+
+        Args:
+            main: Coroutine to run on a new event loop
+
+        Returns:
+            The coroutine's result
+        """
+        async def _main() -> T:
+            try:
+                return await main
+            finally:
+                await self.close()
+
+        return asyncio.run(_main())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-host latency and pool utilization."""
+        return {
+            "http2_available": HTTP2_AVAILABLE,
+            "hosts": {
+                host: entry.get_stats()
+                for (loop, host), entry in self._hosts.items() if not loop.is_closed()
+            }
+        }
+
+
+# Global instance
+http_clients = HTTPClientRegistry()
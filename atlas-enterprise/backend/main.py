@@ -42,6 +42,34 @@ async def lifespan(app: FastAPI):
             logger.error("❌ Database health check failed")
             raise Exception("Database not accessible")
         
+        # Start write-behind persistence for calculation audit rows
+        from services.calculation_audit_writer import calculation_audit_writer
+        await calculation_audit_writer.start()
+        
+        # Load the in-memory tariff snapshot (rates + HTS search index)
+        try:
+            from services.tariff_snapshot import tariff_snapshot_service
+            async with db_manager.get_session() as session:
+                snapshot = await tariff_snapshot_service.reload(session)
+            logger.info(f"✅ Tariff snapshot v{snapshot.version} ready ({len(snapshot.hts_codes)} codes)")
+        except Exception as e:
+            logger.warning(f"⚠️ Tariff snapshot unavailable, using database lookups: {e}")
+        
+        # Restore HTS popularity counts and save them periodically
+        try:
+            from services.hts_popularity_tracker import hts_popularity_tracker
+            await hts_popularity_tracker.start()
+        except Exception as e:
+            logger.warning(f"⚠️ HTS popularity state unavailable: {e}")
+        
+        # Full-text index for ranked description search comes from a migration
+        try:
+            from services.hts_fulltext_service import hts_fulltext_service
+            async with db_manager.get_session() as session:
+                await hts_fulltext_service.check_index(session)
+        except Exception as e:
+            logger.warning(f"⚠️ HTS full-text index unavailable: {e}")
+        
         logger.info("🌟 ATLAS Enterprise startup complete!")
         
     except Exception as e:
@@ -54,6 +82,14 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 Shutting down ATLAS Enterprise API")
     
     try:
+        from services.calculation_audit_writer import calculation_audit_writer
+        await calculation_audit_writer.stop()
+        from services.hts_popularity_tracker import hts_popularity_tracker
+        await hts_popularity_tracker.stop()
+        from core.http_client import http_clients
+        await http_clients.close()
+        from services.vector_service import vector_service
+        await vector_service.close()
         await close_database()
         logger.info("✅ ATLAS Enterprise shutdown complete")
         
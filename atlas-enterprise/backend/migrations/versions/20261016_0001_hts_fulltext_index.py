@@ -0,0 +1,95 @@
+"""HTS full-text index
+
+SQLite gets an external-content FTS5 table kept in sync by triggers;
+PostgreSQL gets a generated tsvector column with a GIN index.
+HTSFullTextService only checks that these exist.
+
+hts_codes itself is created by the application (init_database), so start
+the application once before running this migration on a fresh database.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 00:00:00
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLE = "hts_codes"
+FTS_TABLE = "hts_codes_fts"
+FTS_COLUMNS = "hts_code, brief_description, description"
+TS_CONFIG = "english"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table(TABLE):
+        raise RuntimeError(
+            f"Table {TABLE} does not exist yet; start the application once to "
+            "create the tables, then run 'alembic upgrade head'"
+        )
+
+    dialect = bind.dialect.name
+    if dialect == "sqlite":
+        _upgrade_sqlite()
+    elif dialect == "postgresql":
+        _upgrade_postgres()
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif dialect == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS ix_{TABLE}_search_vector")
+        op.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+
+
+def _upgrade_sqlite() -> None:
+    """Create the FTS5 table and sync triggers, then backfill it."""
+    fts, table, columns = FTS_TABLE, TABLE, FTS_COLUMNS
+    op.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+        {columns},
+        content='{table}', content_rowid='id',
+        tokenize='porter unicode61'
+    )""")
+    op.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts}(rowid, {columns})
+        VALUES (new.id, new.hts_code, new.brief_description, new.description);
+    END""")
+    op.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, {columns})
+        VALUES ('delete', old.id, old.hts_code, old.brief_description, old.description);
+    END""")
+    op.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, {columns})
+        VALUES ('delete', old.id, old.hts_code, old.brief_description, old.description);
+        INSERT INTO {fts}(rowid, {columns})
+        VALUES (new.id, new.hts_code, new.brief_description, new.description);
+    END""")
+    op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _upgrade_postgres() -> None:
+    """Add the generated tsvector column and build its GIN index."""
+    op.execute(f"""
+        ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(hts_code, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(brief_description, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+    # Build without blocking writes; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{TABLE}_search_vector "
+            f"ON {TABLE} USING GIN (search_vector)"
+        )
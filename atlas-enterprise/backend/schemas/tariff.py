@@ -4,8 +4,8 @@ Request/response models for tariff calculations and HTS operations.
 """
 
 from typing import List, Optional, Dict, Any
-from datetime import datetime
-from pydantic import BaseModel, Field, validator, ConfigDict
+from datetime import date, datetime
+from pydantic import BaseModel, Field, validator, model_validator, ConfigDict
 
 from .common import BaseResponse, BusinessMetrics
 
@@ -63,6 +63,7 @@ class TariffCalculationRequest(BaseModel):
     insurance_cost: float = Field(default=0.0, description="Insurance cost", ge=0)
     other_costs: float = Field(default=0.0, description="Other additional costs", ge=0)
     currency: str = Field(default="USD", description="Currency of values", min_length=3, max_length=3)
+    as_of: Optional[date] = Field(default=None, description="Entry date to price at (default: current rates)")
     
     @validator('hts_code')
     def validate_hts_code(cls, v):
@@ -104,6 +105,65 @@ class TariffCalculationResponse(BaseResponse):
         calculation_metadata: Dict[str, Any] = Field(description="Additional metadata")
 
 
+class SweepRange(BaseModel):
+    """One what-if sweep axis: explicit values or an evenly spaced range."""
+    
+    values: Optional[List[float]] = Field(None, description="Explicit axis values", min_items=1, max_items=1000)
+    start: Optional[float] = Field(None, description="First value of an evenly spaced range")
+    stop: Optional[float] = Field(None, description="Last value of an evenly spaced range (inclusive)")
+    steps: int = Field(default=10, description="Number of values in the range", ge=1, le=1000)
+    
+    @model_validator(mode="after")
+    def validate_range(self):
+        if self.values is None and (self.start is None or self.stop is None):
+            raise ValueError('Provide either values or start and stop')
+        return self
+    
+    def to_values(self) -> List[float]:
+        """Expand the axis into its list of values."""
+        if self.values is not None:
+            return self.values
+        if self.steps == 1:
+            return [self.start]
+        step = (self.stop - self.start) / (self.steps - 1)
+        return [round(self.start + i * step, 6) for i in range(self.steps)]
+
+
+class LandedCostSweepRequest(BaseModel):
+    """What-if landed cost sweep request schema."""
+    
+    hts_code: str = Field(description="HTS code for the product", min_length=4, max_length=13)
+    country_code: str = Field(description="Country of origin (ISO 2-letter code)", min_length=2, max_length=2)
+    product_value: SweepRange = Field(description="Product value axis")
+    freight_cost: SweepRange = Field(default_factory=lambda: SweepRange(values=[0.0]), description="Freight cost axis")
+    fx_shock: SweepRange = Field(
+        default_factory=lambda: SweepRange(values=[1.0]),
+        description="Multipliers on the currency-to-USD rate (1.1 = currency 10% stronger)"
+    )
+    quantity: float = Field(default=1.0, description="Quantity of items", gt=0)
+    insurance_cost: float = Field(default=0.0, description="Insurance cost", ge=0)
+    other_costs: float = Field(default=0.0, description="Other additional costs", ge=0)
+    currency: str = Field(default="USD", description="Currency of values", min_length=3, max_length=3)
+    format: str = Field(default="columnar", description="Response layout (columnar or rows)", pattern="^(columnar|rows)$")
+    
+    @validator('hts_code')
+    def validate_hts_code(cls, v):
+        clean_code = v.replace('.', '').replace(' ', '')
+        if not clean_code.isdigit():
+            raise ValueError('HTS code must contain only digits')
+        return clean_code
+    
+    @validator('country_code', 'currency')
+    def validate_upper(cls, v):
+        return v.upper()
+
+
+class LandedCostSweepResponse(BaseResponse):
+    """What-if landed cost sweep response schema."""
+    
+    data: Dict[str, Any] = Field(description="Sweep axes, grid shape and per-cell costs")
+
+
 class SourcingComparisonRequest(BaseModel):
     """Sourcing comparison request schema."""
     
@@ -164,6 +224,7 @@ class HTSSearchRequest(BaseModel):
     query: str = Field(description="Search query (code or description)", min_length=1, max_length=200)
     chapter: Optional[str] = Field(None, description="Filter by chapter (2 digits)", min_length=2, max_length=2)
     limit: int = Field(default=20, description="Maximum results to return", ge=1, le=100)
+    mode: str = Field(default="prefix", description="Search mode (prefix or fulltext)", pattern="^(prefix|fulltext)$")
     
     @validator('chapter')
     def validate_chapter(cls, v):
@@ -183,15 +244,59 @@ class HTSSearchResponse(BaseResponse):
     search_time_ms: int = Field(description="Search execution time in milliseconds")
 
 
+class HTSBatchValidationRequest(BaseModel):
+    """Batch HTS code validation request schema."""
+    
+    hts_codes: List[Optional[str]] = Field(
+        description="HTS codes to validate, dots and spaces allowed",
+        min_length=1,
+        max_length=100000
+    )
+    check_existence: bool = Field(default=True, description="Also require codes to be in the active schedule")
+
+
+class HTSLocalRateBatchRequest(BaseModel):
+    """Batch reference-rate lookup request schema."""
+    
+    hts_codes: List[str] = Field(
+        description="HTS codes to look up, dots allowed",
+        min_length=1,
+        max_length=100000
+    )
+
+
 class ChapterSummary(BaseModel):
     """HTS chapter summary."""
     
     chapter: str = Field(description="2-digit chapter code")
-    description: str = Field(description="Chapter description")
+    description: Optional[str] = Field(None, description="Chapter description")
     code_count: int = Field(description="Number of HTS codes in chapter")
+    rate_count: int = Field(0, description="Number of active rate rows in chapter")
+    min_rate: Optional[float] = Field(None, description="Lowest MFN rate (%)")
+    avg_rate: Optional[float] = Field(None, description="Average MFN rate (%)")
+    max_rate: Optional[float] = Field(None, description="Highest MFN rate (%)")
 
 
 class ChapterSummaryResponse(BaseResponse):
     """HTS chapters summary response."""
     
-    data: List[ChapterSummary] = Field(description="List of HTS chapters with counts") 
\ No newline at end of file
+    data: List[ChapterSummary] = Field(description="List of HTS chapters with counts")
+
+
+class HTSRollup(BaseModel):
+    """Code count and MFN rate statistics for one chapter, heading or subheading."""
+    
+    code: str = Field(description="Chapter, heading (4-digit) or subheading (6-digit) code")
+    description: Optional[str] = Field(None, description="Chapter description (chapters only)")
+    code_count: int = Field(description="Number of HTS codes in the group")
+    rate_count: int = Field(description="Number of active rate rows in the group")
+    min_rate: Optional[float] = Field(None, description="Lowest MFN rate (%)")
+    avg_rate: Optional[float] = Field(None, description="Average MFN rate (%)")
+    max_rate: Optional[float] = Field(None, description="Highest MFN rate (%)")
+
+
+class HTSRollupResponse(BaseResponse):
+    """HTS rollup response."""
+    
+    level: str = Field(description="Rollup level (chapter, hts_4 or hts_6)")
+    data: List[HTSRollup] = Field(description="Rollup rows ordered by code")
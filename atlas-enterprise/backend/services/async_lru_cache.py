@@ -0,0 +1,138 @@
+"""
+Async LRU Cache for ATLAS Enterprise
+Size- and TTL-bounded in-process cache with negative entries and single-flight fetches.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    """Mark a failed fetch retrieved, as every caller may have been cancelled."""
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncLRUCache:
+    """
+    In-process cache for slow upstream lookups.
+
+    Holds at most max_entries results, evicting the least recently used.
+    A fetch that returns None is stored as a negative entry with the
+    shorter negative_ttl, so unknown keys do not hit upstream on every
+    call. Concurrent get_or_fetch calls for the same missing key share
+    one fetch (single flight) that runs as its own task, so cancelling
+    any caller leaves it running for the rest. Fetches that raise are
+    not cached.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float):
+        """Initialize AsyncLRUCache."""
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.negative_ttl = negative_ttl_seconds
+
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value), dropping the entry if it has expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a result; None is stored with the negative TTL."""
+        ttl = self.negative_ttl if value is None else self.ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """
+        Get a cached result, or fetch and cache it.
+
+        Args:
+            key: Cache key
+            fetch: Coroutine factory returning the value, or None if unknown
+
+        Returns:
+            The cached or fetched value (None for a negative entry)
+        """
+        found, value = self._lookup(key)
+        if found:
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The fetch runs as its own task, so no single caller owns it
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            task.add_done_callback(_retrieve_exception)
+            self._in_flight[key] = task
+
+        # shield: a cancelled caller must not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """Run fetch and cache its result; the key stays in flight until done."""
+        try:
+            value = await fetch()
+            self.set(key, value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "negative_ttl_seconds": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "in_flight": len(self._in_flight),
+            "hit_rate": round((self.hits + self.negative_hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
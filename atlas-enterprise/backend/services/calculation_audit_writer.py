@@ -0,0 +1,163 @@
+"""
+Calculation Audit Writer for ATLAS Enterprise
+Write-behind queue that persists TariffCalculation audit rows in batches.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from models.tariff import TariffCalculation
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_STOP = object()
+
+# SQLite allows 32766 bound parameters per statement, PostgreSQL 32767
+_MAX_BIND_PARAMS = 30000
+
+
+class CalculationAuditWriter:
+    """
+    Batches audit rows off the request path.
+
+    Requests enqueue plain row dicts; a single background task drains the
+    queue into multi-row INSERTs of up to batch_size rows, flushing a
+    partial batch once flush_interval_ms has passed since its first row.
+    The queue is bounded, so a database that falls behind slows producers
+    down (backpressure) instead of growing memory without limit.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[int] = None,
+        max_queue_size: Optional[int] = None
+    ):
+        """Initialize CalculationAuditWriter; defaults come from settings."""
+        self.batch_size = batch_size or settings.audit_batch_size
+        self.flush_interval = (flush_interval_ms or settings.audit_flush_interval_ms) / 1000
+        self.max_queue_size = max_queue_size or settings.audit_queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory: Optional[Callable] = None
+
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches_written = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the background writer accepts rows."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self, session_factory: Optional[Callable] = None) -> None:
+        """
+        Start the background writer.
+
+        Args:
+            session_factory: Async context manager factory yielding a
+                committing session; defaults to db_manager.get_session
+        """
+        if self.is_running:
+            return
+        if session_factory is None:
+            from core.database import db_manager
+            session_factory = db_manager.get_session
+
+        self._session_factory = session_factory
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Calculation audit writer started (batch {self.batch_size}, "
+            f"{self.flush_interval * 1000:.0f} ms, queue {self.max_queue_size})"
+        )
+
+    async def enqueue(self, row: Dict[str, Any]) -> None:
+        """
+        Queue an audit row, waiting while the queue is full.
+
+        Args:
+            row: TariffCalculation column values
+        """
+        await self._queue.put(row)
+
+    async def stop(self) -> None:
+        """Flush every queued row and stop the writer."""
+        if not self.is_running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info(f"Calculation audit writer stopped ({self.rows_written} rows written)")
+
+    async def _run(self) -> None:
+        """Drain the queue in batches until stopped."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._write(batch)
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert one batch; a failed batch is logged and counted, not retried."""
+        start = time.perf_counter()
+        try:
+            # One multi-row INSERT per chunk, kept under the bind-parameter limit
+            chunk_size = max(1, _MAX_BIND_PARAMS // len(rows[0]))
+            async with self._session_factory() as session:
+                for i in range(0, len(rows), chunk_size):
+                    await session.execute(
+                        insert(TariffCalculation).values(rows[i:i + chunk_size])
+                    )
+                await session.commit()
+            self.rows_written += len(rows)
+            self.batches_written += 1
+        except Exception as e:
+            self.rows_failed += len(rows)
+            logger.error(f"Failed to write {len(rows)} calculation audit rows: {e}")
+        finally:
+            self.last_batch_ms = (time.perf_counter() - start) * 1000
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get writer metrics, including current queue depth."""
+        return {
+            "running": self.is_running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches_written": self.batches_written,
+            "last_batch_ms": round(self.last_batch_ms, 2)
+        }
+
+
+# Global instance
+calculation_audit_writer = CalculationAuditWriter()
@@ -4,15 +4,18 @@ Load and integrate tariff data and knowledge base into the system.
 """
 
 import asyncio
+import hashlib
 import json
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
 from core.config import settings
 from core.logging import get_logger, log_business_event
-from services.vector_service import vector_service
+from services.vector_service import vector_service, EMBEDDING_MODEL
+from services.tariff_workbook_cache import tariff_workbook_cache
+from services.workbook_hts_index import WorkbookHTSIndex
 from models.document import Document
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
@@ -20,6 +23,12 @@ from sqlalchemy.sql import func
 
 logger = get_logger(__name__)
 
+# Fields identifying a knowledge entry, in order of preference
+_KNOWLEDGE_KEY_FIELDS = ("id", "title", "question")
+
+# Metadata that only records where an entry sits in its file
+_POSITION_FIELDS = ("item_index", "entry_index", "chunk_index")
+
 
 class DataIngestionService:
     """Service for loading and processing data files."""
@@ -29,6 +38,13 @@ class DataIngestionService:
         self.data_path = Path("backend/data")
         self.knowledge_base_path = self.data_path / "knowledge_base"
         self.tariff_file = self.data_path / "tariff_database_2025.xlsx"
+        
+        # HTS index over every sheet, tied to the workbook's (mtime, size)
+        self._hts_index: Optional[WorkbookHTSIndex] = None
+        self._hts_index_stamp: Optional[tuple] = None
+        
+        # One knowledge base ingestion at a time, so runs never race on the diff
+        self._ingest_lock = asyncio.Lock()
     
     async def load_tariff_data(self) -> Dict[str, Any]:
         """
@@ -45,8 +61,11 @@ class DataIngestionService:
             # Load Excel file
             logger.info(f"Loading tariff data from {self.tariff_file}")
             
-            # Read all sheets
-            excel_data = pd.read_excel(self.tariff_file, sheet_name=None)
+            # Read all sheets (from the column cache after the first load)
+            excel_data = await asyncio.to_thread(
+                tariff_workbook_cache.read_excel, self.tariff_file, None
+            )
+            await self._ensure_hts_index(excel_data)
             
             tariff_data = {}
             for sheet_name, df in excel_data.items():
@@ -95,6 +114,7 @@ class DataIngestionService:
         """
         try:
             knowledge_data = {}
+            failed_files = []
             
             # Load main knowledge files from data directory
             main_files = [
@@ -122,6 +142,7 @@ class DataIngestionService:
                             logger.info(f"Loaded knowledge file: {json_file.name}")
                     except Exception as e:
                         logger.error(f"Error loading {json_file.name}: {e}")
+                        failed_files.append(json_file.stem)
             
             # Log business event
             log_business_event(
@@ -135,6 +156,7 @@ class DataIngestionService:
             return {
                 "success": True,
                 "files": list(knowledge_data.keys()),
+                "failed_files": failed_files,
                 "data": knowledge_data,
                 "summary": {
                     "total_files": len(knowledge_data),
@@ -153,128 +175,238 @@ class DataIngestionService:
                 "error": str(e)
             }
     
+    @staticmethod
+    def _knowledge_entries(file_name: str, data: Any) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Split one knowledge file into (vector ID, text, metadata) entries.
+        
+        Vector IDs come from each entry's own id, title or question, or
+        failing those its content, so inserting or removing entries does
+        not change the IDs of the others. Positions are kept in metadata
+        but left out of content_hash.
+        """
+        entries = []
+        
+        if isinstance(data, list):
+            # List of items
+            for i, item in enumerate(data):
+                if isinstance(item, dict):
+                    metadata = {
+                        "file_name": file_name,
+                        "item_index": i,
+                        "chunk_index": i,
+                        "document_type": "knowledge_base"
+                    }
+                    if "question" in item:
+                        metadata["question"] = item["question"]
+                    if "category" in item:
+                        metadata["category"] = item["category"]
+                    entries.append((item, json.dumps(item, indent=2), metadata))
+        
+        elif isinstance(data, dict):
+            if "entries" in data:
+                # Has entries field
+                for i, entry in enumerate(data["entries"]):
+                    metadata = {
+                        "file_name": file_name,
+                        "entry_index": i,
+                        "chunk_index": i,
+                        "document_type": "knowledge_base"
+                    }
+                    entries.append((entry, json.dumps(entry, indent=2), metadata))
+            else:
+                # Direct dictionary
+                metadata = {
+                    "file_name": file_name,
+                    "chunk_index": 0,
+                    "document_type": "knowledge_base"
+                }
+                entries.append((None, json.dumps(data, indent=2), metadata))
+        
+        keyed = []
+        seen: Dict[str, int] = {}
+        for entry, text, metadata in entries:
+            if entry is None:
+                vector_id = f"kb:{file_name}"
+            else:
+                key = DataIngestionService._knowledge_entry_key(entry)
+                # Entries sharing a key are told apart by occurrence
+                seen[key] = seen.get(key, 0) + 1
+                if seen[key] > 1:
+                    key = f"{key}#{seen[key]}"
+                vector_id = f"kb:{file_name}:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+            keyed.append((vector_id, text, DataIngestionService._with_content_hash(metadata, text)))
+        return keyed
+    
+    @staticmethod
+    def _knowledge_entry_key(entry: Any) -> str:
+        """Identity of a knowledge entry: its id, title or question, else its content."""
+        if isinstance(entry, dict):
+            for field in _KNOWLEDGE_KEY_FIELDS:
+                value = entry.get(field)
+                if isinstance(value, (str, int)) and not isinstance(value, bool) and str(value).strip():
+                    return f"{field}:{value}"
+        return "content:" + json.dumps(entry, sort_keys=True)
+    
+    @staticmethod
+    def _with_content_hash(metadata: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Add the hash of what the stored vector depends on, positions excluded."""
+        hashed = {key: value for key, value in metadata.items() if key not in _POSITION_FIELDS}
+        metadata["content_hash"] = hashlib.sha256(
+            f"{EMBEDDING_MODEL}\n{json.dumps(hashed, sort_keys=True)}\n{text}".encode("utf-8")
+        ).hexdigest()
+        return metadata
+    
+    async def _get_knowledge_document(self, db: AsyncSession, file_name: str) -> Document:
+        """Get the Document row of a knowledge file, creating it on first ingestion."""
+        file_path = f"data/{file_name}.json"
+        result = await db.execute(
+            select(Document).where(
+                and_(
+                    Document.document_type == "knowledge_base",
+                    Document.file_path == file_path
+                )
+            ).order_by(Document.id).limit(1)
+        )
+        document = result.scalar_one_or_none()
+        metadata = {
+            "source": "knowledge_base",
+            "ingestion_date": datetime.utcnow().isoformat()
+        }
+        
+        if document is None:
+            document = Document(
+                title=f"Knowledge Base: {file_name}",
+                document_type="knowledge_base",
+                file_path=file_path,
+                content_type="application/json",
+                tags=["knowledge_base", "tariff", "trade"],
+                metadata_=metadata
+            )
+            db.add(document)
+        else:
+            document.metadata_ = {**(document.metadata_ or {}), **metadata}
+        await db.flush()  # Get the ID
+        return document
+    
     async def ingest_knowledge_to_vector_store(
         self,
         db: AsyncSession,
-        knowledge_data: Dict[str, Any]
+        knowledge_data: Dict[str, Any],
+        preserve_files: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
-        Ingest knowledge base data into ChromaDB vector store.
+        Incrementally ingest knowledge base data into ChromaDB vector store.
+        
+        Each entry has a stable vector ID and a content hash stored in its
+        vector metadata. Only new or changed entries are embedded and
+        upserted, entries that merely moved within their file get their
+        positions updated, and vectors of entries no longer present are
+        deleted, along with knowledge base vectors left by earlier runs
+        under other IDs.
         
         Args:
             db: Database session
             knowledge_data: Knowledge base data
+            preserve_files: Files missing from knowledge_data whose vectors
+                must be kept (e.g. files that failed to load)
             
         Returns:
-            Ingestion results
+            Ingestion results with an added/updated/moved/removed/skipped diff
         """
-        try:
-            await vector_service.initialize()
-            
-            ingested_count = 0
-            total_chunks = 0
-            
-            for file_name, data in knowledge_data.items():
-                try:
-                    # Create or get document record
-                    document = Document(
-                        title=f"Knowledge Base: {file_name}",
-                        document_type="knowledge_base",
-                        file_path=f"data/{file_name}.json",
-                        content_type="application/json",
-                        tags=["knowledge_base", "tariff", "trade"],
-                        metadata_={
-                            "source": "knowledge_base",
-                            "ingestion_date": datetime.utcnow().isoformat()
-                        }
-                    )
-                    db.add(document)
-                    await db.flush()  # Get the ID
-                    
-                    # Process data based on structure
-                    texts_to_embed = []
-                    metadatas = []
-                    
-                    if isinstance(data, list):
-                        # List of items
-                        for i, item in enumerate(data):
-                            if isinstance(item, dict):
-                                text = json.dumps(item, indent=2)
-                                metadata = {
-                                    "file_name": file_name,
-                                    "item_index": i,
-                                    "document_type": "knowledge_base"
-                                }
-                                if "question" in item:
-                                    metadata["question"] = item["question"]
-                                if "category" in item:
-                                    metadata["category"] = item["category"]
-                                    
-                                texts_to_embed.append(text)
-                                metadatas.append(metadata)
-                    
-                    elif isinstance(data, dict):
-                        # Dictionary structure
-                        if "entries" in data:
-                            # Has entries field
-                            for i, entry in enumerate(data["entries"]):
-                                text = json.dumps(entry, indent=2)
-                                metadata = {
-                                    "file_name": file_name,
-                                    "entry_index": i,
-                                    "document_type": "knowledge_base"
-                                }
-                                texts_to_embed.append(text)
-                                metadatas.append(metadata)
-                        else:
-                            # Direct dictionary
-                            text = json.dumps(data, indent=2)
-                            metadata = {
-                                "file_name": file_name,
-                                "document_type": "knowledge_base"
-                            }
-                            texts_to_embed.append(text)
-                            metadatas.append(metadata)
-                    
-                    # Store in vector database
-                    if texts_to_embed:
-                        vector_ids = await vector_service.store_document_embeddings(
-                            db, document.id, texts_to_embed, metadatas
+        async with self._ingest_lock:
+            try:
+                await vector_service.initialize()
+                
+                existing = await vector_service.get_vector_metadata(
+                    {"document_type": "knowledge_base"}
+                )
+                
+                ingested_count = 0
+                total_chunks = 0
+                diff = {"added": 0, "updated": 0, "moved": 0, "removed": 0, "skipped": 0}
+                current_ids = set()
+                failed_files = list(preserve_files or [])
+                
+                for file_name, data in knowledge_data.items():
+                    try:
+                        entries = self._knowledge_entries(file_name, data)
+                        current_ids.update(vector_id for vector_id, _, _ in entries)
+                        
+                        changed, moved = [], []
+                        for entry in entries:
+                            stored = existing.get(entry[0], {})
+                            if stored.get("content_hash") != entry[2]["content_hash"]:
+                                changed.append(entry)
+                            elif any(stored.get(field) != entry[2].get(field) for field in _POSITION_FIELDS):
+                                moved.append(entry)
+                        
+                        # Entries only shifted by inserts or removals keep their vectors
+                        diff["moved"] += await vector_service.update_vector_metadata(
+                            db,
+                            [vector_id for vector_id, _, _ in moved],
+                            [metadata for _, _, metadata in moved]
+                        )
+                        diff["skipped"] += len(entries) - len(changed) - len(moved)
+                        if not changed:
+                            continue
+                        
+                        document = await self._get_knowledge_document(db, file_name)
+                        vector_ids = await vector_service.upsert_embeddings(
+                            db,
+                            document.id,
+                            [vector_id for vector_id, _, _ in changed],
+                            [text for _, text, _ in changed],
+                            [metadata for _, _, metadata in changed]
                         )
                         
+                        added = sum(1 for vector_id in vector_ids if vector_id not in existing)
+                        diff["added"] += added
+                        diff["updated"] += len(vector_ids) - added
                         ingested_count += 1
                         total_chunks += len(vector_ids)
                         
-                        logger.info(f"Ingested {file_name}: {len(vector_ids)} chunks")
+                        logger.info(f"Ingested {file_name}: {len(vector_ids)} changed of {len(entries)} entries")
+                    
+                    except Exception as e:
+                        logger.error(f"Error ingesting {file_name}: {e}")
+                        failed_files.append(file_name)
+                        continue
                 
-                except Exception as e:
-                    logger.error(f"Error ingesting {file_name}: {e}")
-                    continue
-            
-            await db.commit()
-            
-            # Log business event
-            log_business_event(
-                "knowledge_base_ingested",
-                details={
+                # Entries that disappeared (files of failed runs keep theirs)
+                removed_ids = [
+                    vector_id for vector_id, metadata in existing.items()
+                    if vector_id not in current_ids and metadata.get("file_name") not in failed_files
+                ]
+                diff["removed"] = await vector_service.delete_vectors(db, removed_ids)
+                
+                await db.commit()
+                
+                # Log business event
+                log_business_event(
+                    "knowledge_base_ingested",
+                    details={
+                        "files_ingested": ingested_count,
+                        "total_chunks": total_chunks,
+                        **diff
+                    }
+                )
+                
+                return {
+                    "success": True,
                     "files_ingested": ingested_count,
-                    "total_chunks": total_chunks
+                    "total_chunks": total_chunks,
+                    **diff,
+                    "failed_files": failed_files
+                }
+                
+            except Exception as e:
+                logger.error(f"Error ingesting knowledge to vector store: {e}")
+                await db.rollback()
+                return {
+                    "success": False,
+                    "error": str(e)
                 }
-            )
-            
-            return {
-                "success": True,
-                "files_ingested": ingested_count,
-                "total_chunks": total_chunks
-            }
-            
-        except Exception as e:
-            logger.error(f"Error ingesting knowledge to vector store: {e}")
-            await db.rollback()
-            return {
-                "success": False,
-                "error": str(e)
-            }
     
     async def search_knowledge_base(
         self,
@@ -319,10 +451,53 @@ class DataIngestionService:
             logger.error(f"Error searching knowledge base: {e}")
             return []
     
+    async def _ensure_hts_index(
+        self,
+        frames: Optional[Dict[str, pd.DataFrame]] = None
+    ) -> Optional[WorkbookHTSIndex]:
+        """
+        Get the HTS index for the current workbook, loading or building it once.
+        
+        The index is saved next to the workbook's column cache, so later
+        processes memory-map it instead of rebuilding it.
+        
+        Args:
+            frames: Sheets already loaded by the caller, if any
+            
+        Returns:
+            The index, or None if the workbook is missing
+        """
+        if not self.tariff_file.exists():
+            return None
+        stat = self.tariff_file.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self._hts_index is not None and self._hts_index_stamp == stamp:
+            return self._hts_index
+        
+        def _load() -> WorkbookHTSIndex:
+            sheets = frames
+            if sheets is None:
+                sheets = tariff_workbook_cache.read_excel(self.tariff_file, None)
+            index_dir = tariff_workbook_cache.bundle_dir(self.tariff_file) / "hts_index"
+            index = WorkbookHTSIndex.load(index_dir, sheets)
+            if index is None:
+                index = WorkbookHTSIndex.build(sheets)
+                if index_dir.parent.exists():
+                    index.save(index_dir)
+            return index
+        
+        self._hts_index = await asyncio.to_thread(_load)
+        self._hts_index_stamp = stamp
+        logger.info(f"HTS index ready: {len(self._hts_index)} codes across {len(self._hts_index.sheet_names)} sheets")
+        return self._hts_index
+    
     async def get_tariff_by_hts(self, hts_code: str) -> Dict[str, Any]:
         """
         Get tariff information by HTS code from loaded data.
         
+        Answered from the multi-sheet HTS index; the workbook is only
+        read when the index is first built or the file changes.
+        
         Args:
             hts_code: HTS code to search for
             
@@ -330,28 +505,11 @@ class DataIngestionService:
             Tariff information
         """
         try:
-            # Load tariff data
-            tariff_data = await self.load_tariff_data()
-            
-            if not tariff_data.get("success"):
+            index = await self._ensure_hts_index()
+            if index is None:
                 return {"error": "Failed to load tariff data"}
             
-            # Search through all sheets for HTS code
-            results = []
-            
-            for sheet_name, sheet_data in tariff_data["data"].items():
-                for row in sheet_data["data"]:
-                    # Look for HTS code in various possible column names
-                    hts_columns = ["HTS", "HTS_Code", "HS_Code", "Code", "hts", "hts_code"]
-                    
-                    for col in hts_columns:
-                        if col in row and str(row[col]).replace(".", "").replace(" ", "") == hts_code.replace(".", "").replace(" ", ""):
-                            results.append({
-                                "sheet": sheet_name,
-                                "data": row,
-                                "hts_code": str(row[col])
-                            })
-                            break
+            results = index.lookup(hts_code)
             
             return {
                 "success": True,
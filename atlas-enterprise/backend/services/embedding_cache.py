@@ -0,0 +1,277 @@
+"""
+Embedding Cache for ATLAS Enterprise
+Disk-backed, content-addressed embedding store shared across restarts and workers.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+# Bump when the store layout changes; old stores are then ignored
+CACHE_FORMAT_VERSION = 1
+
+_KEY_BYTES = 16
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    """Cache key of a text: truncated SHA-256 of (model, text)."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()[:_KEY_BYTES]
+
+
+class _ModelStore:
+    """
+    One model's vectors: an append-only row matrix plus its key file.
+
+    vectors.bin holds rows of `dim` values and keys.bin the key of each
+    row; a row counts once both are complete, so a torn append is
+    overwritten by the next one. The matrix is memory-mapped and
+    remapped when other processes have appended rows.
+    """
+
+    def __init__(self, directory: Path, model: str, dtype: str):
+        self.directory = directory
+        self.model = model
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+
+        self._keys_path = directory / "keys.bin"
+        self._vectors_path = directory / "vectors.bin"
+        self._meta_path = directory / "meta.json"
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._keys_size = -1
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    def _load_meta(self) -> bool:
+        """Read dim and dtype from meta.json; False if the store does not exist yet."""
+        if self.dim is not None:
+            return True
+        try:
+            meta = json.loads(self._meta_path.read_text())
+        except (OSError, ValueError):
+            return False
+        if meta.get("format") != CACHE_FORMAT_VERSION or meta.get("model") != self.model:
+            return False
+        self.dim = int(meta["dim"])
+        self.dtype = np.dtype(meta["dtype"])
+        return True
+
+    def _refresh(self) -> None:
+        """Index rows appended since the last refresh, by this or another process."""
+        try:
+            keys_size = self._keys_path.stat().st_size
+        except OSError:
+            return
+        if keys_size == self._keys_size or not self._load_meta():
+            return
+
+        row_bytes = self.dim * self.dtype.itemsize
+        rows = min(keys_size // _KEY_BYTES, self._vectors_path.stat().st_size // row_bytes)
+        if rows > self._rows:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._rows * _KEY_BYTES)
+                data = f.read((rows - self._rows) * _KEY_BYTES)
+            for i in range(rows - self._rows):
+                self._index[data[i * _KEY_BYTES:(i + 1) * _KEY_BYTES]] = self._rows + i
+            self._rows = rows
+        self._keys_size = keys_size
+
+    def _matrix_view(self) -> np.memmap:
+        """The memory-mapped matrix, remapped if it predates the latest rows."""
+        if self._matrix is None or self._matrix.shape[0] < self._rows:
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dim)
+            )
+        return self._matrix
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """Vectors for keys (float32 copies), None where missing."""
+        with self._lock:
+            self._refresh()
+            positions = [self._index.get(key) for key in keys]
+            found = [row for row in positions if row is not None]
+            if not found:
+                return [None] * len(keys)
+            values = np.asarray(self._matrix_view()[found], dtype=np.float32)
+        vectors = iter(values)
+        return [next(vectors) if row is not None else None for row in positions]
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray, max_rows: int) -> int:
+        """Append rows for keys not stored yet; returns the number written."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self.dim = int(vectors.shape[1])
+                self._meta_path.write_text(json.dumps({
+                    "format": CACHE_FORMAT_VERSION,
+                    "model": self.model,
+                    "dim": self.dim,
+                    "dtype": self.dtype.name
+                }))
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache ({self.dim})")
+
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index and key not in new_rows:
+                    new_rows[key] = vector
+            new_rows = dict(list(new_rows.items())[:max(0, max_rows - self._rows)])
+            if not new_rows:
+                return 0
+
+            # Vectors first: keys.bin is the commit point
+            row_bytes = self.dim * self.dtype.itemsize
+            self._write_at(
+                self._vectors_path,
+                self._rows * row_bytes,
+                np.asarray(list(new_rows.values()), dtype=self.dtype).tobytes()
+            )
+            self._write_at(self._keys_path, self._rows * _KEY_BYTES, b"".join(new_rows))
+
+            for i, key in enumerate(new_rows):
+                self._index[key] = self._rows + i
+            self._rows += len(new_rows)
+            self._keys_size = self._rows * _KEY_BYTES
+            return len(new_rows)
+
+    @staticmethod
+    def _write_at(path: Path, offset: int, data: bytes) -> None:
+        """Write at offset, dropping anything after it (a torn earlier append)."""
+        with open(path, "r+b" if path.exists() else "w+b") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock against other processes appending to the same store."""
+        if fcntl is None:
+            yield
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by hash(model, text).
+
+    Each model has its own store under cache_dir, holding vectors as a
+    memory-mapped float32 or float16 matrix plus a key index, so the
+    same snippet is embedded once across restarts, re-ingests and every
+    worker process on the host. Stores only grow, up to max_rows rows
+    per model; delete the directory to reset it.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, Path]] = None,
+        dtype: Optional[str] = None,
+        max_rows: Optional[int] = None
+    ):
+        """Initialize EmbeddingCache; defaults come from settings."""
+        self.cache_dir = Path(cache_dir or settings.embedding_cache_dir)
+        self.dtype = dtype or settings.embedding_cache_dtype
+        self.max_rows = max_rows or settings.embedding_cache_max_rows
+        self._stores: Dict[str, _ModelStore] = {}
+        self._stores_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _store(self, model: str) -> _ModelStore:
+        with self._stores_lock:
+            store = self._stores.get(model)
+            if store is None:
+                slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model)
+                digest = hashlib.sha256(model.encode("utf-8")).hexdigest()[:8]
+                store = _ModelStore(self.cache_dir / f"{slug}-{digest}", model, self.dtype)
+                self._stores[model] = store
+            return store
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up cached embeddings.
+
+        Blocking (file I/O); async callers run it with asyncio.to_thread.
+
+        Args:
+            model: Embedding model name
+            texts: Texts to look up
+
+        Returns:
+            A float32 vector per text, or None for a miss
+        """
+        vectors = self._store(model).get_many([embedding_key(model, text) for text in texts])
+        hits = sum(1 for vector in vectors if vector is not None)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return vectors
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> int:
+        """
+        Store embeddings computed for texts.
+
+        Args:
+            model: Embedding model name
+            texts: Embedded texts
+            vectors: Their embeddings
+
+        Returns:
+            Number of new rows written
+        """
+        if not texts:
+            return 0
+        written = self._store(model).put_many(
+            [embedding_key(model, text) for text in texts],
+            np.asarray(vectors, dtype=np.float32),
+            self.max_rows
+        )
+        self.writes += written
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "cache_dir": str(self.cache_dir),
+            "dtype": self.dtype,
+            "max_rows": self.max_rows,
+            "models": {model: store.rows for model, store in self._stores.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global instance
+embedding_cache = EmbeddingCache()
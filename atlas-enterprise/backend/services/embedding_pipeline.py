@@ -0,0 +1,196 @@
+"""
+Embedding Pipeline for ATLAS Enterprise
+Bounded-queue chunk -> embed -> write pipeline for document ingestion.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class EmbeddingBatch:
+    """Chunks moving through the pipeline together."""
+
+    vector_ids: List[str] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    embeddings: Optional[List[List[float]]] = None
+
+    def __len__(self) -> int:
+        return len(self.vector_ids)
+
+
+class _StageTimer:
+    """Busy time (doing work) and blocked time (waiting on a full queue) of one stage."""
+
+    def __init__(self):
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.chunks = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "busy_seconds": round(self.busy, 3),
+            "blocked_seconds": round(self.blocked, 3),
+            "chunks_per_second": round(self.chunks / self.busy, 1) if self.busy > 0 else None
+        }
+
+
+class EmbeddingPipeline:
+    """
+    Three-stage ingestion: chunk producer -> batched embedders -> writer.
+
+    The producer groups (vector_id, text, metadata) chunks into batches
+    of batch_size; `workers` embedders take batches off a bounded queue
+    and pass embedded batches to a single writer over a second bounded
+    queue, so the writer stores one batch while the next ones are being
+    embedded. A full queue blocks the stage feeding it (backpressure),
+    which caps memory at about 2 * queue_size batches whatever the size
+    of the ingest. The first stage to fail cancels the others and its
+    error is raised from run().
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None
+    ):
+        """Initialize EmbeddingPipeline; defaults come from settings."""
+        self.embed = embed
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.workers = workers or settings.embedding_workers
+        self.queue_size = queue_size or settings.embedding_queue_size
+
+        self.runs = 0
+        self.chunks_processed = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def run(
+        self,
+        chunks: Iterable[Tuple[str, str, Dict[str, Any]]],
+        write: Callable[[EmbeddingBatch], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """
+        Embed and write chunks.
+
+        Args:
+            chunks: (vector_id, text, metadata) tuples
+            write: Coroutine storing one embedded batch
+
+        Returns:
+            Throughput statistics of this run
+        """
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        timers = {"produce": _StageTimer(), "embed": _StageTimer(), "write": _StageTimer()}
+        counts = {"batches": 0}
+        start = time.perf_counter()
+
+        async def put(queue: asyncio.Queue, item: Any, timer: _StageTimer) -> None:
+            t = time.perf_counter()
+            await queue.put(item)
+            timer.blocked += time.perf_counter() - t
+
+        async def produce() -> None:
+            timer = timers["produce"]
+            batch = EmbeddingBatch()
+            t = time.perf_counter()
+            for vector_id, text, metadata in chunks:
+                batch.vector_ids.append(vector_id)
+                batch.texts.append(text)
+                batch.metadatas.append(metadata)
+                if len(batch) >= self.batch_size:
+                    timer.busy += time.perf_counter() - t
+                    timer.chunks += len(batch)
+                    await put(embed_queue, batch, timer)
+                    batch = EmbeddingBatch()
+                    t = time.perf_counter()
+            timer.busy += time.perf_counter() - t
+            if batch:
+                timer.chunks += len(batch)
+                await put(embed_queue, batch, timer)
+            for _ in range(self.workers):
+                await put(embed_queue, _DONE, timer)
+
+        async def embed() -> None:
+            timer = timers["embed"]
+            while True:
+                batch = await embed_queue.get()
+                if batch is _DONE:
+                    await put(write_queue, _DONE, timer)
+                    return
+                t = time.perf_counter()
+                batch.embeddings = await self.embed(batch.texts)
+                # Embedders overlap, so busy time is summed across workers
+                timer.busy += time.perf_counter() - t
+                timer.chunks += len(batch)
+                await put(write_queue, batch, timer)
+
+        async def write_all() -> None:
+            timer = timers["write"]
+            remaining = self.workers
+            while remaining:
+                batch = await write_queue.get()
+                if batch is _DONE:
+                    remaining -= 1
+                    continue
+                t = time.perf_counter()
+                await write(batch)
+                timer.busy += time.perf_counter() - t
+                timer.chunks += len(batch)
+                counts["batches"] += 1
+
+        tasks = [asyncio.create_task(produce()), asyncio.create_task(write_all())]
+        tasks += [asyncio.create_task(embed()) for _ in range(self.workers)]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        elapsed = time.perf_counter() - start
+        written = timers["write"].chunks
+        stats = {
+            "chunks": written,
+            "batches": counts["batches"],
+            "batch_size": self.batch_size,
+            "workers": self.workers,
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_second": round(written / elapsed, 1) if elapsed > 0 else None,
+            "stages": {name: timer.as_dict() for name, timer in timers.items()}
+        }
+        self.runs += 1
+        self.chunks_processed += written
+        self.last_run = stats
+        logger.info(
+            f"Embedding pipeline wrote {written} chunks in {counts['batches']} batches "
+            f"({elapsed:.2f}s, {stats['chunks_per_second']} chunks/s)"
+        )
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pipeline settings, totals and the last run's throughput."""
+        return {
+            "batch_size": self.batch_size,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "runs": self.runs,
+            "chunks_processed": self.chunks_processed,
+            "last_run": self.last_run
+        }
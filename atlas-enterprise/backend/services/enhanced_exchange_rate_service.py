@@ -6,7 +6,6 @@ Advanced exchange rate service with multiple sources, auto-updates, and predicti
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 import asyncio
-import httpx
 from forex_python.converter import CurrencyRates, CurrencyConverter
 import json
 import sqlite3
@@ -20,6 +19,8 @@ import schedule
 import time
 import threading
 
+from core.http_client import http_clients
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -268,7 +269,7 @@ class EnhancedExchangeRateService:
     async def _fetch_from_api_source(self, source_name: str, from_currency: str, to_currency: str) -> Optional[float]:
         """Fetch rate from a specific API source."""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with http_clients.session(timeout=10.0) as client:
                 if source_name == "exchangerate_api":
                     url = f"https://api.exchangerate-api.com/v4/latest/{from_currency}"
                     response = await client.get(url)
@@ -288,7 +289,7 @@ class EnhancedExchangeRateService:
     async def _fetch_from_backup_source(self, url: str, from_currency: str, to_currency: str) -> Optional[float]:
         """Fetch rate from backup source."""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with http_clients.session(timeout=10.0) as client:
                 response = await client.get(url)
                 
                 if response.status_code == 200:
@@ -6,10 +6,11 @@ Real exchange rate service using forex-python and fallback APIs.
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import asyncio
-import httpx
 from forex_python.converter import CurrencyRates
 import json
 
+from core.http_client import http_clients
+
 
 class ExchangeRateService:
     """Production service for real currency conversion."""
@@ -40,6 +41,18 @@ class ExchangeRateService:
         """Check if cached rate is still valid."""
         return datetime.now() - timestamp < self._cache_ttl
     
+    def get_rate_timestamp(self, from_currency: str, to_currency: str) -> Optional[datetime]:
+        """
+        Get when the cached rate for a currency pair was fetched.
+        
+        Returns:
+            Fetch time of a still-valid cached rate, otherwise None
+        """
+        cached = self._cache.get(self._get_cache_key(from_currency, to_currency))
+        if cached and self._is_cache_valid(cached[1]):
+            return cached[1]
+        return None
+    
     async def _fetch_from_forex_python(self, from_currency: str, to_currency: str) -> float:
         """Fetch rate using forex-python library."""
         try:
@@ -59,7 +72,7 @@ class ExchangeRateService:
     async def _fetch_from_fallback_api(self, from_currency: str, to_currency: str) -> float:
         """Fetch rate from fallback API."""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with http_clients.session(timeout=10.0) as client:
                 # Try exchangerate-api.com (free, no API key needed)
                 response = await client.get(f"https://api.exchangerate-api.com/v4/latest/{from_currency}")
                 
@@ -4,7 +4,6 @@ Comprehensive integration with free APIs and open-source services.
 """
 
 import asyncio
-import httpx
 import json
 import sqlite3
 from datetime import datetime, timedelta
@@ -20,6 +19,8 @@ from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassifica
 import torch
 from sentence_transformers import SentenceTransformer
 
+from core.http_client import http_clients
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -219,7 +220,7 @@ class FreeAPIIntegrationService:
                 return cached_data
             
             # Make request
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_clients.session(timeout=30.0) as client:
                 response = await client.get(url, params=params, headers=headers)
                 
                 if response.status_code == 200:
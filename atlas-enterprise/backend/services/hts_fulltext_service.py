@@ -0,0 +1,211 @@
+"""
+HTS Full-Text Search Service for ATLAS Enterprise
+Ranked description search using SQLite FTS5 or PostgreSQL tsvector.
+"""
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import select, text, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.tariff import HTSCode
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_QUERY_PART_PATTERN = re.compile(r'(-?)"([^"]+)"|(-?)(\S+)')
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_fts5_query(query: str) -> Optional[str]:
+    """
+    Translate a web-style search string into an FTS5 MATCH expression.
+
+    Supports "quoted phrases", plain words (all required) and -exclusions.
+    Every term is quoted so user input can never inject FTS5 operators.
+
+    Args:
+        query: Raw user query
+
+    Returns:
+        FTS5 expression, or None if the query has no searchable terms
+    """
+    required: List[str] = []
+    excluded: List[str] = []
+
+    for match in _QUERY_PART_PATTERN.finditer(query or ""):
+        negate = match.group(1) or match.group(3)
+        words = _WORD_PATTERN.findall(match.group(2) or match.group(4))
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        (excluded if negate else required).append(term)
+
+    if not required:
+        return None
+
+    expression = " AND ".join(required)
+    for term in excluded:
+        expression += f" NOT {term}"
+    return expression
+
+
+class HTSFullTextService:
+    """Service for ranked full-text search over HTS descriptions."""
+
+    FTS_TABLE = "hts_codes_fts"
+    TS_CONFIG = "english"
+    SEARCH_VECTOR_COLUMN = "search_vector"
+
+    # bm25() column weights: hts_code, brief_description, description
+    BM25_WEIGHTS = (1.0, 10.0, 4.0)
+
+    def __init__(self):
+        """Initialize HTSFullTextService."""
+        self._index_ready = False
+
+    @property
+    def table_name(self) -> str:
+        """Name of the HTS code table."""
+        return HTSCode.__tablename__
+
+    async def check_index(self, db: AsyncSession) -> None:
+        """
+        Check that the full-text index exists for the current database.
+
+        The index is created by the hts_fulltext_index migration: SQLite gets
+        an external-content FTS5 table kept in sync by triggers, PostgreSQL a
+        generated tsvector column with a GIN index. Creating it here would
+        have every worker race to take the table lock at startup.
+
+        Args:
+            db: Database session
+
+        Raises:
+            RuntimeError: If the migration has not been applied
+        """
+        if self._index_ready:
+            return
+
+        dialect = db.bind.dialect.name
+        if dialect == "sqlite":
+            result = await db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": self.FTS_TABLE}
+            )
+        elif dialect == "postgresql":
+            result = await db.execute(
+                text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() "
+                    "AND table_name = :table AND column_name = :column"
+                ),
+                {"table": self.table_name, "column": self.SEARCH_VECTOR_COLUMN}
+            )
+        else:
+            raise ValueError(f"Full-text search not supported on {dialect}")
+
+        if not result.first():
+            raise RuntimeError(
+                "HTS full-text index is missing; run 'alembic upgrade head' in the "
+                "backend directory now that startup has created the tables"
+            )
+
+        self._index_ready = True
+        logger.info(f"HTS full-text index ready ({dialect})")
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int = 20,
+        chapter: Optional[str] = None
+    ) -> List[HTSCode]:
+        """
+        Search HTS descriptions ranked by relevance.
+
+        Args:
+            db: Database session
+            query: Words, "quoted phrases" and -exclusions
+            limit: Maximum results to return
+            chapter: Optional chapter filter
+
+        Returns:
+            List of HTS codes, most relevant first
+        """
+        try:
+            await self.check_index(db)
+
+            if db.bind.dialect.name == "sqlite":
+                hts_codes = await self._search_sqlite(db, query, limit, chapter)
+            else:
+                hts_codes = await self._search_postgres(db, query, limit, chapter)
+
+            logger.info(f"Full-text search found {len(hts_codes)} HTS codes for query: {query}")
+            return hts_codes
+
+        except Exception as e:
+            logger.error(f"Error in HTS full-text search: {e}")
+            raise
+
+    async def _search_sqlite(
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int,
+        chapter: Optional[str]
+    ) -> List[HTSCode]:
+        """Run an FTS5 MATCH ordered by weighted bm25()."""
+        match_expression = build_fts5_query(query)
+        if not match_expression:
+            return []
+
+        fts, table = self.FTS_TABLE, self.table_name
+        weights = ", ".join(str(w) for w in self.BM25_WEIGHTS)
+        chapter_clause = "AND h.hts_2 = :chapter" if chapter else ""
+
+        stmt = text(f"""
+            SELECT h.* FROM {fts}
+            JOIN {table} AS h ON h.id = {fts}.rowid
+            WHERE {fts} MATCH :match AND h.is_active = 1 {chapter_clause}
+            ORDER BY bm25({fts}, {weights}), h.hts_code
+            LIMIT :limit
+        """)
+        params = {"match": match_expression, "limit": limit}
+        if chapter:
+            params["chapter"] = chapter.zfill(2)
+
+        result = await db.execute(select(HTSCode).from_statement(stmt), params)
+        return list(result.scalars().all())
+
+    async def _search_postgres(
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int,
+        chapter: Optional[str]
+    ) -> List[HTSCode]:
+        """Run a tsvector match ordered by ts_rank_cd."""
+        ts_query = func.websearch_to_tsquery(self.TS_CONFIG, query)
+        vector = literal_column(f"{self.table_name}.{self.SEARCH_VECTOR_COLUMN}")
+
+        stmt = select(HTSCode).where(
+            vector.op("@@")(ts_query),
+            HTSCode.is_active == True
+        )
+        if chapter:
+            stmt = stmt.where(HTSCode.hts_2 == chapter.zfill(2))
+
+        # Normalization 1 divides by log(document length), as bm25 does
+        stmt = stmt.order_by(
+            func.ts_rank_cd(vector, ts_query, 1).desc(),
+            HTSCode.hts_code
+        ).limit(limit)
+
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
+
+# Global instance
+hts_fulltext_service = HTSFullTextService()
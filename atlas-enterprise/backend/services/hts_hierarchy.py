@@ -0,0 +1,220 @@
+"""
+HTS Hierarchy for ATLAS Enterprise
+In-memory chapter > heading > subheading > tariff line tree with per-node aggregates.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.tariff import HTSCode, TariffRate
+
+# Tree level -> number of code digits; the root sits above the chapters
+LEVELS = {"chapter": 2, "hts_4": 4, "hts_6": 6, "hts_8": 8, "hts_10": 10}
+
+# MFN rate distribution buckets: label -> inclusive upper bound (%)
+RATE_BUCKETS = (
+    ("free", 0.0),
+    ("0-5", 5.0),
+    ("5-10", 10.0),
+    ("10-25", 25.0),
+    ("25+", math.inf),
+)
+
+
+def normalize_node_code(code: str) -> str:
+    """Strip the dots and spaces users type inside HTS codes."""
+    return (code or "").replace(".", "").replace(" ", "").strip()
+
+
+class HTSNode:
+    """One node of the HTS tree with aggregates over every code below it."""
+
+    __slots__ = (
+        "code", "level", "description", "parent", "children",
+        "code_count", "rate_count", "rate_sum", "min_rate", "max_rate",
+        "distribution", "ad_rate_count", "cvd_rate_count",
+        "ad_code_count", "cvd_code_count", "payload"
+    )
+
+    def __init__(self, code: str, level: str, parent: Optional["HTSNode"]):
+        self.code = code
+        self.level = level
+        self.description: Optional[str] = None
+        self.parent = parent
+        self.children: Dict[str, "HTSNode"] = {}
+        self.code_count = 0
+        self.rate_count = 0
+        self.rate_sum = 0.0
+        self.min_rate: Optional[float] = None
+        self.max_rate: Optional[float] = None
+        self.distribution = [0] * len(RATE_BUCKETS)
+        self.ad_rate_count = 0
+        self.cvd_rate_count = 0
+        self.ad_code_count = 0
+        self.cvd_code_count = 0
+        self.payload: Dict[str, Any] = {}
+
+    @property
+    def avg_rate(self) -> Optional[float]:
+        return self.rate_sum / self.rate_count if self.rate_count else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact form used in a parent's child list."""
+        return {
+            "code": self.code,
+            "level": self.level,
+            "description": self.description,
+            "code_count": self.code_count,
+            "child_count": len(self.children),
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "has_antidumping": self.ad_code_count > 0,
+            "has_countervailing": self.cvd_code_count > 0
+        }
+
+    def aggregates(self) -> Dict[str, Any]:
+        """Counts, MFN rate distribution and AD/CVD presence below this node."""
+        avg_rate = self.avg_rate
+        return {
+            "code_count": self.code_count,
+            "rate_count": self.rate_count,
+            "mfn_rate": {
+                "min": self.min_rate,
+                "avg": round(avg_rate, 4) if avg_rate is not None else None,
+                "max": self.max_rate,
+                "distribution": {
+                    label: count for (label, _), count in zip(RATE_BUCKETS, self.distribution)
+                }
+            },
+            "antidumping": {
+                "code_count": self.ad_code_count,
+                "rate_count": self.ad_rate_count
+            },
+            "countervailing": {
+                "code_count": self.cvd_code_count,
+                "rate_count": self.cvd_rate_count
+            }
+        }
+
+
+class HTSHierarchy:
+    """
+    Immutable HTS tree built from active codes and rates.
+
+    Every 10-digit code sits under its 8-, 6-, 4- and 2-digit prefixes.
+    Aggregates are summed bottom-up once at build time and each node's
+    response (aggregates, ancestors and child summaries) is precomputed,
+    so a drill-down step is a single dict lookup.
+    """
+
+    def __init__(self, hts_codes: Iterable[HTSCode], rates: Iterable[TariffRate]):
+        """Build the tree and precompute node responses."""
+        rates_by_hts: Dict[int, List[TariffRate]] = {}
+        for rate in rates:
+            rates_by_hts.setdefault(rate.hts_code_id, []).append(rate)
+
+        self.root = HTSNode("", "root", None)
+        self._nodes: Dict[str, HTSNode] = {"": self.root}
+        self._levels: Dict[str, List[HTSNode]] = {level: [] for level in LEVELS}
+
+        for hts in sorted(hts_codes, key=lambda c: c.hts_code):
+            path = self._insert(hts)
+            self._accumulate(path, rates_by_hts.get(hts.id, ()))
+
+        for node in self._nodes.values():
+            node.payload = self._build_payload(node)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _insert(self, hts: HTSCode) -> List[HTSNode]:
+        """Create missing nodes along the code's path; returns root-to-leaf path."""
+        node = self.root
+        path = [node]
+        for level, length in LEVELS.items():
+            code = hts.hts_code[:length]
+            child = node.children.get(code)
+            if child is None:
+                child = HTSNode(code, level, node)
+                node.children[code] = child
+                self._nodes[code] = child
+                self._levels[level].append(child)
+            path.append(child)
+            node = child
+
+        # Chapters take the smallest description, as the rollup SQL's MIN() does
+        chapter = path[1]
+        if hts.chapter_description and (
+            chapter.description is None or hts.chapter_description < chapter.description
+        ):
+            chapter.description = hts.chapter_description
+        node.description = hts.brief_description or hts.description
+        return path
+
+    @staticmethod
+    def _accumulate(path: List[HTSNode], rates: Iterable[TariffRate]) -> None:
+        """Add one code and its rate rows to every node on its path."""
+        mfn_rates = []
+        buckets = [0] * len(RATE_BUCKETS)
+        ad_count = cvd_count = 0
+        for rate in rates:
+            mfn = rate.mfn_rate
+            mfn_rates.append(mfn)
+            for i, (_, upper) in enumerate(RATE_BUCKETS):
+                if mfn <= upper:
+                    buckets[i] += 1
+                    break
+            ad_count += 1 if rate.antidumping_duty else 0
+            cvd_count += 1 if rate.countervailing_duty else 0
+
+        rate_min = min(mfn_rates, default=None)
+        rate_max = max(mfn_rates, default=None)
+        rate_sum = sum(mfn_rates)
+
+        for node in path:
+            node.code_count += 1
+            if mfn_rates:
+                node.rate_count += len(mfn_rates)
+                node.rate_sum += rate_sum
+                node.min_rate = rate_min if node.min_rate is None else min(node.min_rate, rate_min)
+                node.max_rate = rate_max if node.max_rate is None else max(node.max_rate, rate_max)
+                for i, count in enumerate(buckets):
+                    node.distribution[i] += count
+            node.ad_rate_count += ad_count
+            node.cvd_rate_count += cvd_count
+            node.ad_code_count += 1 if ad_count else 0
+            node.cvd_code_count += 1 if cvd_count else 0
+
+    @staticmethod
+    def _build_payload(node: HTSNode) -> Dict[str, Any]:
+        ancestors = []
+        parent = node.parent
+        while parent is not None and parent.parent is not None:
+            ancestors.append({"code": parent.code, "level": parent.level, "description": parent.description})
+            parent = parent.parent
+        ancestors.reverse()
+
+        return {
+            "code": node.code,
+            "level": node.level,
+            "description": node.description,
+            "ancestors": ancestors,
+            "aggregates": node.aggregates(),
+            "children": [child.summary() for child in node.children.values()]
+        }
+
+    def get_node(self, code: str = "") -> Optional[HTSNode]:
+        """
+        Look up a node by code prefix.
+
+        Args:
+            code: 2, 4, 6, 8 or 10 digits (dots optional); empty for the root
+
+        Returns:
+            The node, or None if no active code has that prefix
+        """
+        return self._nodes.get(normalize_node_code(code))
+
+    def level_nodes(self, level: str) -> List[HTSNode]:
+        """All nodes of one level, ordered by code."""
+        return self._levels[level]
@@ -0,0 +1,336 @@
+"""
+HTS Popularity Tracker for ATLAS Enterprise
+Time-decayed count-min sketch and heavy-hitter table of the most used HTS codes.
+"""
+
+import asyncio
+import base64
+import hashlib
+import heapq
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Forward-decay weights grow as 2**(age / half_life); rescale well before overflow
+_MAX_WEIGHT_EXPONENT = 64
+
+
+@lru_cache(maxsize=16384)
+def _sketch_columns(code: str, depth: int, width: int) -> np.ndarray:
+    """Counter index of a code in each sketch row (stable across processes)."""
+    digest = hashlib.blake2b(code.encode(), digest_size=8 * depth).digest()
+    return (np.frombuffer(digest, dtype="<u8") % width).astype(np.intp)
+
+
+class HTSPopularityTracker:
+    """
+    Streaming estimate of how often each HTS code is looked up or priced.
+
+    Counts live in a count-min sketch: every code maps to one counter per
+    row and its estimate is the smallest of them, which never undercounts
+    and needs fixed memory however many codes appear. Counts decay with a
+    half-life using forward decay: an event at time t is added with weight
+    2 ** ((t - landmark) / half_life), so old counters are never touched
+    and scores are divided by the current weight when read.
+
+    A heavy-hitter table keeps the `capacity` codes with the largest
+    estimates, so the top K is read directly without any aggregate query.
+
+    Workers share one state in the cache. Each process keeps the uses it
+    recorded since its last save in a pending sketch; persist() adds them
+    to the shared state in an atomic read-merge-write and adopts the
+    merged result, so every worker ranks from the same counts plus its
+    own unsaved uses.
+    """
+
+    STATE_KEY = "hts_popularity:state"
+    STATE_TTL_SECONDS = 30 * 24 * 3600
+
+    def __init__(
+        self,
+        width: int = 2048,
+        depth: int = 4,
+        capacity: int = 200,
+        half_life_hours: Optional[float] = None
+    ):
+        """Initialize HTSPopularityTracker; the half-life defaults to settings."""
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.half_life = (half_life_hours or settings.popularity_half_life_hours) * 3600
+
+        # Records also arrive from batch pricing running in worker threads
+        self._lock = threading.Lock()
+        self._rows = np.arange(depth)
+        self._sketch = np.zeros((depth, width))
+        self._heavy: Dict[str, float] = {}
+        self._floor = 0.0
+        self._landmark = time.time()
+
+        # Uses not yet added to the shared state
+        self._pending = np.zeros((depth, width))
+        self._pending_codes: set = set()
+        self.shared_events = 0
+
+        self.events = 0
+        self._persisted_events = 0
+        self._persist_task: Optional[asyncio.Task] = None
+
+    def record(self, hts_code: str, count: int = 1) -> None:
+        """
+        Count uses of an HTS code.
+
+        Args:
+            hts_code: Normalized 10-digit HTS code
+            count: Number of uses to add
+        """
+        with self._lock:
+            self._add(hts_code, count * self._weight(time.time()))
+            self.events += count
+
+    def record_many(self, hts_codes: Iterable[str]) -> None:
+        """Count one use per occurrence, updating each distinct code once."""
+        counts = Counter(hts_codes)
+        if not counts:
+            return
+        with self._lock:
+            weight = self._weight(time.time())
+            for code, count in counts.items():
+                self._add(code, count * weight)
+            self.events += sum(counts.values())
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """
+        Get the most used codes.
+
+        Args:
+            k: Number of codes to return
+
+        Returns:
+            (hts_code, decayed use count) pairs, most used first
+        """
+        with self._lock:
+            weight = self._weight(time.time())
+            ranked = heapq.nlargest(k, self._heavy.items(), key=lambda item: item[1])
+        return [(code, score / weight) for code, score in ranked]
+
+    def _weight(self, now: float) -> float:
+        """Forward-decay weight of an event at `now`, rescaling if it grew too large."""
+        exponent = (now - self._landmark) / self.half_life
+        if exponent > _MAX_WEIGHT_EXPONENT:
+            self._rescale(now)
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _rescale(self, landmark: float) -> None:
+        """Move the landmark forward, shrinking stored weights to match."""
+        factor = 2.0 ** ((self._landmark - landmark) / self.half_life)
+        self._sketch *= factor
+        self._pending *= factor
+        for code in self._heavy:
+            self._heavy[code] *= factor
+        self._floor *= factor
+        self._landmark = landmark
+
+    def _add(self, code: str, amount: float) -> None:
+        """Add weighted uses to the sketch and offer the code to the heavy-hitter table."""
+        columns = _sketch_columns(code, self.depth, self.width)
+        self._sketch[self._rows, columns] += amount
+        self._pending[self._rows, columns] += amount
+        self._pending_codes.add(code)
+        self._offer(code, float(self._sketch[self._rows, columns].min()))
+
+    def _offer(self, code: str, estimate: float) -> None:
+        """Keep the code if it is, or now beats, one of the `capacity` largest."""
+        heavy = self._heavy
+        if code in heavy or len(heavy) < self.capacity:
+            heavy[code] = estimate
+            return
+
+        # _floor is a lower bound on the table minimum, so most codes stop here
+        if estimate <= self._floor:
+            return
+        weakest = min(heavy, key=heavy.get)
+        self._floor = heavy[weakest]
+        if estimate > self._floor:
+            del heavy[weakest]
+            heavy[code] = estimate
+
+    def _estimates(self, sketch: np.ndarray, codes: Iterable[str]) -> Dict[str, float]:
+        """The `capacity` codes with the largest estimates in sketch."""
+        estimates = (
+            (code, float(sketch[self._rows, _sketch_columns(code, self.depth, self.width)].min()))
+            for code in set(codes)
+        )
+        return dict(heapq.nlargest(self.capacity, estimates, key=lambda item: item[1]))
+
+    def _decode_state(self, state: Optional[Dict[str, Any]]) -> Optional[Tuple[np.ndarray, float]]:
+        """Saved sketch and landmark, or None if missing or of a different layout."""
+        if not state:
+            return None
+        if (state.get("width"), state.get("depth"), state.get("half_life")) != (
+            self.width, self.depth, self.half_life
+        ):
+            logger.warning("Ignoring saved HTS popularity state with a different sketch layout")
+            return None
+        sketch = np.frombuffer(
+            base64.b64decode(state["sketch"]), dtype="<f8"
+        ).reshape(self.depth, self.width)
+        return sketch, state["landmark"]
+
+    def _merge_pending(
+        self,
+        state: Optional[Dict[str, Any]],
+        pending: np.ndarray,
+        pending_codes: set,
+        landmark: float,
+        events: int
+    ) -> Dict[str, Any]:
+        """Shared state with pending uses added, expressed at `landmark`."""
+        sketch = pending.copy()
+        heavy_codes = set(pending_codes)
+        shared_events = 0
+        decoded = self._decode_state(state)
+        if decoded is not None:
+            saved, saved_landmark = decoded
+            sketch += saved * 2.0 ** ((saved_landmark - landmark) / self.half_life)
+            heavy_codes |= set(state["heavy"])
+            shared_events = state.get("events", 0)
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "half_life": self.half_life,
+            "landmark": landmark,
+            "events": shared_events + events,
+            "sketch": base64.b64encode(sketch.astype("<f8").tobytes()).decode(),
+            "heavy": self._estimates(sketch, heavy_codes)
+        }
+
+    def _adopt_state(self, state: Dict[str, Any]) -> None:
+        """Replace the local view with a shared state plus the uses still pending."""
+        decoded = self._decode_state(state)
+        if decoded is None:
+            return
+        saved, saved_landmark = decoded
+        with self._lock:
+            self._sketch = saved * 2.0 ** ((saved_landmark - self._landmark) / self.half_life)
+            self._sketch += self._pending
+            self._heavy = self._estimates(
+                self._sketch, set(state["heavy"]) | set(self._heavy) | self._pending_codes
+            )
+            self._floor = 0.0
+            self.shared_events = state.get("events", 0)
+
+    async def load(self) -> bool:
+        """Read the shared state from the cache into this tracker."""
+        from core.database import get_cache
+
+        cache = get_cache()
+        if cache is None:
+            return False
+        state = await cache.get(self.STATE_KEY)
+        if self._decode_state(state) is None:
+            return False
+
+        self._adopt_state(state)
+        logger.info(f"Loaded HTS popularity state ({self.shared_events} events)")
+        return True
+
+    async def persist(self) -> bool:
+        """
+        Add the uses recorded since the last save to the shared state.
+
+        The merge is atomic, so concurrent saves from other workers are
+        never overwritten; the merged state then becomes the local view.
+        """
+        from core.database import get_cache
+
+        cache = get_cache()
+        if cache is None:
+            return False
+
+        with self._lock:
+            pending, pending_codes = self._pending, self._pending_codes
+            self._pending = np.zeros((self.depth, self.width))
+            self._pending_codes = set()
+            landmark = self._landmark
+            events = self.events - self._persisted_events
+            persisted_events = self.events
+
+        state = await cache.update(
+            self.STATE_KEY,
+            lambda shared: self._merge_pending(shared, pending, pending_codes, landmark, events),
+            ttl=self.STATE_TTL_SECONDS
+        )
+        if state is None:
+            # Keep the uses for the next attempt, at the current landmark
+            with self._lock:
+                self._pending += pending * 2.0 ** ((landmark - self._landmark) / self.half_life)
+                self._pending_codes |= pending_codes
+            return False
+
+        self._persisted_events = persisted_events
+        self._adopt_state(state)
+        return True
+
+    async def start(self, interval_seconds: Optional[int] = None) -> None:
+        """
+        Load the shared state and start syncing with it periodically.
+
+        Args:
+            interval_seconds: Seconds between syncs; defaults to settings
+        """
+        if self._persist_task and not self._persist_task.done():
+            return
+        await self.load()
+        interval = interval_seconds or settings.popularity_persist_interval_seconds
+        self._persist_task = asyncio.create_task(self._persist_periodically(interval))
+
+    async def stop(self) -> None:
+        """Stop periodic saving and save once more."""
+        if self._persist_task:
+            self._persist_task.cancel()
+            try:
+                await self._persist_task
+            except asyncio.CancelledError:
+                pass
+            self._persist_task = None
+        await self.persist()
+
+    async def _persist_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Without local uses to add, only pick up the other workers' counts
+                if self.events == self._persisted_events:
+                    await self.load()
+                else:
+                    await self.persist()
+            except Exception as e:
+                logger.error(f"Failed to sync HTS popularity state: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracker statistics."""
+        return {
+            "events": self.events,
+            "shared_events": self.shared_events,
+            "tracked_codes": len(self._heavy),
+            "capacity": self.capacity,
+            "sketch_width": self.width,
+            "sketch_depth": self.depth,
+            "half_life_hours": self.half_life / 3600,
+            "unsaved_events": self.events - self._persisted_events
+        }
+
+
+# Global instance
+hts_popularity_tracker = HTSPopularityTracker()
@@ -0,0 +1,222 @@
+"""
+HTS Search Index for ATLAS Enterprise
+In-memory digit trie and description token index for HTS code search.
+"""
+
+import heapq
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import accumulate
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from models.tariff import HTSCode
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_EXPANSION_CACHE_SIZE = 2048
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split free text into lowercase alphanumeric tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens in order of appearance
+    """
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(str(text).lower())
+
+
+def normalize_code_query(query: str) -> str:
+    """Strip the dots and spaces users type inside HTS codes."""
+    return query.replace(".", "").replace(" ", "").strip()
+
+
+class _TrieNode:
+    """Digit trie node covering a contiguous range of the sorted code list."""
+
+    __slots__ = ("children", "start", "end")
+
+    def __init__(self, start: int):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.start = start
+        self.end = start
+
+
+class HTSSearchIndex:
+    """
+    Immutable search index over active HTS codes.
+
+    Codes are kept sorted, so every trie node maps to a contiguous slice of
+    the code list and a prefix lookup costs O(len(prefix) + limit).
+    Descriptions are indexed as token -> sorted positions posting lists.
+    Queries the index cannot answer fall back to a substring scan of one
+    lowercase string holding every code and description, which keeps the
+    ilike '%query%' matches of the SQL path ("0110" finds 0101.10...).
+    """
+
+    def __init__(self, hts_codes: Iterable[HTSCode]):
+        """Build the trie and token index from HTS code rows."""
+        self.codes: List[HTSCode] = sorted(hts_codes, key=lambda c: c.hts_code)
+        self.built_at = datetime.utcnow()
+        self._root = _TrieNode(0)
+        self._postings: Dict[str, List[int]] = {}
+
+        for position, hts in enumerate(self.codes):
+            self._insert_code(hts.hts_code, position)
+
+            tokens = set(tokenize(hts.description))
+            tokens.update(tokenize(hts.brief_description))
+            for token in tokens:
+                self._postings.setdefault(token, []).append(position)
+
+        self._vocabulary = sorted(self._postings)
+        self._expansions: Dict[str, FrozenSet[int]] = {}
+
+        # One line per position; NUL keeps matches from spanning fields
+        lines = [
+            f"{hts.hts_code}\0{(hts.description or '').lower()}\0{(hts.brief_description or '').lower()}"
+            for hts in self.codes
+        ]
+        self._haystack = "\n".join(lines)
+        self._line_starts = [0, *accumulate(len(line) + 1 for line in lines)]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _insert_code(self, code: str, position: int) -> None:
+        """Insert a code; positions arrive in sorted order so ranges stay contiguous."""
+        node = self._root
+        node.end = position + 1
+        for digit in code:
+            child = node.children.get(digit)
+            if child is None:
+                child = _TrieNode(position)
+                node.children[digit] = child
+            child.end = position + 1
+            node = child
+
+    def _prefix_range(self, prefix: str) -> range:
+        """Return the positions of all codes starting with prefix."""
+        node = self._root
+        for digit in prefix:
+            node = node.children.get(digit)
+            if node is None:
+                return range(0)
+        return range(node.start, node.end)
+
+    def _token_positions(self, token: str) -> FrozenSet[int]:
+        """Positions whose descriptions contain a word starting with token."""
+        positions = self._expansions.get(token)
+        if positions is not None:
+            return positions
+
+        matched = set()
+        i = bisect_left(self._vocabulary, token)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+            matched.update(self._postings[self._vocabulary[i]])
+            i += 1
+        positions = frozenset(matched)
+
+        # Keystroke searches repeat the same prefixes; the index never changes
+        if len(self._expansions) >= _EXPANSION_CACHE_SIZE:
+            self._expansions.clear()
+        self._expansions[token] = positions
+        return positions
+
+    def _substring_positions(self, needle: str, limit: int, chapter: Optional[str]) -> List[int]:
+        """First positions (in code order) whose code or descriptions contain needle."""
+        if not needle or "\n" in needle or "\0" in needle:
+            return []
+        span = self._prefix_range(chapter) if chapter else range(len(self.codes))
+        if not span:
+            return []
+
+        positions: List[int] = []
+        start, stop = self._line_starts[span.start], self._line_starts[span.stop] - 1
+        while len(positions) < limit:
+            found = self._haystack.find(needle, start, stop)
+            if found < 0:
+                break
+            position = bisect_right(self._line_starts, found) - 1
+            positions.append(position)
+            start = self._line_starts[position + 1]
+        return positions
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        chapter: Optional[str] = None
+    ) -> List[HTSCode]:
+        """
+        Search codes by prefix or description tokens.
+
+        Mirrors TariffDatabaseService.search_hts_codes: exact code matches
+        first, then code order, restricted to an optional chapter. When
+        neither the code trie nor the description tokens match, codes and
+        descriptions containing the query anywhere are returned instead.
+
+        Args:
+            query: Code prefix (dots optional) or description words
+            limit: Maximum results to return
+            chapter: Optional 2-digit chapter filter
+
+        Returns:
+            List of matching HTS codes
+        """
+        query = (query or "").strip()
+        chapter = chapter.zfill(2) if chapter else None
+        code_query = normalize_code_query(query)
+
+        if not query or code_query.isdigit():
+            prefix = code_query
+            if chapter and len(prefix) < len(chapter) and chapter.startswith(prefix):
+                prefix = chapter
+            # A code outside the chapter can still contain the digits inside it
+            if chapter and not prefix.startswith(chapter):
+                positions = []
+            else:
+                positions = list(self._prefix_range(prefix)[:limit])
+
+            # Numbers inside descriptions ("12 volts") still deserve a hit
+            if query and len(positions) < limit:
+                chapter_range = self._prefix_range(chapter) if chapter else None
+                extra = (
+                    p for p in self._token_positions(code_query)
+                    if p not in positions and (chapter_range is None or p in chapter_range)
+                )
+                positions.extend(heapq.nsmallest(limit - len(positions), extra))
+        else:
+            # Punctuation-only queries have no tokens and go straight to the scan
+            candidate_sets = sorted(
+                (self._token_positions(token) for token in tokenize(query)), key=len
+            )
+            matched = candidate_sets[0] if candidate_sets else frozenset()
+            for positions_set in candidate_sets[1:]:
+                if not matched:
+                    break
+                matched = matched & positions_set
+
+            if chapter:
+                chapter_range = self._prefix_range(chapter)
+                matched = (p for p in matched if p in chapter_range)
+            positions = heapq.nsmallest(limit, matched)
+
+        if query and not positions:
+            needle = code_query if code_query.isdigit() else query.lower()
+            positions = self._substring_positions(needle, limit, chapter)
+
+        results = [self.codes[p] for p in positions[:limit]]
+
+        # Exact code match ranks first, as in the SQL path
+        if code_query:
+            results.sort(key=lambda c: c.hts_code != code_query)
+        return results
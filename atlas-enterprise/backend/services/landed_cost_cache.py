@@ -0,0 +1,135 @@
+"""
+Landed Cost Cache for ATLAS Enterprise
+Redis-backed cache of landed-cost results keyed on inputs, tariff version and FX rate.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from core.database import get_cache
+from core.logging import get_logger
+from services.exchange_rate_service import exchange_rate_service
+from services.tariff_snapshot import tariff_snapshot_service
+
+logger = get_logger(__name__)
+
+
+class LandedCostCache:
+    """
+    Cache of TariffCalculationEngine.calculate_landed_cost results.
+
+    Keys combine a hash of the normalized request with the tariff data
+    version and the fetch time of the FX rate used. The data version is
+    the one the calculation reads at: the current snapshot's
+    data_version, or the shared counter itself when the snapshot is
+    stale and rates come from the database. A worker whose snapshot
+    predates a change therefore keeps to the old version's entries
+    instead of storing old-rate results under the new one, and a
+    refreshed FX rate has a new timestamp. Superseded entries are never
+    read again and expire by TTL.
+    """
+
+    KEY_PREFIX = "landed_cost"
+    TTL_SECONDS = 3600
+
+    def __init__(self):
+        """Initialize LandedCostCache."""
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def build_key(
+        self,
+        hts_code: str,
+        country_code: str,
+        product_value: float,
+        quantity: float,
+        freight_cost: float,
+        insurance_cost: float,
+        other_costs: float,
+        currency: str,
+        as_of: Optional[datetime] = None
+    ) -> Optional[str]:
+        """
+        Build the cache key for a calculation request.
+
+        Warms the FX rate first so the key carries the timestamp of the rate
+        the calculation will use.
+
+        Returns:
+            Cache key, or None when the cache is unavailable
+        """
+        cache = get_cache()
+        if cache is None:
+            return None
+
+        currency = currency.upper()
+        fx_timestamp = "base"
+        if currency != "USD":
+            await exchange_rate_service.get_exchange_rate(currency, "USD")
+            fetched_at = exchange_rate_service.get_rate_timestamp(currency, "USD")
+            fx_timestamp = fetched_at.isoformat() if fetched_at else "uncached"
+
+        snapshot = tariff_snapshot_service.get()
+        if snapshot is not None:
+            tariff_version = snapshot.data_version
+        else:
+            tariff_version = await tariff_snapshot_service.read_data_version() or 0
+
+        request = [
+            str(hts_code).replace(".", "").zfill(10),
+            country_code.upper(),
+            currency,
+            *(repr(float(v)) for v in (
+                product_value, quantity, freight_cost, insurance_cost, other_costs
+            ))
+        ]
+        if as_of is not None:
+            request.append(as_of.isoformat())
+        digest = hashlib.sha256(json.dumps(request).encode()).hexdigest()[:32]
+        return f"{self.KEY_PREFIX}:{tariff_version}:{fx_timestamp}:{digest}"
+
+    async def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Get a cached entry and count the hit or miss."""
+        if key is None:
+            return None
+        entry = await get_cache().get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def set(self, key: Optional[str], entry: Dict[str, Any]) -> None:
+        """Store a calculation entry."""
+        if key is None:
+            return
+        if not await get_cache().set(key, entry, ttl=self.TTL_SECONDS):
+            self.errors += 1
+
+    async def invalidate(self) -> Optional[int]:
+        """
+        Bump the shared tariff data version so existing entries stop matching.
+
+        Every worker's snapshot reloads at the new version as well.
+
+        Returns:
+            The new data version, or None when Redis is unavailable
+        """
+        return await tariff_snapshot_service.publish_change()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": (self.hits / lookups * 100) if lookups else 0.0
+        }
+
+
+# Global instance
+landed_cost_cache = LandedCostCache()
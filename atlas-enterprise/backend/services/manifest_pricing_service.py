@@ -0,0 +1,299 @@
+"""
+Manifest Pricing Service for ATLAS Enterprise
+Streams CSV/XLSX shipment manifests through the batch landed-cost engine.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from schemas.tariff import TariffCalculationRequest
+from core.logging import get_logger, log_business_event
+from services.tariff_calculation_engine import TariffCalculationEngine
+
+logger = get_logger(__name__)
+
+MANIFEST_CHUNK_SIZE = 5000
+
+INPUT_COLUMNS = (
+    "hts_code", "country_code", "product_value", "quantity",
+    "freight_cost", "insurance_cost", "other_costs", "currency", "as_of"
+)
+REQUIRED_COLUMNS = ("hts_code", "country_code", "product_value")
+PRICED_COLUMNS = (
+    "exchange_rate_used", "tariff_rate", "antidumping_rate", "countervailing_rate",
+    "cif_value", "duty_amount", "ad_amount", "cvd_amount", "mpf_amount", "hmf_amount",
+    "total_landed_cost", "unit_price", "unit_landed_cost"
+)
+OUTPUT_COLUMNS = ("row", "status", "error", *INPUT_COLUMNS, *PRICED_COLUMNS)
+
+
+def _header_names(cells: Any) -> List[str]:
+    """Normalize header cells to the lowercase column names rows are keyed by."""
+    return [str(cell or "").strip().lower() for cell in cells or ()]
+
+
+def _is_excel(filename: str) -> bool:
+    return filename.lower().endswith((".xlsx", ".xlsm"))
+
+
+class ManifestPricingService:
+    """
+    Prices uploaded shipment manifests in constant memory.
+
+    Rows are read one at a time (csv module, or openpyxl in read-only
+    mode), validated with TariffCalculationRequest and priced
+    MANIFEST_CHUNK_SIZE at a time through TariffCalculationEngine.price_batch.
+    Each chunk is written out as CSV or NDJSON before the next one is
+    read, so only one chunk is ever held in memory.
+    """
+
+    def __init__(self, chunk_size: int = MANIFEST_CHUNK_SIZE):
+        """Initialize ManifestPricingService."""
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def iter_rows(file: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+        """
+        Read manifest rows as dicts keyed by lowercase header.
+
+        Args:
+            file: Uploaded file (seekable; Excel files are zip archives)
+            filename: Original file name; .xlsx/.xlsm are read as Excel
+
+        Returns:
+            Iterator of rows in file order
+        """
+        if _is_excel(filename):
+            workbook = load_workbook(file, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = _header_names(next(rows, ()))
+                for values in rows:
+                    if any(value is not None for value in values):
+                        yield dict(zip(header, values))
+            finally:
+                workbook.close()
+        else:
+            text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+            try:
+                reader = csv.DictReader(text)
+                reader.fieldnames = _header_names(reader.fieldnames)
+                yield from reader
+            finally:
+                # Leave the underlying file open for the caller
+                text.detach()
+
+    @staticmethod
+    def read_header(file: BinaryIO, filename: str) -> List[str]:
+        """
+        Read the manifest's column names without reading any data row.
+
+        Args:
+            file: Uploaded file
+            filename: Original file name; .xlsx/.xlsm are read as Excel
+
+        Returns:
+            Lowercase column names; empty for an empty file
+        """
+        if _is_excel(filename):
+            workbook = load_workbook(file, read_only=True, data_only=True)
+            try:
+                return _header_names(next(workbook.active.iter_rows(values_only=True), ()))
+            finally:
+                workbook.close()
+
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            return _header_names(next(csv.reader(text), ()))
+        finally:
+            text.detach()
+
+    def missing_columns(self, file: BinaryIO, filename: str) -> List[str]:
+        """
+        Check the header row for the required columns, then rewind the file.
+
+        Header-only and empty manifests are checked too.
+
+        Returns:
+            Required columns absent from the header
+        """
+        try:
+            header = self.read_header(file, filename)
+            return [column for column in REQUIRED_COLUMNS if column not in header]
+        finally:
+            file.seek(0)
+
+    @staticmethod
+    def _parse_row(row: Dict[str, Any]) -> TariffCalculationRequest:
+        """Validate one manifest row; blank optional cells take the request defaults."""
+        values = {}
+        for column in INPUT_COLUMNS:
+            value = row.get(column)
+            if isinstance(value, str):
+                value = value.strip()
+            if value is None or value == "":
+                continue
+            if column == "hts_code":
+                # Spreadsheets store codes as numbers and users type dots
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                value = str(value).replace(".", "").replace(" ", "")
+            values[column] = value
+        return TariffCalculationRequest(**values)
+
+    def _read_chunk(
+        self,
+        rows: Iterator[Dict[str, Any]],
+        first_row: int
+    ) -> Tuple[List[Tuple[int, TariffCalculationRequest]], List[Dict[str, Any]]]:
+        """Read and validate the next chunk; returns (valid rows, failed rows)."""
+        valid, failed = [], []
+        for line, row in enumerate(islice(rows, self.chunk_size), start=first_row):
+            try:
+                valid.append((line, self._parse_row(row)))
+            except Exception as e:
+                failed.append({"row": line, "status": "failed", "error": str(e), **{
+                    column: row.get(column) for column in INPUT_COLUMNS
+                }})
+        return valid, failed
+
+    @staticmethod
+    def _price_chunk(
+        rate_context: Dict[str, Any],
+        fx_rates: Dict[str, float],
+        valid: List[Tuple[int, TariffCalculationRequest]]
+    ) -> List[Dict[str, Any]]:
+        """Price validated rows in one vectorized pass."""
+        if not valid:
+            return []
+        requests = [request for _, request in valid]
+        priced = TariffCalculationEngine.price_batch(
+            rate_context,
+            fx_rates,
+            [r.hts_code for r in requests],
+            [r.country_code for r in requests],
+            [r.product_value for r in requests],
+            [r.quantity for r in requests],
+            [r.freight_cost for r in requests],
+            [r.insurance_cost for r in requests],
+            [r.other_costs for r in requests],
+            [r.currency for r in requests],
+            [r.as_of for r in requests]
+        )
+
+        columns = priced["columns"]
+        errors = {error["index"]: error["error"] for error in priced["errors"]}
+        results = []
+        for offset, (line, request) in enumerate(valid):
+            result = {"row": line, "status": columns["status"][offset], "error": errors.get(offset)}
+            result.update(request.model_dump())
+            for name in PRICED_COLUMNS:
+                result[name] = columns[name][offset]
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _format(results: List[Dict[str, Any]], output_format: str, header: bool) -> str:
+        """Render priced rows as CSV (optionally with header) or NDJSON lines."""
+        if output_format == "ndjson":
+            return "".join(json.dumps(result, default=str) + "\n" for result in results)
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=OUTPUT_COLUMNS, extrasaction="ignore")
+        if header:
+            writer.writeheader()
+        writer.writerows(results)
+        return buffer.getvalue()
+
+    async def stream_priced_manifest(
+        self,
+        file: BinaryIO,
+        filename: str,
+        output_format: str = "csv",
+        user_id: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Price a manifest chunk by chunk, yielding formatted output.
+
+        Parsing, validation and pricing run on worker threads; tariff rows
+        come from the snapshot, or from one session opened for the stream
+        when no current snapshot is loaded. Row numbers count data rows
+        from 1, excluding the header. The file is closed when the stream
+        ends or the client disconnects.
+
+        Args:
+            file: Uploaded manifest
+            filename: Original file name, used to pick the reader
+            output_format: "csv" or "ndjson"
+            user_id: User pricing the manifest
+
+        Returns:
+            Async iterator of CSV or NDJSON text chunks
+        """
+        from core.database import db_manager
+
+        start = time.perf_counter()
+        rows = self.iter_rows(file, filename)
+        row_count = completed = 0
+        fx_rates: Dict[str, float] = {}
+
+        try:
+            async with db_manager.get_session() as db:
+                while True:
+                    valid, failed = await asyncio.to_thread(self._read_chunk, rows, row_count + 1)
+                    chunk_rows = len(valid) + len(failed)
+                    if not chunk_rows:
+                        break
+
+                    rate_context = await TariffCalculationEngine.load_rate_context(
+                        db,
+                        [request.hts_code for _, request in valid],
+                        [request.country_code for _, request in valid],
+                        with_history=any(request.as_of for _, request in valid)
+                    )
+                    new_currencies = {request.currency for _, request in valid} - fx_rates.keys()
+                    if new_currencies:
+                        fx_rates.update(await TariffCalculationEngine.load_fx_rates(new_currencies))
+
+                    priced = await asyncio.to_thread(self._price_chunk, rate_context, fx_rates, valid)
+                    completed += sum(1 for result in priced if result["status"] == "completed")
+
+                    results = sorted(priced + failed, key=lambda result: result["row"])
+                    yield await asyncio.to_thread(
+                        self._format, results, output_format, row_count == 0
+                    )
+                    row_count += chunk_rows
+        finally:
+            rows.close()
+            file.close()
+
+        if row_count == 0 and output_format == "csv":
+            yield self._format([], output_format, True)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log_business_event(
+            "manifest_pricing",
+            user_id=str(user_id) if user_id else None,
+            details={
+                "filename": filename,
+                "row_count": row_count,
+                "completed_count": completed,
+                "failed_count": row_count - completed,
+                "execution_time_ms": elapsed_ms
+            }
+        )
+        logger.info(
+            f"Priced manifest {filename}: {row_count} rows in {elapsed_ms:.0f}ms "
+            f"({row_count - completed} failed)"
+        )
+
+
+# Global instance
+manifest_pricing_service = ManifestPricingService()
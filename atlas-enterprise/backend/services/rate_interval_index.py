@@ -0,0 +1,81 @@
+"""
+Rate Interval Index for ATLAS Enterprise
+Effective-dated tariff rate versions per (HTS code, country) with O(log n) as-of lookup.
+"""
+
+from bisect import bisect_right
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models.tariff import TariffRate
+
+
+def as_of_datetime(value: Any) -> Optional[datetime]:
+    """
+    Normalize an as-of value to a naive UTC datetime, as stored in the database.
+
+    A bare date means the end of that day, so versions effective on the
+    date itself apply.
+
+    Args:
+        value: datetime, date, ISO string or None
+
+    Returns:
+        Naive UTC datetime, or None
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if "T" in value or ":" in value else date.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return datetime.combine(value, time.max)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class RateIntervalIndex:
+    """
+    Tariff rate versions per (HTS code, country), ordered by effective date.
+
+    Each version is in force from its effective_date until the next
+    version of the same pair starts; the latest version stays in force.
+    A pair's start dates are kept in a sorted list, so finding the version
+    in force on a date is one bisect.
+    """
+
+    def __init__(self, rates: Iterable[TariffRate]):
+        """Group rate rows by pair and sort each pair's versions."""
+        grouped: Dict[Tuple[int, int], List[TariffRate]] = {}
+        for rate in rates:
+            grouped.setdefault((rate.hts_code_id, rate.country_id), []).append(rate)
+
+        self._timelines: Dict[Tuple[int, int], Tuple[List[datetime], List[TariffRate]]] = {}
+        for pair, versions in grouped.items():
+            # On equal dates the active row sorts last and wins
+            versions.sort(key=lambda r: (r.effective_date or datetime.min, bool(r.is_active)))
+            self._timelines[pair] = ([r.effective_date or datetime.min for r in versions], versions)
+
+        self.version_count = sum(len(versions) for _, versions in self._timelines.values())
+
+    def __len__(self) -> int:
+        return len(self._timelines)
+
+    def get(self, hts_code_id: int, country_id: int, as_of: datetime) -> Optional[TariffRate]:
+        """
+        Get the rate version in force on a date.
+
+        Args:
+            hts_code_id: HTS code ID
+            country_id: Country ID
+            as_of: Naive UTC datetime (see as_of_datetime)
+
+        Returns:
+            The rate version, or None if the pair had no rate by then
+        """
+        timeline = self._timelines.get((hts_code_id, country_id))
+        if timeline is None:
+            return None
+        starts, versions = timeline
+        i = bisect_right(starts, as_of) - 1
+        return versions[i] if i >= 0 else None
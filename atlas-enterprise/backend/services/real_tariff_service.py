@@ -4,13 +4,19 @@ Fetches real tariff data from USITC, UN Comtrade, and other sources.
 """
 
 import asyncio
-import httpx
+from bisect import bisect_left, bisect_right
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable
 from pathlib import Path
 import json
 from datetime import datetime, timedelta
 
+from core.http_client import http_clients
+from services.hts_search_index import tokenize
+from services.async_lru_cache import AsyncLRUCache
+from services.tariff_workbook_cache import tariff_workbook_cache
+
 
 class RealTariffService:
     """Service for fetching real tariff data from multiple sources."""
@@ -19,12 +25,27 @@ class RealTariffService:
         """Initialize the real tariff service."""
         self.usitc_base_url = "https://hts.usitc.gov/api"
         self.comtrade_base_url = "https://comtradeapi.un.org"
-        self.cache = {}
-        self.cache_ttl = timedelta(hours=6)  # Cache for 6 hours
+        # 6 hours for found rates, 10 minutes for codes no source knows
+        self.cache = AsyncLRUCache(
+            max_entries=10000,
+            ttl_seconds=timedelta(hours=6).total_seconds(),
+            negative_ttl_seconds=timedelta(minutes=10).total_seconds()
+        )
         
         # Load local tariff data as fallback
         self.local_data_path = Path(__file__).parent.parent / "data"
         self._local_tariff_data = None
+        
+        # Built once per load by _build_code_index and _build_token_index
+        self._code_rows: Dict[str, int] = {}
+        self._sorted_codes: List[str] = []
+        self._sorted_rows = np.empty(0, dtype=np.intp)
+        self._local_codes: List[str] = []
+        self._local_descriptions: List[str] = []
+        self._local_rates = np.empty((0, 3))
+        self._postings: Dict[str, np.ndarray] = {}
+        self._vocabulary: List[str] = []
+        self._expansions: Dict[str, np.ndarray] = {}
     
     async def _load_local_data(self):
         """Load local Excel tariff data as fallback."""
@@ -34,8 +55,11 @@ class RealTariffService:
         try:
             excel_file = self.local_data_path / "tariff_database_2025.xlsx"
             if excel_file.exists():
-                # Load using pandas
-                self._local_tariff_data = pd.read_excel(excel_file)
+                # Parsed once per workbook version, memory-mapped afterwards
+                df = await asyncio.to_thread(tariff_workbook_cache.read_excel, excel_file)
+                await asyncio.to_thread(self._build_code_index, df)
+                await asyncio.to_thread(self._build_token_index, df)
+                self._local_tariff_data = df
                 print(f"✅ Loaded local tariff data: {len(self._local_tariff_data)} records")
                 return self._local_tariff_data
             else:
@@ -45,6 +69,125 @@ class RealTariffService:
             print(f"❌ Error loading local data: {e}")
             return pd.DataFrame()
     
+    def _build_code_index(self, df: pd.DataFrame) -> None:
+        """
+        Index the local rows by normalized hts8 code.
+        
+        Exact lookups use a dict of code -> first row; prefix lookups
+        bisect the sorted codes. Descriptions and the three rates are
+        extracted up front, so a lookup never touches the DataFrame.
+        """
+        if 'hts8' in df.columns:
+            self._local_codes = df['hts8'].astype(str).tolist()
+            codes = np.array([code.replace('.', '') for code in self._local_codes], dtype=object)
+        else:
+            self._local_codes = []
+            codes = np.empty(0, dtype=object)
+        
+        code_rows: Dict[str, int] = {}
+        for row, code in enumerate(codes):
+            code_rows.setdefault(code, row)
+        order = np.argsort(codes, kind="stable")
+        
+        def rate_column(name: str) -> np.ndarray:
+            if name not in df.columns:
+                return np.zeros(len(df))
+            return pd.to_numeric(df[name], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        
+        if 'brief_description' in df.columns:
+            self._local_descriptions = [str(value) for value in df['brief_description']]
+        else:
+            self._local_descriptions = ['Unknown product'] * len(df)
+        self._local_rates = np.column_stack([
+            rate_column('general_rate'), rate_column('special_rate'), rate_column('column_2_rate')
+        ])
+        self._code_rows = code_rows
+        self._sorted_codes = codes[order].tolist()
+        self._sorted_rows = order
+    
+    def _build_token_index(self, df: pd.DataFrame) -> None:
+        """Index brief_description and description tokens as token -> sorted row array."""
+        postings: Dict[str, List[int]] = {}
+        columns = [df[name] for name in ('brief_description', 'description') if name in df.columns]
+        for row, texts in enumerate(zip(*columns)):
+            tokens = set()
+            for text in texts:
+                if isinstance(text, str):
+                    tokens.update(tokenize(text))
+            for token in tokens:
+                postings.setdefault(token, []).append(row)
+        
+        self._postings = {token: np.array(rows, dtype=np.intp) for token, rows in postings.items()}
+        self._vocabulary = sorted(self._postings)
+        self._expansions = {}
+    
+    def _token_rows(self, token: str) -> np.ndarray:
+        """Rows with a word starting with token, as a sorted unique array."""
+        rows = self._expansions.get(token)
+        if rows is not None:
+            return rows
+        
+        i = bisect_left(self._vocabulary, token)
+        j = bisect_right(self._vocabulary, token + "\uffff", i)
+        matched = [self._postings[word] for word in self._vocabulary[i:j]]
+        if not matched:
+            rows = np.empty(0, dtype=np.intp)
+        elif len(matched) == 1:
+            rows = matched[0]
+        else:
+            rows = np.unique(np.concatenate(matched))
+        
+        # Repeated prefixes (typeahead) reuse the expansion; the index never changes
+        if len(self._expansions) >= 2048:
+            self._expansions.clear()
+        self._expansions[token] = rows
+        return rows
+    
+    def _search_tokens(self, query: str, limit: int) -> List[int]:
+        """
+        Rank rows by how many query terms their descriptions contain.
+        
+        Each term matches words it prefixes ("widget" finds "widgets").
+        Rows matching every term (the posting list intersection) come
+        first, then rows matching fewer; ties keep file order. Cost grows
+        with the posting lists touched, not the number of rows.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        postings = [rows for rows in map(self._token_rows, tokens) if len(rows)]
+        if not postings or limit < 1:
+            return []
+        
+        rows, overlap = np.unique(np.concatenate(postings), return_counts=True)
+        # Fewest missed terms first, then file order, as one sortable key
+        key = (len(tokens) - overlap) * len(self._local_descriptions) + rows
+        top = np.argpartition(key, limit - 1)[:limit] if len(key) > limit else np.arange(len(key))
+        return rows[top[np.argsort(key[top])]].tolist()
+    
+    def _find_local_row(self, clean_hts: str) -> Optional[int]:
+        """First row matching the code exactly, else the first sharing its 6-digit prefix."""
+        row = self._code_rows.get(clean_hts)
+        if row is not None:
+            return row
+        
+        prefix = clean_hts[:6]
+        lo = bisect_left(self._sorted_codes, prefix)
+        hi = bisect_right(self._sorted_codes, prefix + "\uffff", lo)
+        # Rows within the range are sorted by code, not position
+        return int(self._sorted_rows[lo:hi].min()) if hi > lo else None
+    
+    def _local_tariff(self, hts_code: str, row: int) -> Dict[str, Any]:
+        """Build the local-data tariff dict for a matched row."""
+        general_rate, special_rate, column_2_rate = self._local_rates[row].tolist()
+        return {
+            "hts_code": hts_code,
+            "description": self._local_descriptions[row],
+            "general_rate": general_rate,
+            "special_rate": special_rate,
+            "column_2_rate": column_2_rate,
+            "source": "Local Database",
+            "last_updated": datetime.now().isoformat()
+        }
+    
     async def get_real_tariff_rate(self, hts_code: str, country: str = "US") -> Dict[str, Any]:
         """
         Get real tariff rate from USITC or other sources.
@@ -57,60 +200,62 @@ class RealTariffService:
             Dict with tariff information
         """
         try:
-            # Check cache first
-            cache_key = f"{hts_code}_{country}"
-            if cache_key in self.cache:
-                cached_data, timestamp = self.cache[cache_key]
-                if datetime.now() - timestamp < self.cache_ttl:
-                    print(f"✅ Using cached tariff rate for {hts_code}")
-                    return cached_data
-            
-            # Try USITC API first
-            real_data = await self._fetch_from_usitc(hts_code)
-            
-            if not real_data:
-                # Fallback to local data
-                real_data = await self._fetch_from_local_data(hts_code)
-            
-            # Cache the result
-            if real_data:
-                self.cache[cache_key] = (real_data, datetime.now())
-            
+            # Misses are cached too; concurrent lookups share one fetch
+            real_data = await self.cache.get_or_fetch(
+                f"{hts_code}_{country}", lambda: self._fetch_tariff(hts_code)
+            )
             return real_data or self._get_default_tariff_data(hts_code)
             
         except Exception as e:
+            # Upstream failed: answer from local data for this call only, uncached
             print(f"❌ Error getting tariff rate: {e}")
-            return self._get_default_tariff_data(hts_code)
+            local_data = await self._fetch_from_local_data(hts_code)
+            return local_data or self._get_default_tariff_data(hts_code)
+    
+    async def _fetch_tariff(self, hts_code: str) -> Optional[Dict[str, Any]]:
+        """
+        Try USITC first, then the local data; None if neither knows the code.
+        
+        USITC errors propagate, so an outage is never cached as a miss.
+        """
+        real_data = await self._fetch_from_usitc(hts_code)
+        if not real_data:
+            real_data = await self._fetch_from_local_data(hts_code)
+        return real_data or None
     
     async def _fetch_from_usitc(self, hts_code: str) -> Optional[Dict[str, Any]]:
-        """Fetch tariff data from USITC API."""
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                # Format HTS code for USITC (remove dots)
-                formatted_code = hts_code.replace(".", "")
-                
-                # Try to fetch from USITC HTS lookup
-                url = f"https://hts.usitc.gov/api/tariff_rates/{formatted_code}"
-                response = await client.get(url)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    return {
-                        "hts_code": hts_code,
-                        "description": data.get("description", "Unknown product"),
-                        "general_rate": float(data.get("general_rate", 0.0)),
-                        "special_rate": float(data.get("special_rate", 0.0)),
-                        "column_2_rate": float(data.get("column_2_rate", 0.0)),
-                        "source": "USITC",
-                        "last_updated": datetime.now().isoformat()
-                    }
-                
+        """
+        Fetch tariff data from USITC API.
+        
+        Returns:
+            Tariff data, or None if USITC does not know the code (404)
+            
+        Raises:
+            httpx.HTTPError: On connection errors, timeouts and other
+                error responses (e.g. 5xx)
+        """
+        async with http_clients.session(timeout=10.0) as client:
+            # Format HTS code for USITC (remove dots)
+            formatted_code = hts_code.replace(".", "")
+            
+            # Try to fetch from USITC HTS lookup
+            url = f"https://hts.usitc.gov/api/tariff_rates/{formatted_code}"
+            response = await client.get(url)
+            
+            if response.status_code == 404:
                 return None
-                
-        except Exception as e:
-            print(f"❌ USITC API error: {e}")
-            return None
+            response.raise_for_status()
+            data = response.json()
+            
+            return {
+                "hts_code": hts_code,
+                "description": data.get("description", "Unknown product"),
+                "general_rate": float(data.get("general_rate", 0.0)),
+                "special_rate": float(data.get("special_rate", 0.0)),
+                "column_2_rate": float(data.get("column_2_rate", 0.0)),
+                "source": "USITC",
+                "last_updated": datetime.now().isoformat()
+            }
     
     async def _fetch_from_local_data(self, hts_code: str) -> Optional[Dict[str, Any]]:
         """Fetch tariff data from local Excel file."""
@@ -119,36 +264,38 @@ class RealTariffService:
             if df.empty:
                 return None
             
-            # Clean HTS code for matching
-            clean_hts = hts_code.replace(".", "")
-            
-            # Try exact match first
-            matches = df[df['hts8'].astype(str).str.replace('.', '') == clean_hts]
-            
-            if matches.empty:
-                # Try partial match (first 6 digits)
-                partial_code = clean_hts[:6]
-                matches = df[df['hts8'].astype(str).str.replace('.', '').str.startswith(partial_code)]
-            
-            if not matches.empty:
-                row = matches.iloc[0]
-                
-                return {
-                    "hts_code": hts_code,
-                    "description": str(row.get('brief_description', 'Unknown product')),
-                    "general_rate": float(row.get('general_rate', 0.0)) if pd.notna(row.get('general_rate')) else 0.0,
-                    "special_rate": float(row.get('special_rate', 0.0)) if pd.notna(row.get('special_rate')) else 0.0,
-                    "column_2_rate": float(row.get('column_2_rate', 0.0)) if pd.notna(row.get('column_2_rate')) else 0.0,
-                    "source": "Local Database",
-                    "last_updated": datetime.now().isoformat()
-                }
-            
-            return None
+            # Exact match first, then the first code sharing the 6-digit prefix
+            row = self._find_local_row(hts_code.replace(".", ""))
+            return self._local_tariff(hts_code, row) if row is not None else None
             
         except Exception as e:
             print(f"❌ Local data error: {e}")
             return None
     
+    async def get_local_tariff_rates(self, hts_codes: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Look up many HTS codes in the local tariff data at once.
+        
+        Matches like _fetch_from_local_data (exact, then 6-digit prefix)
+        without calling USITC, so thousands of codes resolve in one pass.
+        
+        Args:
+            hts_codes: HTS codes (dots optional)
+            
+        Returns:
+            Dict of each distinct input code -> tariff info, or None if unmatched
+        """
+        df = await self._load_local_data()
+        if df.empty:
+            return {hts_code: None for hts_code in hts_codes}
+        
+        results = {}
+        for hts_code in hts_codes:
+            if hts_code not in results:
+                row = self._find_local_row(hts_code.replace(".", ""))
+                results[hts_code] = self._local_tariff(hts_code, row) if row is not None else None
+        return results
+    
     def _get_default_tariff_data(self, hts_code: str) -> Dict[str, Any]:
         """Get default tariff data when real data is unavailable."""
         # Estimate based on HTS code chapter
@@ -178,7 +325,11 @@ class RealTariffService:
             "last_updated": datetime.now().isoformat()
         }
     
-    async def search_hts_codes(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    async def search_hts_codes(
+        self,
+        query: str,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
         """
         Search for HTS codes based on product description.
         
@@ -194,39 +345,37 @@ class RealTariffService:
             if df.empty:
                 return []
             
-            # Search in description fields
-            mask = (
-                df['brief_description'].str.contains(query, case=False, na=False) |
-                df['description'].str.contains(query, case=False, na=False) if 'description' in df.columns else False
-            )
-            
-            results = df[mask].head(limit)
-            
-            hts_list = []
-            for _, row in results.iterrows():
-                hts_code = str(row['hts8'])
-                if len(hts_code) >= 8:
-                    formatted_hts = f"{hts_code[:4]}.{hts_code[4:6]}.{hts_code[6:8]}"
-                    if len(hts_code) > 8:
-                        formatted_hts += f".{hts_code[8:10]}"
-                else:
-                    formatted_hts = hts_code
-                
-                hts_list.append({
-                    "hts_code": formatted_hts,
-                    "raw_hts_code": hts_code,
-                    "description": str(row.get('brief_description', 'Unknown')),
-                    "general_rate": float(row.get('general_rate', 0.0)) if pd.notna(row.get('general_rate')) else 0.0,
-                    "special_rate": float(row.get('special_rate', 0.0)) if pd.notna(row.get('special_rate')) else 0.0
-                })
-            
-            print(f"✅ Found {len(hts_list)} HTS codes for '{query}'")
-            return hts_list
+            rows = self._search_tokens(query, limit)
+            return self._format_search_results(rows, query)
             
         except Exception as e:
             print(f"❌ Error searching HTS codes: {e}")
             return []
     
+    def _format_search_results(self, rows: List[int], query: str) -> List[Dict[str, Any]]:
+        """Convert matched row positions into search result dicts."""
+        hts_list = []
+        rates = self._local_rates[rows].tolist()
+        for row, (general_rate, special_rate, _) in zip(rows, rates):
+            hts_code = self._local_codes[row]
+            if len(hts_code) >= 8:
+                formatted_hts = f"{hts_code[:4]}.{hts_code[4:6]}.{hts_code[6:8]}"
+                if len(hts_code) > 8:
+                    formatted_hts += f".{hts_code[8:10]}"
+            else:
+                formatted_hts = hts_code
+            
+            hts_list.append({
+                "hts_code": formatted_hts,
+                "raw_hts_code": hts_code,
+                "description": self._local_descriptions[row],
+                "general_rate": general_rate,
+                "special_rate": special_rate
+            })
+        
+        print(f"✅ Found {len(hts_list)} HTS codes for '{query}'")
+        return hts_list
+    
     async def get_alternative_countries(self, hts_code: str, current_country: str = "China") -> List[Dict[str, Any]]:
         """
         Get alternative sourcing countries with their tariff rates.
@@ -295,6 +444,7 @@ class RealTariffService:
                 "status": "healthy",
                 "local_records": local_records,
                 "cache_size": len(self.cache),
+                "cache": self.cache.get_stats(),
                 "test_lookup": test_data is not None
             }
             
@@ -3,19 +3,101 @@ TariffCalculationEngine for ATLAS Enterprise
 Real-time cost simulation using tariffs, MPF, VAT, and other fees.
 """
 
-from typing import Dict, Any, Optional, List
-from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Any, Optional, List, Sequence, Iterable, Tuple
+from decimal import Decimal, ROUND_HALF_UP, getcontext
 from datetime import datetime
+from functools import lru_cache
+import numpy as np
+from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.tariff import HTSCode, TariffRate, TariffCalculation
 from models.country import Country
 from models.exchange_rate import ExchangeRate
 from core.logging import get_logger, log_business_event
-from services.exchange_rate_service import ExchangeRateService
+from services.exchange_rate_service import exchange_rate_service
+from services.tariff_snapshot import tariff_snapshot_service
+from services.landed_cost_cache import landed_cost_cache
+from services.calculation_audit_writer import calculation_audit_writer
+from services.hts_popularity_tracker import hts_popularity_tracker
+from services.rate_interval_index import RateIntervalIndex, as_of_datetime
 
 logger = get_logger(__name__)
 
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_IN_CLAUSE_CHUNK = 500
+
+
+@lru_cache(maxsize=4096)
+def _fixed_point(value: Any) -> Tuple[int, int]:
+    """
+    Split a number into integer digits and a count of decimal places.
+    
+    Reads the shortest decimal form of the value, exactly as
+    Decimal(str(value)) does, so 0.1 becomes (1, 1) rather than the
+    binary approximation.
+    
+    Args:
+        value: float, int or Decimal
+        
+    Returns:
+        (digits, decimals) with value == digits / 10**decimals
+    """
+    text = str(value)
+    if "e" in text or "E" in text:
+        mantissa, _, exponent = text.lower().partition("e")
+    else:
+        mantissa, exponent = text, ""
+    whole, _, fraction = mantissa.partition(".")
+    digits = int(whole + fraction)
+    decimals = len(fraction) - int(exponent or 0)
+    if decimals < 0:
+        return digits * 10 ** -decimals, 0
+    return digits, decimals
+
+
+def _ratio_to_cents(numerator: int, denominator: int) -> float:
+    """Round numerator / denominator dollars to cents, half up (away from zero)."""
+    cents = (abs(numerator) * 200 + denominator) // (2 * denominator)
+    return (cents if numerator >= 0 else -cents) / 100
+
+
+def _near_half_cent_ratio(numerator: int, denominator: int, bound: int) -> bool:
+    """
+    Whether numerator / denominator dollars may round differently in Decimal.
+    
+    Decimal rounds each division and subtraction to 28 significant digits
+    of its operands, the largest of which is bound / denominator. Only a
+    value within that error of a half cent can end up on the other side.
+    """
+    half_cents, remainder = divmod(abs(numerator) * 200, denominator)
+    # Distance (times denominator) to the nearest odd number of half cents
+    distance = remainder if half_cents % 2 else denominator - remainder
+    bound_half_cents = abs(bound) * 200 // denominator + 1
+    return distance * 10 ** 25 <= bound_half_cents * denominator
+
+
+def _decimal_to_cents(value: Decimal) -> float:
+    """Round a Decimal to cents, half up, as the original engine did."""
+    return float(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """Vectorized half-up rounding to cents (away from zero for negatives)."""
+    return np.sign(values) * np.floor(np.abs(values) * 100 + 0.5) / 100
+
+
+def _near_half_cent(values: np.ndarray) -> np.ndarray:
+    """
+    Flag values whose float rounding could differ from exact rounding.
+    
+    Float results carry ~1e-15 relative error, so only values sitting on a
+    half-cent boundary can round differently; those are recomputed exactly.
+    """
+    scaled = np.abs(values) * 100
+    tolerance = 1e-9 + scaled * 1e-12
+    return np.abs(scaled - np.floor(scaled) - 0.5) <= tolerance
+
 
 class TariffCalculationEngine:
     """Engine for comprehensive tariff and landed cost calculations."""
@@ -29,6 +111,19 @@ class TariffCalculationEngine:
     # Harbor Maintenance Fee
     HMF_RATE = Decimal("0.00125")          # 0.125% of cargo value
     
+    # Fixed-point (digits, decimals) forms of the fee constants
+    _MPF_RATE_FIXED = _fixed_point(MPF_RATE_FORMAL)
+    _MPF_MIN_FIXED = _fixed_point(MPF_MIN_FORMAL)
+    _MPF_MAX_FIXED = _fixed_point(MPF_MAX_FORMAL)
+    _MPF_INFORMAL_FIXED = _fixed_point(MPF_INFORMAL)
+    _HMF_RATE_FIXED = _fixed_point(HMF_RATE)
+    _FEE_DECIMALS = max(
+        _MPF_RATE_FIXED[1], _MPF_MIN_FIXED[1], _MPF_MAX_FIXED[1], _MPF_INFORMAL_FIXED[1]
+    )
+    
+    # Largest what-if grid priced in one request
+    MAX_SWEEP_CELLS = 250_000
+    
     @classmethod
     async def calculate_landed_cost(
         cls,
@@ -41,7 +136,8 @@ class TariffCalculationEngine:
         insurance_cost: float = 0.0,
         other_costs: float = 0.0,
         currency: str = "USD",
-        user_id: Optional[int] = None
+        user_id: Optional[int] = None,
+        as_of: Optional[Any] = None
     ) -> Dict[str, Any]:
         """
         Calculate comprehensive landed cost including all duties and fees.
@@ -57,139 +153,78 @@ class TariffCalculationEngine:
             other_costs: Other additional costs
             currency: Currency of values
             user_id: User performing calculation
+            as_of: Entry date to price at (date, datetime or ISO string);
+                defaults to the rates currently in force
             
         Returns:
             Comprehensive calculation results
         """
         try:
             start_time = datetime.utcnow()
+            as_of = as_of_datetime(as_of)
             
-            # Get HTS code and tariff rate
-            from .tariff_database_service import TariffDatabaseService
+            # Identical requests at the same tariff version and FX rate reuse the result
+            cache_key = await landed_cost_cache.build_key(
+                hts_code, country_code, product_value, quantity,
+                freight_cost, insurance_cost, other_costs, currency, as_of
+            )
+            cached = await landed_cost_cache.get(cache_key)
             
-            hts_obj = await TariffDatabaseService.get_hts_code_by_code(db, hts_code)
-            if not hts_obj:
-                raise ValueError(f"HTS code not found: {hts_code}")
-            
-            # Get country
-            country = await cls._get_country(db, country_code)
-            if not country:
-                raise ValueError(f"Country not found: {country_code}")
-            
-            # Get tariff rate
-            tariff_rate = await cls._get_tariff_rate(db, hts_obj.id, country.id)
-            if not tariff_rate:
-                # Use default MFN rate of 0 if no specific rate found
-                effective_rate = 0.0
-                ad_rate = 0.0
-                cvd_rate = 0.0
+            if cached:
+                result = cached["result"]
+                result["hts_code"] = hts_code
+                result["country_code"] = country_code
+                result["input_values"]["currency"] = currency
+                result["calculation_metadata"]["cache_hit"] = True
+                hts_code_id, country_id = cached["hts_code_id"], cached["country_id"]
             else:
-                effective_rate = tariff_rate.effective_rate
-                ad_rate = tariff_rate.antidumping_duty
-                cvd_rate = tariff_rate.countervailing_duty
-            
-            # Convert to USD if needed
-            exchange_rate = 1.0
-            if currency != "USD":
-                exchange_rate = await ExchangeRateService.get_exchange_rate(
-                    db, currency, "USD"
+                # Get HTS code, country and tariff rate
+                hts_obj, country, tariff_rate = await cls._resolve_rate(
+                    db, hts_code, country_code, as_of
                 )
-                product_value *= exchange_rate
-                freight_cost *= exchange_rate
-                insurance_cost *= exchange_rate
-                other_costs *= exchange_rate
-            
-            # Calculate using Decimal for precision
-            product_val = Decimal(str(product_value))
-            freight_val = Decimal(str(freight_cost))
-            insurance_val = Decimal(str(insurance_cost))
-            other_val = Decimal(str(other_costs))
-            
-            # Calculate CIF value (Cost, Insurance, Freight)
-            cif_value = product_val + freight_val + insurance_val
-            
-            # Calculate duty
-            duty_rate = Decimal(str(effective_rate / 100))  # Convert percentage to decimal
-            duty_amount = cif_value * duty_rate
-            
-            # Calculate AD/CVD
-            ad_amount = cif_value * Decimal(str(ad_rate / 100))
-            cvd_amount = cif_value * Decimal(str(cvd_rate / 100))
-            
-            # Calculate MPF (Merchandise Processing Fee)
-            mpf_amount = cls._calculate_mpf(cif_value)
-            
-            # Calculate HMF (Harbor Maintenance Fee) - only for seaports
-            hmf_amount = cif_value * cls.HMF_RATE
-            
-            # Total landed cost
-            total_landed_cost = (
-                product_val + freight_val + insurance_val + other_val +
-                duty_amount + ad_amount + cvd_amount + mpf_amount + hmf_amount
-            )
-            
-            # Unit costs
-            unit_price = product_val / Decimal(str(quantity))
-            unit_landed_cost = total_landed_cost / Decimal(str(quantity))
-            
-            # Calculate percentages
-            duty_percentage = (duty_amount / product_val * 100) if product_val > 0 else 0
-            total_additional_percentage = ((total_landed_cost - product_val) / product_val * 100) if product_val > 0 else 0
+                if not tariff_rate:
+                    # Use default MFN rate of 0 if no specific rate found
+                    effective_rate = 0.0
+                    ad_rate = 0.0
+                    cvd_rate = 0.0
+                else:
+                    effective_rate = tariff_rate.effective_rate
+                    ad_rate = tariff_rate.antidumping_duty
+                    cvd_rate = tariff_rate.countervailing_duty
+                
+                # Convert to USD if needed
+                exchange_rate = await cls._get_usd_rate(currency)
+                if currency != "USD":
+                    product_value *= exchange_rate
+                    freight_cost *= exchange_rate
+                    insurance_cost *= exchange_rate
+                    other_costs *= exchange_rate
+                
+                costs = cls._compute_costs(
+                    product_value, freight_cost, insurance_cost, other_costs,
+                    quantity, effective_rate, ad_rate, cvd_rate
+                )
+                result = cls._build_result(
+                    hts_code, hts_obj, country_code, country, costs, quantity,
+                    currency, exchange_rate, effective_rate, ad_rate, cvd_rate
+                )
+                result["calculation_metadata"]["cache_hit"] = False
+                result["calculation_metadata"]["as_of"] = as_of.isoformat() if as_of else None
+                hts_code_id, country_id = hts_obj.id, country.id
+                await landed_cost_cache.set(cache_key, {
+                    "result": result,
+                    "hts_code_id": hts_code_id,
+                    "country_id": country_id
+                })
             
-            # Round all monetary values to 2 decimal places
-            def round_decimal(val):
-                return float(val.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
-            
-            result = {
-                "success": True,
-                "hts_code": hts_code,
-                "country_code": country_code,
-                "country_name": country.name,
-                "input_values": {
-                    "product_value": float(product_val),
-                    "quantity": quantity,
-                    "freight_cost": float(freight_val),
-                    "insurance_cost": float(insurance_val),
-                    "other_costs": float(other_val),
-                    "currency": currency,
-                    "exchange_rate_used": exchange_rate
-                },
-                "calculated_values": {
-                    "cif_value": round_decimal(cif_value),
-                    "duty_amount": round_decimal(duty_amount),
-                    "ad_amount": round_decimal(ad_amount),
-                    "cvd_amount": round_decimal(cvd_amount),
-                    "mpf_amount": round_decimal(mpf_amount),
-                    "hmf_amount": round_decimal(hmf_amount),
-                    "total_landed_cost": round_decimal(total_landed_cost)
-                },
-                "unit_costs": {
-                    "unit_price": round_decimal(unit_price),
-                    "unit_landed_cost": round_decimal(unit_landed_cost),
-                    "unit_additional_cost": round_decimal(unit_landed_cost - unit_price)
-                },
-                "rates_applied": {
-                    "tariff_rate": effective_rate,
-                    "antidumping_rate": ad_rate,
-                    "countervailing_rate": cvd_rate,
-                    "total_duty_rate": effective_rate + ad_rate + cvd_rate
-                },
-                "percentages": {
-                    "duty_percentage": round_decimal(duty_percentage),
-                    "total_additional_percentage": round_decimal(total_additional_percentage)
-                },
-                "trade_preferences": country.get_trade_preferences() if country else [],
-                "calculation_metadata": {
-                    "calculation_date": datetime.utcnow().isoformat(),
-                    "hts_description": hts_obj.brief_description,
-                    "country_risk_level": country.risk_level if country else "unknown"
-                }
-            }
+            product_val = result["input_values"]["product_value"]
+            total_landed_cost = result["calculated_values"]["total_landed_cost"]
+            hts_popularity_tracker.record(cls._clean_hts_code(hts_code))
             
             # Save calculation to database
             if user_id:
                 await cls._save_calculation(
-                    db, hts_obj.id, country.id, result, user_id
+                    db, hts_code_id, country_id, result, user_id
                 )
             
             # Log business event
@@ -201,12 +236,13 @@ class TariffCalculationEngine:
                     "hts_code": hts_code,
                     "country": country_code,
                     "product_value": float(product_val),
-                    "total_cost": round_decimal(total_landed_cost),
-                    "execution_time_ms": execution_time
+                    "total_cost": total_landed_cost,
+                    "execution_time_ms": execution_time,
+                    "cache_hit": bool(cached)
                 }
             )
             
-            logger.info(f"Calculated landed cost for {hts_code} from {country_code}: ${round_decimal(total_landed_cost)}")
+            logger.info(f"Calculated landed cost for {hts_code} from {country_code}: ${total_landed_cost}")
             return result
             
         except Exception as e:
@@ -218,31 +254,946 @@ class TariffCalculationEngine:
             }
     
     @classmethod
-    def _calculate_mpf(cls, cif_value: Decimal) -> Decimal:
+    async def _resolve_rate(
+        cls,
+        db: AsyncSession,
+        hts_code: str,
+        country_code: str,
+        as_of: Optional[datetime] = None
+    ) -> Tuple[Any, Any, Optional[Any]]:
         """
-        Calculate Merchandise Processing Fee.
+        Resolve the HTS code, country and tariff rate for a calculation.
+        
+        Reads the tariff snapshot when it is current, otherwise the database.
+        Without as_of the active rate is used; with it, the rate version in
+        force on that date.
+        
+        Returns:
+            (hts_code, country, tariff_rate); tariff_rate is None if no rate exists
+        """
+        # Codes deactivated since then can still price a past entry
+        include_inactive = as_of is not None
+        snapshot = tariff_snapshot_service.get()
+        if snapshot:
+            hts_obj = snapshot.get_hts_code(hts_code, include_inactive)
+            country = snapshot.get_country(country_code)
+        else:
+            from .tariff_database_service import TariffDatabaseService
+            
+            hts_obj = await TariffDatabaseService.get_hts_code_by_code(db, hts_code, include_inactive)
+            country = await cls._get_country(db, country_code) if hts_obj else None
+        
+        if not hts_obj:
+            raise ValueError(f"HTS code not found: {hts_code}")
+        if not country:
+            raise ValueError(f"Country not found: {country_code}")
+        
+        if as_of is None:
+            if snapshot:
+                tariff_rate = snapshot.get_rate(hts_obj.id, country.id)
+            else:
+                tariff_rate = await cls._get_tariff_rate(db, hts_obj.id, country.id)
+            return hts_obj, country, tariff_rate
+        
+        cls._check_in_effect(hts_obj, as_of)
+        if snapshot:
+            tariff_rate = snapshot.rate_index.get(hts_obj.id, country.id, as_of)
+        else:
+            tariff_rate = await cls._get_tariff_rate_as_of(db, hts_obj.id, country.id, as_of)
+        return hts_obj, country, tariff_rate
+    
+    @staticmethod
+    def _check_in_effect(hts_obj: HTSCode, as_of: datetime) -> None:
+        """Raise ValueError if the HTS code took effect after as_of."""
+        if hts_obj.effective_date and hts_obj.effective_date > as_of:
+            raise ValueError(
+                f"HTS code {hts_obj.hts_code} not in effect on {as_of.date().isoformat()}"
+            )
+    
+    @classmethod
+    def _build_result(
+        cls,
+        hts_code: str,
+        hts_obj: HTSCode,
+        country_code: str,
+        country: Country,
+        costs: Dict[str, float],
+        quantity: float,
+        currency: str,
+        exchange_rate: float,
+        effective_rate: float,
+        ad_rate: float,
+        cvd_rate: float
+    ) -> Dict[str, Any]:
+        """Assemble the calculate_landed_cost response from computed costs."""
+        return {
+            "success": True,
+            "hts_code": hts_code,
+            "country_code": country_code,
+            "country_name": country.name,
+            "input_values": {
+                "product_value": costs["product_value"],
+                "quantity": quantity,
+                "freight_cost": costs["freight_cost"],
+                "insurance_cost": costs["insurance_cost"],
+                "other_costs": costs["other_costs"],
+                "currency": currency,
+                "exchange_rate_used": exchange_rate
+            },
+            "calculated_values": {
+                name: costs[name] for name in (
+                    "cif_value", "duty_amount", "ad_amount", "cvd_amount",
+                    "mpf_amount", "hmf_amount", "total_landed_cost"
+                )
+            },
+            "unit_costs": {
+                "unit_price": costs["unit_price"],
+                "unit_landed_cost": costs["unit_landed_cost"],
+                "unit_additional_cost": costs["unit_additional_cost"]
+            },
+            "rates_applied": {
+                "tariff_rate": effective_rate,
+                "antidumping_rate": ad_rate,
+                "countervailing_rate": cvd_rate,
+                "total_duty_rate": effective_rate + ad_rate + cvd_rate
+            },
+            "percentages": {
+                "duty_percentage": costs["duty_percentage"],
+                "total_additional_percentage": costs["total_additional_percentage"]
+            },
+            "trade_preferences": country.get_trade_preferences() if country else [],
+            "calculation_metadata": {
+                "calculation_date": datetime.utcnow().isoformat(),
+                "hts_description": hts_obj.brief_description,
+                "country_risk_level": country.risk_level if country else "unknown"
+            }
+        }
+    
+    @classmethod
+    def _compute_costs(
+        cls,
+        product_value: float,
+        freight_cost: float,
+        insurance_cost: float,
+        other_costs: float,
+        quantity: float,
+        effective_rate: float,
+        ad_rate: float,
+        cvd_rate: float
+    ) -> Dict[str, float]:
+        """
+        Compute landed cost components in integer fixed point.
+        
+        Every input is read as an exact decimal and sums and products run
+        on integers at one common scale, which is exact. Unit costs and
+        percentages involve division, so they are derived from those exact
+        amounts with Decimal, in the same steps and precision as the
+        former Decimal arithmetic (including unit_additional_cost as
+        unit_landed_cost - unit_price before rounding). Amounts too large
+        for Decimal's precision use _compute_costs_decimal instead, so
+        results always equal the Decimal engine.
         
         Args:
-            cif_value: CIF value of goods
+            product_value: FOB value in USD
+            freight_cost: Freight cost in USD
+            insurance_cost: Insurance cost in USD
+            other_costs: Other costs in USD
+            quantity: Quantity of items
+            effective_rate: Tariff rate (%)
+            ad_rate: Antidumping rate (%)
+            cvd_rate: Countervailing rate (%)
             
         Returns:
-            MPF amount
+            Cost components, unit costs and percentages rounded to cents,
+            plus the USD input values
         """
-        # Informal entries (under $2,500) have fixed MPF
+        product_digits, product_decimals = _fixed_point(product_value)
+        freight_digits, freight_decimals = _fixed_point(freight_cost)
+        insurance_digits, insurance_decimals = _fixed_point(insurance_cost)
+        other_digits, other_decimals = _fixed_point(other_costs)
+        duty_digits, duty_decimals = _fixed_point(effective_rate / 100)
+        ad_digits, ad_decimals = _fixed_point(ad_rate / 100)
+        cvd_digits, cvd_decimals = _fixed_point(cvd_rate / 100)
+        hmf_digits, hmf_decimals = cls._HMF_RATE_FIXED
+        
+        # Money at a common number of decimals, rates at another
+        money_decimals = max(product_decimals, freight_decimals, insurance_decimals, other_decimals)
+        product_val = product_digits * 10 ** (money_decimals - product_decimals)
+        freight_val = freight_digits * 10 ** (money_decimals - freight_decimals)
+        insurance_val = insurance_digits * 10 ** (money_decimals - insurance_decimals)
+        other_val = other_digits * 10 ** (money_decimals - other_decimals)
+        
+        rate_decimals = max(
+            duty_decimals, ad_decimals, cvd_decimals, hmf_decimals, cls._FEE_DECIMALS
+        )
+        duty_rate = duty_digits * 10 ** (rate_decimals - duty_decimals)
+        ad_rate_fixed = ad_digits * 10 ** (rate_decimals - ad_decimals)
+        cvd_rate_fixed = cvd_digits * 10 ** (rate_decimals - cvd_decimals)
+        hmf_rate = hmf_digits * 10 ** (rate_decimals - hmf_decimals)
+        
+        # Amounts below are integers scaled by 10**scale
+        scale = money_decimals + rate_decimals
+        rate_unit = 10 ** rate_decimals
+        
+        # Calculate CIF value (Cost, Insurance, Freight)
+        cif_value = product_val + freight_val + insurance_val
+        
+        # Calculate duty, AD/CVD and HMF (Harbor Maintenance Fee)
+        duty_amount = cif_value * duty_rate
+        ad_amount = cif_value * ad_rate_fixed
+        cvd_amount = cif_value * cvd_rate_fixed
+        hmf_amount = cif_value * hmf_rate
+        
+        # Calculate MPF (Merchandise Processing Fee)
+        mpf_digits, mpf_decimals = cls._calculate_mpf(cif_value, money_decimals)
+        mpf_amount = mpf_digits * 10 ** (scale - mpf_decimals)
+        
+        # Total landed cost
+        base_amount = (product_val + freight_val + insurance_val + other_val) * rate_unit
+        total_landed_cost = (
+            base_amount + duty_amount + ad_amount + cvd_amount + mpf_amount + hmf_amount
+        )
+        product_scaled = product_val * rate_unit
+        
+        # Decimal rounds every step beyond its precision; past that the
+        # integer sums would be more exact than the Decimal engine
+        terms = (
+            product_scaled, freight_val * rate_unit, insurance_val * rate_unit,
+            other_val * rate_unit, duty_amount, ad_amount, cvd_amount, mpf_amount, hmf_amount
+        )
+        if sum(map(abs, terms)) >= 10 ** getcontext().prec:
+            return cls._compute_costs_decimal(
+                product_value, freight_cost, insurance_cost, other_costs,
+                quantity, effective_rate, ad_rate, cvd_rate
+            )
+        
+        denominator = 10 ** scale
+        additional_cost = total_landed_cost - product_scaled
+        quantity_digits, quantity_decimals = _fixed_point(quantity)
+        per_unit = quantity_digits * 10 ** scale
+        unit_scale = 10 ** quantity_decimals
+        unit_bound = max(abs(product_scaled), abs(total_landed_cost)) * unit_scale
+        
+        # (numerator, denominator, largest operand) of each ratio output
+        ratios = {
+            "unit_price": (product_scaled * unit_scale, per_unit, unit_bound),
+            "unit_landed_cost": (total_landed_cost * unit_scale, per_unit, unit_bound),
+            "unit_additional_cost": (additional_cost * unit_scale, per_unit, unit_bound)
+        }
+        if product_val > 0:
+            ratios["duty_percentage"] = (duty_amount * 100, product_scaled, duty_amount * 100)
+            ratios["total_additional_percentage"] = (
+                additional_cost * 100, product_scaled, additional_cost * 100
+            )
+        
+        ratio_costs = {"duty_percentage": 0.0, "total_additional_percentage": 0.0}
+        for name, (numerator, ratio_denominator, bound) in ratios.items():
+            if quantity_digits <= 0 or _near_half_cent_ratio(numerator, ratio_denominator, bound):
+                ratio_costs = cls._ratio_costs_decimal(
+                    product_scaled, total_landed_cost, duty_amount, scale, quantity
+                )
+                break
+            ratio_costs[name] = _ratio_to_cents(numerator, ratio_denominator)
+        
+        return {
+            "product_value": float(product_value),
+            "freight_cost": float(freight_cost),
+            "insurance_cost": float(insurance_cost),
+            "other_costs": float(other_costs),
+            "cif_value": _ratio_to_cents(cif_value * rate_unit, denominator),
+            "duty_amount": _ratio_to_cents(duty_amount, denominator),
+            "ad_amount": _ratio_to_cents(ad_amount, denominator),
+            "cvd_amount": _ratio_to_cents(cvd_amount, denominator),
+            "mpf_amount": _ratio_to_cents(mpf_amount, denominator),
+            "hmf_amount": _ratio_to_cents(hmf_amount, denominator),
+            "total_landed_cost": _ratio_to_cents(total_landed_cost, denominator),
+            **ratio_costs
+        }
+    
+    @staticmethod
+    def _ratio_costs_decimal(
+        product_scaled: int,
+        total_landed_cost: int,
+        duty_amount: int,
+        scale: int,
+        quantity: float
+    ) -> Dict[str, float]:
+        """
+        Unit costs and percentages in the Decimal engine's steps.
+        
+        Each Decimal division and subtraction rounds to the context
+        precision before the final rounding to cents, which decides
+        results that sit on a half-cent tie.
+        
+        Args:
+            product_scaled: Product value as an integer scaled by 10**scale
+            total_landed_cost: Total landed cost at the same scale
+            duty_amount: Duty amount at the same scale
+            scale: Decimal places of the amounts
+            quantity: Quantity of items
+        """
+        product_val = Decimal(product_scaled).scaleb(-scale)
+        total_val = Decimal(total_landed_cost).scaleb(-scale)
+        unit_price = product_val / Decimal(str(quantity))
+        unit_landed_cost = total_val / Decimal(str(quantity))
+        
+        return {
+            "unit_price": _decimal_to_cents(unit_price),
+            "unit_landed_cost": _decimal_to_cents(unit_landed_cost),
+            "unit_additional_cost": _decimal_to_cents(unit_landed_cost - unit_price),
+            "duty_percentage": (
+                _decimal_to_cents(Decimal(duty_amount).scaleb(-scale) / product_val * 100)
+                if product_val > 0 else 0.0
+            ),
+            "total_additional_percentage": (
+                _decimal_to_cents((total_val - product_val) / product_val * 100)
+                if product_val > 0 else 0.0
+            )
+        }
+    
+    @classmethod
+    def _compute_costs_decimal(
+        cls,
+        product_value: float,
+        freight_cost: float,
+        insurance_cost: float,
+        other_costs: float,
+        quantity: float,
+        effective_rate: float,
+        ad_rate: float,
+        cvd_rate: float
+    ) -> Dict[str, float]:
+        """
+        Compute landed cost components with Decimal arithmetic.
+        
+        The original engine's calculation, used by _compute_costs for
+        amounts beyond Decimal's precision. Same arguments and result.
+        """
+        product_val = Decimal(str(product_value))
+        freight_val = Decimal(str(freight_cost))
+        insurance_val = Decimal(str(insurance_cost))
+        other_val = Decimal(str(other_costs))
+        
+        cif_value = product_val + freight_val + insurance_val
+        duty_amount = cif_value * Decimal(str(effective_rate / 100))
+        ad_amount = cif_value * Decimal(str(ad_rate / 100))
+        cvd_amount = cif_value * Decimal(str(cvd_rate / 100))
+        mpf_amount = cls._calculate_mpf_decimal(cif_value)
+        hmf_amount = cif_value * cls.HMF_RATE
+        
+        total_landed_cost = (
+            product_val + freight_val + insurance_val + other_val +
+            duty_amount + ad_amount + cvd_amount + mpf_amount + hmf_amount
+        )
+        unit_price = product_val / Decimal(str(quantity))
+        unit_landed_cost = total_landed_cost / Decimal(str(quantity))
+        
+        return {
+            "product_value": float(product_value),
+            "freight_cost": float(freight_cost),
+            "insurance_cost": float(insurance_cost),
+            "other_costs": float(other_costs),
+            "cif_value": _decimal_to_cents(cif_value),
+            "duty_amount": _decimal_to_cents(duty_amount),
+            "ad_amount": _decimal_to_cents(ad_amount),
+            "cvd_amount": _decimal_to_cents(cvd_amount),
+            "mpf_amount": _decimal_to_cents(mpf_amount),
+            "hmf_amount": _decimal_to_cents(hmf_amount),
+            "total_landed_cost": _decimal_to_cents(total_landed_cost),
+            "unit_price": _decimal_to_cents(unit_price),
+            "unit_landed_cost": _decimal_to_cents(unit_landed_cost),
+            "unit_additional_cost": _decimal_to_cents(unit_landed_cost - unit_price),
+            "duty_percentage": (
+                _decimal_to_cents(duty_amount / product_val * 100) if product_val > 0 else 0.0
+            ),
+            "total_additional_percentage": (
+                _decimal_to_cents((total_landed_cost - product_val) / product_val * 100)
+                if product_val > 0 else 0.0
+            )
+        }
+    
+    @classmethod
+    def _compute_costs_vectorized(
+        cls,
+        product_values: np.ndarray,
+        freight_costs: np.ndarray,
+        insurance_costs: np.ndarray,
+        other_costs: np.ndarray,
+        quantities: np.ndarray,
+        effective_rates: np.ndarray,
+        ad_rates: np.ndarray,
+        cvd_rates: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Compute landed cost components for many rows in one NumPy pass.
+        
+        Mirrors _compute_costs and returns values already rounded to cents.
+        Rows where float rounding could disagree with the exact path (a
+        component on a half-cent boundary, or CIF at the informal MPF
+        threshold) are recomputed with _compute_costs, so the output matches
+        the scalar engine to the cent.
+        
+        Args:
+            product_values: FOB values in USD
+            freight_costs: Freight costs in USD
+            insurance_costs: Insurance costs in USD
+            other_costs: Other costs in USD
+            quantities: Quantities
+            effective_rates: Tariff rates (%)
+            ad_rates: Antidumping rates (%)
+            cvd_rates: Countervailing rates (%)
+            
+        Returns:
+            Rounded cost component arrays keyed by name
+        """
+        cif = product_values + freight_costs + insurance_costs
+        duty = cif * (effective_rates / 100)
+        ad = cif * (ad_rates / 100)
+        cvd = cif * (cvd_rates / 100)
+        
+        mpf = np.clip(
+            cif * float(cls.MPF_RATE_FORMAL),
+            float(cls.MPF_MIN_FORMAL),
+            float(cls.MPF_MAX_FORMAL)
+        )
+        mpf = np.where(cif < 2500, float(cls.MPF_INFORMAL), mpf)
+        hmf = cif * float(cls.HMF_RATE)
+        
+        total = (
+            product_values + freight_costs + insurance_costs + other_costs +
+            duty + ad + cvd + mpf + hmf
+        )
+        
+        raw = {
+            "cif_value": cif,
+            "duty_amount": duty,
+            "ad_amount": ad,
+            "cvd_amount": cvd,
+            "mpf_amount": mpf,
+            "hmf_amount": hmf,
+            "total_landed_cost": total,
+            "unit_price": product_values / quantities,
+            "unit_landed_cost": total / quantities
+        }
+        
+        ambiguous = np.abs(cif - 2500) <= 1e-6
+        for values in raw.values():
+            ambiguous |= _near_half_cent(values)
+        # Rows without a rate stay NaN; only priced rows are recomputed
+        ambiguous &= np.isfinite(total)
+        
+        rounded = {name: _round_cents(values) for name, values in raw.items()}
+        
+        for i in np.flatnonzero(ambiguous):
+            exact = cls._compute_costs(
+                float(product_values[i]), float(freight_costs[i]),
+                float(insurance_costs[i]), float(other_costs[i]),
+                float(quantities[i]), float(effective_rates[i]),
+                float(ad_rates[i]), float(cvd_rates[i])
+            )
+            for name in rounded:
+                rounded[name][i] = exact[name]
+        
+        return rounded
+    
+    @classmethod
+    def _calculate_mpf_decimal(cls, cif_value: Decimal) -> Decimal:
+        """Calculate Merchandise Processing Fee on a Decimal CIF value."""
         if cif_value < 2500:
             return cls.MPF_INFORMAL
-        
-        # Formal entries use percentage with min/max
         mpf = cif_value * cls.MPF_RATE_FORMAL
-        
-        # Apply min/max limits
         if mpf < cls.MPF_MIN_FORMAL:
             return cls.MPF_MIN_FORMAL
         elif mpf > cls.MPF_MAX_FORMAL:
             return cls.MPF_MAX_FORMAL
-        
         return mpf
     
+    @classmethod
+    def _calculate_mpf(cls, cif_value: int, decimals: int) -> Tuple[int, int]:
+        """
+        Calculate Merchandise Processing Fee.
+        
+        Args:
+            cif_value: CIF value of goods as an integer scaled by 10**decimals
+            decimals: Decimal places of cif_value
+            
+        Returns:
+            MPF amount as (digits, decimals)
+        """
+        # Informal entries (under $2,500) have fixed MPF
+        if cif_value < 2500 * 10 ** decimals:
+            return cls._MPF_INFORMAL_FIXED
+        
+        # Formal entries use percentage with min/max
+        rate_digits, rate_decimals = cls._MPF_RATE_FIXED
+        mpf_decimals = decimals + rate_decimals
+        mpf = cif_value * rate_digits
+        
+        # Apply min/max limits
+        min_digits, min_decimals = cls._MPF_MIN_FIXED
+        max_digits, max_decimals = cls._MPF_MAX_FIXED
+        if mpf < min_digits * 10 ** (mpf_decimals - min_decimals):
+            return cls._MPF_MIN_FIXED
+        elif mpf > max_digits * 10 ** (mpf_decimals - max_decimals):
+            return cls._MPF_MAX_FIXED
+        
+        return mpf, mpf_decimals
+    
+    @classmethod
+    async def calculate_landed_cost_batch(
+        cls,
+        db: AsyncSession,
+        hts_codes: Sequence[str],
+        country_codes: Sequence[str],
+        product_values: Sequence[float],
+        quantities: Optional[Sequence[float]] = None,
+        freight_costs: Optional[Sequence[float]] = None,
+        insurance_costs: Optional[Sequence[float]] = None,
+        other_costs: Optional[Sequence[float]] = None,
+        currencies: Optional[Sequence[str]] = None,
+        as_of_dates: Optional[Sequence[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Calculate landed costs for many shipments from columnar inputs.
+        
+        Tariff data is loaded with a handful of IN (...) queries and every
+        row is priced in one vectorized pass; results match
+        calculate_landed_cost to the cent.
+        
+        Args:
+            db: Database session
+            hts_codes: HTS code per row
+            country_codes: Country of origin per row
+            product_values: FOB value per row
+            quantities: Quantity per row (default 1)
+            freight_costs: Freight cost per row (default 0)
+            insurance_costs: Insurance cost per row (default 0)
+            other_costs: Other costs per row (default 0)
+            currencies: Currency per row (default USD)
+            as_of_dates: Entry date per row; None entries (or no column)
+                use the rates currently in force
+            
+        Returns:
+            Columnar results with per-row status and errors
+        """
+        try:
+            start_time = datetime.utcnow()
+            
+            rate_context = await cls.load_rate_context(
+                db, hts_codes, country_codes, with_history=as_of_dates is not None
+            )
+            fx_rates = await cls.load_fx_rates(currencies if currencies is not None else ["USD"])
+            
+            result = cls.price_batch(
+                rate_context, fx_rates, hts_codes, country_codes, product_values,
+                quantities, freight_costs, insurance_costs, other_costs, currencies,
+                as_of_dates
+            )
+            
+            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            result["execution_time_ms"] = execution_time
+            log_business_event(
+                "tariff_batch_calculation",
+                details={
+                    "row_count": result["row_count"],
+                    "failed_count": result["failed_count"],
+                    "execution_time_ms": execution_time
+                }
+            )
+            
+            logger.info(
+                f"Priced {result['row_count']} shipments in {execution_time:.1f}ms "
+                f"({result['failed_count']} failed)"
+            )
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error calculating landed cost batch: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_code": "BATCH_CALCULATION_ERROR"
+            }
+    
+    @classmethod
+    def price_batch(
+        cls,
+        rate_context: Dict[str, Dict],
+        fx_rates: Dict[str, float],
+        hts_codes: Sequence[str],
+        country_codes: Sequence[str],
+        product_values: Sequence[float],
+        quantities: Optional[Sequence[float]] = None,
+        freight_costs: Optional[Sequence[float]] = None,
+        insurance_costs: Optional[Sequence[float]] = None,
+        other_costs: Optional[Sequence[float]] = None,
+        currencies: Optional[Sequence[str]] = None,
+        as_of_dates: Optional[Sequence[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Price columnar rows against preloaded tariff and FX data.
+        
+        Pure CPU work with no I/O, so callers may run chunks in worker
+        threads. Rows whose HTS code or country is missing from
+        rate_context are marked failed. Dated rows need a rate_context
+        with a rate index (load_rate_context with_history=True), which
+        also holds deactivated HTS codes; only dated rows may use those.
+        
+        Args:
+            rate_context: Result of load_rate_context covering these rows
+            fx_rates: Result of load_fx_rates covering these currencies
+            hts_codes: HTS code per row
+            country_codes: Country of origin per row
+            product_values: FOB value per row
+            quantities: Quantity per row (default 1)
+            freight_costs: Freight cost per row (default 0)
+            insurance_costs: Insurance cost per row (default 0)
+            other_costs: Other costs per row (default 0)
+            currencies: Currency per row (default USD)
+            as_of_dates: Entry date per row (default: current rates)
+            
+        Returns:
+            Columnar results with per-row status and errors
+        """
+        row_count = len(hts_codes)
+        
+        def column(values, default):
+            if values is None:
+                return np.full(row_count, default, dtype=float)
+            array = np.asarray(values, dtype=float)
+            if len(array) != row_count:
+                raise ValueError("All input columns must have the same length")
+            return array
+        
+        product_vals = column(product_values, 0.0)
+        quantity_vals = column(quantities, 1.0)
+        freight_vals = column(freight_costs, 0.0)
+        insurance_vals = column(insurance_costs, 0.0)
+        other_vals = column(other_costs, 0.0)
+        
+        if len(country_codes) != row_count:
+            raise ValueError("All input columns must have the same length")
+        clean_codes = [cls._clean_hts_code(code) for code in hts_codes]
+        clean_countries = [str(code).upper() for code in country_codes]
+        clean_currencies = (
+            [str(c).upper() for c in currencies] if currencies is not None
+            else ["USD"] * row_count
+        )
+        if as_of_dates is None:
+            clean_dates = [None] * row_count
+        elif len(as_of_dates) != row_count:
+            raise ValueError("All input columns must have the same length")
+        else:
+            clean_dates = [as_of_datetime(value) for value in as_of_dates]
+        
+        hts_by_code = rate_context["hts_codes"]
+        countries = rate_context["countries"]
+        rates = rate_context["rates"]
+        rate_index = rate_context.get("rate_index")
+        
+        # Resolve rates once per distinct (HTS, country, as-of) key
+        effective_rates = np.full(row_count, np.nan)
+        ad_rates = np.full(row_count, np.nan)
+        cvd_rates = np.full(row_count, np.nan)
+        errors = []
+        resolved: Dict[tuple, Any] = {}
+        
+        for i, key in enumerate(zip(clean_codes, clean_countries, clean_dates)):
+            if key not in resolved:
+                code, country_code, as_of = key
+                hts_obj = hts_by_code.get(code)
+                country = countries.get(country_code)
+                if not hts_obj or (as_of is None and not hts_obj.is_active):
+                    resolved[key] = f"HTS code not found: {code}"
+                elif not country:
+                    resolved[key] = f"Country not found: {country_code}"
+                elif as_of is not None and rate_index is None:
+                    raise ValueError("rate_context has no rate history for dated rows")
+                elif as_of is not None and hts_obj.effective_date and hts_obj.effective_date > as_of:
+                    resolved[key] = f"HTS code {code} not in effect on {as_of.date().isoformat()}"
+                else:
+                    tariff_rate = (
+                        rates.get((hts_obj.id, country.id)) if as_of is None
+                        else rate_index.get(hts_obj.id, country.id, as_of)
+                    )
+                    resolved[key] = (
+                        (tariff_rate.effective_rate, tariff_rate.antidumping_duty,
+                         tariff_rate.countervailing_duty)
+                        if tariff_rate else (0.0, 0.0, 0.0)
+                    )
+            
+            outcome = resolved[key]
+            if isinstance(outcome, str):
+                errors.append({"index": i, "error": outcome})
+            else:
+                effective_rates[i], ad_rates[i], cvd_rates[i] = outcome
+        
+        # Convert to USD
+        exchange_rates = np.array([fx_rates[c] for c in clean_currencies], dtype=float)
+        product_vals = product_vals * exchange_rates
+        freight_vals = freight_vals * exchange_rates
+        insurance_vals = insurance_vals * exchange_rates
+        other_vals = other_vals * exchange_rates
+        
+        costs = cls._compute_costs_vectorized(
+            product_vals, freight_vals, insurance_vals, other_vals,
+            quantity_vals, effective_rates, ad_rates, cvd_rates
+        )
+        
+        columns: Dict[str, List[Any]] = {
+            "hts_code": clean_codes,
+            "country_code": clean_countries,
+            "currency": clean_currencies,
+            "exchange_rate_used": exchange_rates.tolist(),
+            "tariff_rate": effective_rates.tolist(),
+            "antidumping_rate": ad_rates.tolist(),
+            "countervailing_rate": cvd_rates.tolist(),
+        }
+        for name, values in costs.items():
+            columns[name] = values.tolist()
+        
+        # Failed rows carry None instead of NaN so results stay JSON-safe
+        status = ["completed"] * row_count
+        for error in errors:
+            i = error["index"]
+            status[i] = "failed"
+            for name in ("tariff_rate", "antidumping_rate", "countervailing_rate", *costs):
+                columns[name][i] = None
+        columns["status"] = status
+        
+        hts_popularity_tracker.record_many(
+            code for code, row_status in zip(clean_codes, status) if row_status == "completed"
+        )
+        
+        return {
+            "success": True,
+            "row_count": row_count,
+            "completed_count": row_count - len(errors),
+            "failed_count": len(errors),
+            "columns": columns,
+            "errors": errors
+        }
+    
+    @classmethod
+    async def calculate_landed_cost_sweep(
+        cls,
+        db: AsyncSession,
+        hts_code: str,
+        country_code: str,
+        product_values: Sequence[float],
+        freight_costs: Optional[Sequence[float]] = None,
+        fx_shocks: Optional[Sequence[float]] = None,
+        quantity: float = 1.0,
+        insurance_cost: float = 0.0,
+        other_costs: float = 0.0,
+        currency: str = "USD",
+        columnar: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Price a what-if grid of one shipment in a single vectorized pass.
+        
+        Every combination of product value, freight cost and FX shock is
+        priced; cells match calculate_landed_cost to the cent.
+        
+        Args:
+            db: Database session
+            hts_code: HTS code for the product
+            country_code: Country of origin
+            product_values: Product value axis
+            freight_costs: Freight cost axis (default [0])
+            fx_shocks: Multipliers applied to the currency-to-USD rate
+                (default [1]; 1.1 means the currency is 10% stronger)
+            quantity: Quantity of items
+            insurance_cost: Insurance cost
+            other_costs: Other additional costs
+            currency: Currency of values
+            columnar: Return flat per-metric arrays in C order over "shape"
+                instead of one dict per cell
+            
+        Returns:
+            Axes, grid shape and per-cell cost components
+        """
+        try:
+            start_time = datetime.utcnow()
+            
+            axes = {
+                "product_value": np.asarray(product_values, dtype=float),
+                "freight_cost": np.asarray(freight_costs if freight_costs is not None else [0.0], dtype=float),
+                "fx_shock": np.asarray(fx_shocks if fx_shocks is not None else [1.0], dtype=float)
+            }
+            shape = tuple(len(axis) for axis in axes.values())
+            cell_count = int(np.prod(shape))
+            if cell_count == 0:
+                raise ValueError("Every sweep axis needs at least one value")
+            if cell_count > cls.MAX_SWEEP_CELLS:
+                raise ValueError(f"Sweep grid has {cell_count} cells; the limit is {cls.MAX_SWEEP_CELLS}")
+            
+            hts_obj, country, tariff_rate = await cls._resolve_rate(db, hts_code, country_code)
+            if tariff_rate:
+                rates = (tariff_rate.effective_rate, tariff_rate.antidumping_duty, tariff_rate.countervailing_duty)
+            else:
+                rates = (0.0, 0.0, 0.0)
+            base_rate = await cls._get_usd_rate(currency)
+            
+            values, freights, shocks = np.meshgrid(*axes.values(), indexing="ij")
+            fx = (base_rate * shocks).ravel()
+            
+            def full(value: float) -> np.ndarray:
+                return np.full(cell_count, value, dtype=float)
+            
+            costs = cls._compute_costs_vectorized(
+                values.ravel() * fx, freights.ravel() * fx,
+                full(insurance_cost) * fx, full(other_costs) * fx,
+                full(quantity), full(rates[0]), full(rates[1]), full(rates[2])
+            )
+            
+            grid: Dict[str, Any] = {
+                name: costs[name].tolist()
+                for name in (
+                    "cif_value", "duty_amount", "ad_amount", "cvd_amount", "mpf_amount",
+                    "hmf_amount", "total_landed_cost", "unit_landed_cost"
+                )
+            }
+            grid["exchange_rate_used"] = fx.tolist()
+            
+            if not columnar:
+                coordinates = {
+                    "product_value": values.ravel().tolist(),
+                    "freight_cost": freights.ravel().tolist(),
+                    "fx_shock": shocks.ravel().tolist()
+                }
+                columns = {**coordinates, **grid}
+                grid = [dict(zip(columns, cell)) for cell in zip(*columns.values())]
+            
+            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            log_business_event(
+                "tariff_sweep_calculation",
+                details={
+                    "hts_code": hts_code,
+                    "country": country_code,
+                    "cell_count": cell_count,
+                    "execution_time_ms": execution_time
+                }
+            )
+            
+            return {
+                "success": True,
+                "hts_code": hts_code,
+                "country_code": country_code,
+                "country_name": country.name,
+                "currency": currency,
+                "base_exchange_rate": base_rate,
+                "rates_applied": {
+                    "tariff_rate": rates[0],
+                    "antidumping_rate": rates[1],
+                    "countervailing_rate": rates[2],
+                    "total_duty_rate": sum(rates)
+                },
+                "axes": {name: axis.tolist() for name, axis in axes.items()},
+                "shape": list(shape),
+                "cell_count": cell_count,
+                "format": "columnar" if columnar else "rows",
+                "grid": grid,
+                "execution_time_ms": execution_time
+            }
+            
+        except Exception as e:
+            logger.error(f"Error calculating landed cost sweep: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_code": "SWEEP_CALCULATION_ERROR"
+            }
+    
+    @classmethod
+    async def load_rate_context(
+        cls,
+        db: AsyncSession,
+        hts_codes: Iterable[str],
+        country_codes: Iterable[str],
+        with_history: bool = False
+    ) -> Dict[str, Dict]:
+        """
+        Load HTS codes, countries and tariff rates for a set of rows.
+        
+        Args:
+            db: Database session
+            hts_codes: HTS codes (dots optional)
+            country_codes: Country codes
+            with_history: Also load superseded rate versions into a
+                "rate_index", and deactivated HTS codes, for pricing rows
+                at past entry dates
+            
+        Returns:
+            Dict with "hts_codes" (code -> HTSCode), "countries"
+            (code -> Country), "rates" ((hts_id, country_id) -> active
+            TariffRate) and, from the snapshot or with_history,
+            "rate_index" (RateIntervalIndex)
+        """
+        # A current snapshot already holds every row
+        snapshot = tariff_snapshot_service.get()
+        if snapshot:
+            return snapshot.rate_context(with_history)
+        
+        def chunks(values: List[Any]):
+            for i in range(0, len(values), _IN_CLAUSE_CHUNK):
+                yield values[i:i + _IN_CLAUSE_CHUNK]
+        
+        hts_by_code: Dict[str, HTSCode] = {}
+        for chunk in chunks(sorted({cls._clean_hts_code(c) for c in hts_codes})):
+            stmt = select(HTSCode).where(HTSCode.hts_code.in_(chunk))
+            if not with_history:
+                stmt = stmt.where(HTSCode.is_active == True)
+            result = await db.execute(stmt)
+            for h in result.scalars():
+                # An active row wins over deactivated rows with the same code
+                if h.is_active or h.hts_code not in hts_by_code:
+                    hts_by_code[h.hts_code] = h
+        
+        countries: Dict[str, Country] = {}
+        for chunk in chunks(sorted({str(c).upper() for c in country_codes})):
+            result = await db.execute(select(Country).where(Country.code.in_(chunk)))
+            countries.update((c.code, c) for c in result.scalars())
+        
+        versions: List[TariffRate] = []
+        country_ids = [c.id for c in countries.values()]
+        if country_ids:
+            for chunk in chunks([h.id for h in hts_by_code.values()]):
+                stmt = select(TariffRate).where(
+                    TariffRate.hts_code_id.in_(chunk),
+                    TariffRate.country_id.in_(country_ids)
+                )
+                if not with_history:
+                    stmt = stmt.where(TariffRate.is_active == True)
+                result = await db.execute(stmt)
+                versions.extend(result.scalars())
+        
+        rates = {(r.hts_code_id, r.country_id): r for r in versions if r.is_active}
+        context = {"hts_codes": hts_by_code, "countries": countries, "rates": rates}
+        if with_history:
+            context["rate_index"] = RateIntervalIndex(versions)
+        return context
+    
+    @classmethod
+    async def load_fx_rates(cls, currencies: Iterable[str]) -> Dict[str, float]:
+        """Look up the USD conversion rate once per distinct currency."""
+        return {
+            currency: await cls._get_usd_rate(currency)
+            for currency in {str(c).upper() for c in currencies}
+        }
+    
+    @staticmethod
+    def _clean_hts_code(hts_code: str) -> str:
+        """Normalize an HTS code the way get_hts_code_by_code does."""
+        return str(hts_code).replace(".", "").zfill(10)
+    
+    @classmethod
+    async def _get_usd_rate(cls, currency: str) -> float:
+        """Get the rate converting currency into USD."""
+        if currency.upper() == "USD":
+            return 1.0
+        return await exchange_rate_service.get_exchange_rate(currency, "USD")
+    
     @classmethod
     async def _get_country(cls, db: AsyncSession, country_code: str) -> Optional[Country]:
         """Get country by code."""
@@ -272,6 +1223,62 @@ class TariffCalculationEngine:
         result = await db.execute(stmt)
         return result.scalar_one_or_none()
     
+    @classmethod
+    async def _get_tariff_rate_as_of(
+        cls,
+        db: AsyncSession,
+        hts_code_id: int,
+        country_id: int,
+        as_of: datetime
+    ) -> Optional[TariffRate]:
+        """Get the tariff rate version in force on a date."""
+        stmt = (
+            select(TariffRate)
+            .where(
+                TariffRate.hts_code_id == hts_code_id,
+                TariffRate.country_id == country_id,
+                # Undated rows count as in force from the start, as in RateIntervalIndex
+                or_(TariffRate.effective_date.is_(None), TariffRate.effective_date <= as_of)
+            )
+            .order_by(TariffRate.effective_date.desc().nulls_last(), TariffRate.is_active.desc())
+            .limit(1)
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    @classmethod
+    def _build_calculation_record(
+        cls,
+        hts_code_id: int,
+        country_id: int,
+        calculation_result: Dict[str, Any],
+        user_id: int
+    ) -> Dict[str, Any]:
+        """Build the TariffCalculation audit row values for a result."""
+        calc_values = calculation_result["calculated_values"]
+        input_values = calculation_result["input_values"]
+        rates = calculation_result["rates_applied"]
+        
+        return {
+            "hts_code_id": hts_code_id,
+            "country_id": country_id,
+            "product_value": input_values["product_value"],
+            "quantity": input_values["quantity"],
+            "unit_price": input_values["product_value"] / input_values["quantity"],
+            "currency": "USD",  # Always stored in USD
+            "freight_cost": input_values["freight_cost"],
+            "insurance_cost": input_values["insurance_cost"],
+            "other_costs": input_values["other_costs"],
+            "cif_value": calc_values["cif_value"],
+            "duty_amount": calc_values["duty_amount"],
+            "mpf_amount": calc_values["mpf_amount"],
+            "total_landed_cost": calc_values["total_landed_cost"],
+            "applied_tariff_rate": rates["tariff_rate"],
+            "applied_ad_rate": rates["antidumping_rate"],
+            "applied_cvd_rate": rates["countervailing_rate"],
+            "exchange_rate_used": input_values["exchange_rate_used"]
+        }
+    
     @classmethod
     async def _save_calculation(
         cls,
@@ -282,32 +1289,29 @@ class TariffCalculationEngine:
         user_id: int
     ) -> None:
         """Save calculation to database for audit trail."""
+        await cls._save_calculations(db, [
+            cls._build_calculation_record(hts_code_id, country_id, calculation_result, user_id)
+        ])
+    
+    @classmethod
+    async def _save_calculations(
+        cls,
+        db: AsyncSession,
+        records: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Persist audit rows.
+        
+        Rows go to the write-behind audit writer when it is running, so the
+        request never waits on a commit; otherwise they are committed here.
+        """
         try:
-            calc_values = calculation_result["calculated_values"]
-            input_values = calculation_result["input_values"]
-            rates = calculation_result["rates_applied"]
-            
-            calculation = TariffCalculation(
-                hts_code_id=hts_code_id,
-                country_id=country_id,
-                product_value=input_values["product_value"],
-                quantity=input_values["quantity"],
-                unit_price=input_values["product_value"] / input_values["quantity"],
-                currency="USD",  # Always stored in USD
-                freight_cost=input_values["freight_cost"],
-                insurance_cost=input_values["insurance_cost"],
-                other_costs=input_values["other_costs"],
-                cif_value=calc_values["cif_value"],
-                duty_amount=calc_values["duty_amount"],
-                mpf_amount=calc_values["mpf_amount"],
-                total_landed_cost=calc_values["total_landed_cost"],
-                applied_tariff_rate=rates["tariff_rate"],
-                applied_ad_rate=rates["antidumping_rate"],
-                applied_cvd_rate=rates["countervailing_rate"],
-                exchange_rate_used=input_values["exchange_rate_used"]
-            )
+            if calculation_audit_writer.is_running:
+                for record in records:
+                    await calculation_audit_writer.enqueue(record)
+                return
             
-            db.add(calculation)
+            db.add_all(TariffCalculation(**record) for record in records)
             await db.commit()
             
         except Exception as e:
@@ -321,39 +1325,122 @@ class TariffCalculationEngine:
         hts_code: str,
         product_value: float,
         countries: List[str],
-        **kwargs
+        quantity: float = 1.0,
+        freight_cost: float = 0.0,
+        insurance_cost: float = 0.0,
+        other_costs: float = 0.0,
+        currency: str = "USD",
+        user_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Compare sourcing options across multiple countries.
         
+        The HTS code, every requested country and their tariff rates come
+        from the tariff snapshot, or from one joined query when it is not
+        current; all options are then priced in memory.
+        
         Args:
             db: Database session
             hts_code: HTS code
             product_value: Product value
             countries: List of country codes to compare
-            **kwargs: Additional calculation parameters
+            quantity: Quantity of items
+            freight_cost: Shipping/freight cost
+            insurance_cost: Insurance cost
+            other_costs: Other additional costs
+            currency: Currency of values
+            user_id: User performing the comparison
             
         Returns:
             Comparison results with rankings
         """
         try:
-            results = []
+            clean_code = cls._clean_hts_code(hts_code)
+            country_codes = list(dict.fromkeys(code.upper() for code in countries))
+            
+            snapshot = tariff_snapshot_service.get()
+            if snapshot:
+                hts_obj = snapshot.get_hts_code(clean_code)
+                rows = [
+                    (hts_obj, country, snapshot.get_rate(hts_obj.id, country.id))
+                    for country in map(snapshot.get_country, country_codes)
+                    if hts_obj and country
+                ]
+            else:
+                # HTS row x requested countries, with each pair's active rate if any
+                stmt = (
+                    select(HTSCode, Country, TariffRate)
+                    .select_from(HTSCode)
+                    .join(Country, Country.code.in_(country_codes))
+                    .outerjoin(
+                        TariffRate,
+                        and_(
+                            TariffRate.hts_code_id == HTSCode.id,
+                            TariffRate.country_id == Country.id,
+                            TariffRate.is_active == True
+                        )
+                    )
+                    .where(
+                        and_(
+                            HTSCode.hts_code == clean_code,
+                            HTSCode.is_active == True
+                        )
+                    )
+                )
+                rows = (await db.execute(stmt)).all()
+            
+            if not rows and country_codes:
+                raise ValueError(f"HTS code not found or no known countries: {hts_code}")
             
-            for country_code in countries:
-                result = await cls.calculate_landed_cost(
-                    db, hts_code, country_code, product_value, **kwargs
+            exchange_rate = await cls._get_usd_rate(currency)
+            if currency != "USD":
+                product_value *= exchange_rate
+                freight_cost *= exchange_rate
+                insurance_cost *= exchange_rate
+                other_costs *= exchange_rate
+            
+            results = []
+            records = []
+            for hts_obj, country, tariff_rate in rows:
+                if tariff_rate:
+                    effective_rate = tariff_rate.effective_rate
+                    ad_rate = tariff_rate.antidumping_duty
+                    cvd_rate = tariff_rate.countervailing_duty
+                else:
+                    effective_rate = ad_rate = cvd_rate = 0.0
+                
+                costs = cls._compute_costs(
+                    product_value, freight_cost, insurance_cost, other_costs,
+                    quantity, effective_rate, ad_rate, cvd_rate
+                )
+                result = cls._build_result(
+                    hts_code, hts_obj, country.code, country, costs, quantity,
+                    currency, exchange_rate, effective_rate, ad_rate, cvd_rate
                 )
+                if user_id:
+                    records.append(cls._build_calculation_record(
+                        hts_obj.id, country.id, result, user_id
+                    ))
                 
-                if result["success"]:
-                    results.append({
-                        "country_code": country_code,
-                        "country_name": result["country_name"],
-                        "total_cost": result["calculated_values"]["total_landed_cost"],
-                        "duty_rate": result["rates_applied"]["total_duty_rate"],
-                        "trade_preferences": result["trade_preferences"],
-                        "risk_level": result["calculation_metadata"]["country_risk_level"],
-                        "details": result
-                    })
+                results.append({
+                    "country_code": country.code,
+                    "country_name": result["country_name"],
+                    "total_cost": result["calculated_values"]["total_landed_cost"],
+                    "duty_rate": result["rates_applied"]["total_duty_rate"],
+                    "trade_preferences": result["trade_preferences"],
+                    "risk_level": result["calculation_metadata"]["country_risk_level"],
+                    "details": result
+                })
+            
+            hts_popularity_tracker.record(clean_code)
+            
+            # Save all audit rows together
+            if records:
+                await cls._save_calculations(db, records)
+            
+            # Keep the caller's country order for equal costs
+            order = {code: i for i, code in enumerate(country_codes)}
+            results.sort(key=lambda x: order[x["country_code"]])
             
             # Sort by total cost (lowest first)
             results.sort(key=lambda x: x["total_cost"])
@@ -3,17 +3,32 @@ TariffDatabaseService for ATLAS Enterprise
 HTS code lookup, duty rates, and tariff data management.
 """
 
-from typing import List, Optional, Dict, Any
+import asyncio
+import io
+from typing import List, Optional, Dict, Any, Tuple, Sequence, Set
+import pandas as pd
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func
+from sqlalchemy import select, and_, or_, func, literal
 from sqlalchemy.orm import selectinload
 
 from models.tariff import HTSCode, TariffRate
 from models.country import Country
 from core.logging import get_logger
+from services.hts_search_index import normalize_code_query
+from services.tariff_snapshot import (
+    tariff_snapshot_service,
+    ROLLUP_LEVELS,
+    rollup_row,
+    rollup_etag
+)
+from services.hts_fulltext_service import hts_fulltext_service
+from services.hts_popularity_tracker import hts_popularity_tracker
 
 logger = get_logger(__name__)
 
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_IN_CLAUSE_CHUNK = 500
+
 
 class TariffDatabaseService:
     """Service for tariff database operations and HTS code management."""
@@ -23,7 +38,8 @@ class TariffDatabaseService:
         db: AsyncSession,
         query: str,
         limit: int = 20,
-        chapter: Optional[str] = None
+        chapter: Optional[str] = None,
+        mode: str = "prefix"
     ) -> List[HTSCode]:
         """
         Search HTS codes by description or code.
@@ -33,11 +49,24 @@ class TariffDatabaseService:
             query: Search query
             limit: Maximum results to return
             chapter: Optional chapter filter
+            mode: "prefix" for code/substring matching, "fulltext" for
+                relevance-ranked description search
             
         Returns:
             List of matching HTS codes
         """
         try:
+            # Code lookups stay on the prefix path even in fulltext mode
+            if mode == "fulltext" and query and not normalize_code_query(query).isdigit():
+                return await hts_fulltext_service.search(db, query, limit, chapter)
+            
+            # Serve from the tariff snapshot's index when it is current
+            snapshot = tariff_snapshot_service.get()
+            if snapshot:
+                hts_codes = snapshot.search_index.search(query, limit, chapter)
+                logger.info(f"Found {len(hts_codes)} HTS codes for query: {query} (snapshot v{snapshot.version})")
+                return hts_codes
+            
             # Build the query
             stmt = select(HTSCode).where(HTSCode.is_active == True)
             
@@ -79,7 +108,8 @@ class TariffDatabaseService:
     @staticmethod
     async def get_hts_code_by_code(
         db: AsyncSession,
-        hts_code: str
+        hts_code: str,
+        include_inactive: bool = False
     ) -> Optional[HTSCode]:
         """
         Get HTS code by exact code match.
@@ -87,6 +117,8 @@ class TariffDatabaseService:
         Args:
             db: Database session
             hts_code: HTS code to find
+            include_inactive: Also match deactivated codes (for pricing
+                past entries); an active row wins over inactive ones
             
         Returns:
             HTS code if found
@@ -95,15 +127,15 @@ class TariffDatabaseService:
             # Clean the code (remove dots, ensure 10 digits)
             clean_code = hts_code.replace(".", "").zfill(10)
             
-            stmt = select(HTSCode).where(
-                and_(
-                    HTSCode.hts_code == clean_code,
-                    HTSCode.is_active == True
-                )
-            ).options(selectinload(HTSCode.tariff_rates))
+            stmt = select(HTSCode).where(HTSCode.hts_code == clean_code)
+            if not include_inactive:
+                stmt = stmt.where(HTSCode.is_active == True)
+            stmt = stmt.order_by(HTSCode.is_active.desc()).limit(1).options(
+                selectinload(HTSCode.tariff_rates)
+            )
             
             result = await db.execute(stmt)
-            hts_code_obj = result.scalar_one_or_none()
+            hts_code_obj = result.scalars().first()
             
             if hts_code_obj:
                 logger.info(f"Found HTS code: {hts_code_obj.hts_code}")
@@ -164,7 +196,7 @@ class TariffDatabaseService:
     @staticmethod
     async def get_chapters_summary(db: AsyncSession) -> List[Dict[str, Any]]:
         """
-        Get summary of HTS chapters with counts.
+        Get summary of HTS chapters with counts and MFN rate statistics.
         
         Args:
             db: Database session
@@ -172,67 +204,142 @@ class TariffDatabaseService:
         Returns:
             List of chapter summaries
         """
+        rows, _ = await TariffDatabaseService.get_hts_rollup(db, "chapter")
+        chapters = [{"chapter": row["code"], **row} for row in rows]
+        
+        logger.info(f"Retrieved {len(chapters)} HTS chapters")
+        return chapters
+    
+    @staticmethod
+    async def get_hts_rollup(
+        db: AsyncSession,
+        level: str = "chapter"
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Get code counts and MFN rate min/avg/max per chapter, heading or subheading.
+        
+        Served from the rollups precomputed with the tariff snapshot; the
+        database is only aggregated while no current snapshot is loaded.
+        
+        Args:
+            db: Database session
+            level: "chapter", "hts_4" or "hts_6"
+            
+        Returns:
+            Rollup rows ordered by code, and their ETag
+        """
+        if level not in ROLLUP_LEVELS:
+            raise ValueError(f"Unknown rollup level: {level}")
+        
+        snapshot = tariff_snapshot_service.get()
+        if snapshot is not None:
+            return snapshot.rollups[level], snapshot.rollup_etags[level]
+        
         try:
+            group_column = getattr(HTSCode, ROLLUP_LEVELS[level])
+            description = (
+                func.min(HTSCode.chapter_description) if level == "chapter"
+                else literal(None)
+            )
             stmt = select(
-                HTSCode.hts_2,
-                HTSCode.chapter_description,
-                func.count(HTSCode.id).label('code_count')
+                group_column.label("code"),
+                description.label("description"),
+                func.count(func.distinct(HTSCode.id)).label("code_count"),
+                func.count(TariffRate.id).label("rate_count"),
+                func.min(TariffRate.mfn_rate).label("min_rate"),
+                func.avg(TariffRate.mfn_rate).label("avg_rate"),
+                func.max(TariffRate.mfn_rate).label("max_rate")
+            ).select_from(HTSCode).outerjoin(
+                TariffRate,
+                and_(
+                    TariffRate.hts_code_id == HTSCode.id,
+                    TariffRate.is_active == True
+                )
             ).where(
                 HTSCode.is_active == True
-            ).group_by(
-                HTSCode.hts_2,
-                HTSCode.chapter_description
-            ).order_by(HTSCode.hts_2)
+            ).group_by(group_column).order_by(group_column)
             
             result = await db.execute(stmt)
-            chapters = []
-            
-            for row in result:
-                chapters.append({
-                    "chapter": row.hts_2,
-                    "description": row.chapter_description,
-                    "code_count": row.code_count
-                })
-            
-            logger.info(f"Retrieved {len(chapters)} HTS chapters")
-            return chapters
+            rows = [
+                rollup_row(
+                    row.code, row.description, row.code_count, row.rate_count,
+                    row.min_rate,
+                    float(row.avg_rate) if row.avg_rate is not None else None,
+                    row.max_rate
+                )
+                for row in result
+            ]
+            return rows, rollup_etag(rows)
             
         except Exception as e:
-            logger.error(f"Error getting chapters summary: {e}")
+            logger.error(f"Error getting {level} rollup: {e}")
             raise
     
+    @staticmethod
+    def get_hierarchy_node(code: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Get one node of the HTS tree with its aggregates and children.
+        
+        Reads only the in-memory hierarchy; while a reload is pending the
+        previous snapshot keeps answering.
+        
+        Args:
+            code: Chapter, heading, subheading, 8- or 10-digit code; empty
+                for the list of chapters
+            
+        Returns:
+            Node with ancestors, aggregates and child summaries, or None if
+            no active code has that prefix
+        """
+        snapshot = tariff_snapshot_service.get(allow_stale=True)
+        if snapshot is None:
+            raise RuntimeError("Tariff snapshot is not loaded")
+        
+        node = snapshot.hierarchy.get_node(code)
+        return node.payload if node else None
+    
     @staticmethod
     async def get_popular_hts_codes(
         db: AsyncSession,
         limit: int = 10
     ) -> List[HTSCode]:
         """
-        Get most frequently used HTS codes based on calculation history.
+        Get the most used HTS codes, by recent lookups and calculations.
+        
+        Ranking comes from hts_popularity_tracker, which decays older
+        usage; only the top codes themselves are fetched.
         
         Args:
             db: Database session
             limit: Number of codes to return
             
         Returns:
-            List of popular HTS codes
+            List of popular HTS codes, most used first
         """
         try:
-            # This would join with calculation history to find most used codes
-            # For now, return codes with lowest rates (most trade-friendly)
-            stmt = select(HTSCode).join(TariffRate).where(
-                and_(
-                    HTSCode.is_active == True,
-                    TariffRate.is_active == True
+            ranked = [code for code, _ in hts_popularity_tracker.top(limit)]
+            
+            snapshot = tariff_snapshot_service.get()
+            if snapshot is not None:
+                codes = [snapshot.hts_codes.get(code) for code in ranked]
+            elif ranked:
+                stmt = select(HTSCode).where(
+                    and_(
+                        HTSCode.hts_code.in_(ranked),
+                        HTSCode.is_active == True
+                    )
                 )
-            ).group_by(HTSCode.id).order_by(
-                func.avg(TariffRate.mfn_rate)
-            ).limit(limit)
+                result = await db.execute(stmt)
+                by_code = {hts.hts_code: hts for hts in result.scalars().all()}
+                codes = [by_code.get(code) for code in ranked]
+            else:
+                codes = []
             
-            result = await db.execute(stmt)
-            codes = result.scalars().all()
+            # Codes deactivated since they were counted drop out
+            codes = [hts for hts in codes if hts is not None]
             
             logger.info(f"Retrieved {len(codes)} popular HTS codes")
-            return list(codes)
+            return codes
             
         except Exception as e:
             logger.error(f"Error getting popular HTS codes: {e}")
@@ -293,4 +400,149 @@ class TariffDatabaseService:
                 "formatted_code": None,
                 "errors": [f"Validation error: {str(e)}"],
                 "warnings": []
-            } 
\ No newline at end of file
+            }
+    
+    @staticmethod
+    async def validate_hts_codes(
+        db: AsyncSession,
+        hts_codes: Sequence[Any],
+        check_existence: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Validate and format many HTS codes at once.
+        
+        Applies the validate_hts_code rules to the whole column in one
+        vectorized pass, then checks the formatted codes against the active
+        schedule with a single set lookup.
+        
+        Args:
+            db: Database session
+            hts_codes: Codes to validate, in input order
+            check_existence: Also require codes to be in the active schedule
+            
+        Returns:
+            Counts and per-row results shaped like validate_hts_code, plus
+            the original input and whether the code exists
+        """
+        try:
+            raw = pd.Series(list(hts_codes), dtype=object)
+            clean = raw.fillna("").astype(str)
+            clean = clean.str.replace(".", "", regex=False).str.replace(" ", "", regex=False)
+            
+            active_codes = None
+            if check_existence:
+                active_codes = await TariffDatabaseService._active_code_set(
+                    db, clean.str.zfill(10).unique().tolist()
+                )
+            
+            results = await asyncio.to_thread(
+                TariffDatabaseService._validate_code_column, raw, clean, active_codes
+            )
+            
+            valid_count = sum(1 for row in results if row["is_valid"])
+            return {
+                "total": len(results),
+                "valid_count": valid_count,
+                "invalid_count": len(results) - valid_count,
+                "warning_count": sum(1 for row in results if row["warnings"]),
+                "results": results
+            }
+            
+        except Exception as e:
+            logger.error(f"Error validating HTS code batch: {e}")
+            raise
+    
+    @staticmethod
+    def _validate_code_column(
+        raw: pd.Series,
+        clean: pd.Series,
+        active_codes: Optional[Set[str]]
+    ) -> List[Dict[str, Any]]:
+        """Vectorized validate_hts_code over cleaned codes, with optional existence check."""
+        lengths = clean.str.len()
+        padded = clean.str.zfill(10)
+        
+        too_short = (lengths < 4).tolist()
+        too_long = (lengths > 10).tolist()
+        non_digit = (~clean.str.isdigit()).tolist()
+        exists = (
+            padded.isin(active_codes).tolist() if active_codes is not None
+            else [None] * len(raw)
+        )
+        
+        results = []
+        for i, (value, code, length) in enumerate(zip(raw.tolist(), padded.tolist(), lengths.tolist())):
+            errors = []
+            warnings = []
+            if too_short[i]:
+                errors.append("HTS code must be at least 4 digits")
+            elif too_long[i]:
+                errors.append("HTS code cannot exceed 10 digits")
+            if non_digit[i]:
+                errors.append("HTS code must contain only digits")
+            
+            formatted = None
+            if not errors:
+                formatted = f"{code[:4]}.{code[4:6]}.{code[6:8]}.{code[8:]}"
+                if code[:2] == "00":
+                    warnings.append("Chapter 00 is reserved")
+                if code[2:4] == "00" and length > 4:
+                    warnings.append("Heading 00 within chapter is unusual")
+                if exists[i] is False:
+                    errors.append("HTS code not found in the active tariff schedule")
+            
+            results.append({
+                "input": value,
+                "is_valid": not errors,
+                "formatted_code": formatted,
+                "exists": exists[i] if formatted else False,
+                "errors": errors,
+                "warnings": warnings
+            })
+        return results
+    
+    @staticmethod
+    async def _active_code_set(db: AsyncSession, codes: List[str]) -> Set[str]:
+        """Which of the given 10-digit codes are active, from the snapshot or by IN (...) queries."""
+        snapshot = tariff_snapshot_service.get()
+        if snapshot is not None:
+            return {code for code in codes if code in snapshot.hts_codes}
+        
+        active = set()
+        for i in range(0, len(codes), _IN_CLAUSE_CHUNK):
+            result = await db.execute(
+                select(HTSCode.hts_code).where(
+                    and_(
+                        HTSCode.hts_code.in_(codes[i:i + _IN_CLAUSE_CHUNK]),
+                        HTSCode.is_active == True
+                    )
+                )
+            )
+            active.update(result.scalars().all())
+        return active
+    
+    @staticmethod
+    def read_hts_code_column(
+        content: bytes,
+        filename: str,
+        column: Optional[str] = None
+    ) -> List[Any]:
+        """
+        Read one column of HTS codes from an uploaded CSV or Excel file.
+        
+        Cells are read as text so leading zeros survive.
+        
+        Args:
+            content: File contents
+            filename: Original file name; .xlsx/.xls are read as Excel
+            column: Column name; defaults to the first column
+            
+        Returns:
+            Column values in file order
+        """
+        if filename.lower().endswith((".xlsx", ".xls")):
+            frame = pd.read_excel(io.BytesIO(content), dtype=str, usecols=[column] if column else [0])
+        else:
+            frame = pd.read_csv(io.BytesIO(content), dtype=str, usecols=[column] if column else [0])
+        values = frame.iloc[:, 0].astype(object)
+        return values.where(values.notna(), None).tolist()
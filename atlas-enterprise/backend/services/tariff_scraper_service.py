@@ -4,7 +4,6 @@ Web scraping service for real-time tariff updates from free government sources.
 """
 
 import asyncio
-import httpx
 import json
 import sqlite3
 import pandas as pd
@@ -23,6 +22,8 @@ from io import StringIO
 import schedule
 import threading
 
+from core.http_client import http_clients
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -224,7 +225,7 @@ class TariffScraperService:
         try:
             headers = {"User-Agent": random.choice(self.user_agents)}
             
-            async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
+            async with http_clients.session(timeout=30.0, headers=headers) as client:
                 # First, get available HTS chapters
                 chapters_url = "https://dataweb.usitc.gov/api/tariff/hts/chapters"
                 
@@ -280,7 +281,7 @@ class TariffScraperService:
         try:
             headers = {"User-Agent": random.choice(self.user_agents)}
             
-            async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
+            async with http_clients.session(timeout=30.0, headers=headers) as client:
                 # Get available countries
                 countries_url = "https://tariffdata.wto.org/api/v1/countries"
                 
@@ -336,7 +337,7 @@ class TariffScraperService:
         try:
             headers = {"User-Agent": random.choice(self.user_agents)}
             
-            async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
+            async with http_clients.session(timeout=30.0, headers=headers) as client:
                 # Get trade data (simplified approach)
                 base_url = "https://comtrade.un.org/api/get"
                 
@@ -386,7 +387,7 @@ class TariffScraperService:
         try:
             headers = {"User-Agent": random.choice(self.user_agents)}
             
-            async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
+            async with http_clients.session(timeout=30.0, headers=headers) as client:
                 # This is a simplified version - real implementation would be more complex
                 base_url = "https://ec.europa.eu/taxation_customs/dds2/taric/taric_consultation.jsp"
                 
@@ -434,7 +435,7 @@ class TariffScraperService:
         try:
             headers = {"User-Agent": random.choice(self.user_agents)}
             
-            async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
+            async with http_clients.session(timeout=30.0, headers=headers) as client:
                 # This is a placeholder - real implementation would access CBSA APIs/data
                 base_url = "https://www.cbsa-asfc.gc.ca"
                 
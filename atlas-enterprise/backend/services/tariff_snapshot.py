@@ -0,0 +1,483 @@
+"""
+Tariff Snapshot for ATLAS Enterprise
+Versioned, read-only in-process copy of the tariff schedule with atomic hot swap.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.tariff import HTSCode, TariffRate
+from models.country import Country
+from core.logging import get_logger
+from services.hts_search_index import HTSSearchIndex
+from services.hts_hierarchy import HTSHierarchy
+from services.rate_interval_index import RateIntervalIndex
+
+logger = get_logger(__name__)
+
+_WATCHED_MODELS = (HTSCode, TariffRate, Country)
+_DIRTY_FLAG = "tariff_snapshot_dirty"
+
+# Rollup level -> HTSCode column holding the group code
+ROLLUP_LEVELS = {"chapter": "hts_2", "hts_4": "hts_4", "hts_6": "hts_6"}
+
+
+@dataclass(frozen=True)
+class HTSRecord:
+    """Read-only copy of an active HTSCode row."""
+    id: int
+    hts_code: str
+    description: str
+    brief_description: Optional[str]
+    chapter_description: Optional[str]
+    unit_of_quantity: Optional[str]
+    hts_2: str
+    hts_4: str
+    hts_6: str
+    hts_8: str
+    effective_date: datetime
+    is_active: bool
+
+
+@dataclass(frozen=True)
+class CountryRecord:
+    """Read-only copy of a Country row."""
+    id: int
+    code: str
+    name: str
+    risk_level: str
+    trade_preferences: Tuple[str, ...]
+
+    def get_trade_preferences(self) -> List[str]:
+        """Mirror Country.get_trade_preferences()."""
+        return list(self.trade_preferences)
+
+
+@dataclass(frozen=True)
+class RateRecord:
+    """Read-only copy of a TariffRate row (any version, active or superseded)."""
+    hts_code_id: int
+    country_id: int
+    mfn_rate: float
+    specific_rate: float
+    fta_rate: Optional[float]
+    gsp_rate: Optional[float]
+    antidumping_duty: float
+    countervailing_duty: float
+    effective_rate: float
+    total_duty_rate: float
+    effective_date: Optional[datetime]
+    is_active: bool
+
+
+def rollup_row(
+    code: str,
+    description: Optional[str],
+    code_count: int,
+    rate_count: int,
+    min_rate: Optional[float],
+    avg_rate: Optional[float],
+    max_rate: Optional[float]
+) -> Dict[str, Any]:
+    """Build one rollup row; the average is rounded so SQL and Python agree."""
+    return {
+        "code": code,
+        "description": description,
+        "code_count": code_count,
+        "rate_count": rate_count,
+        "min_rate": min_rate,
+        "avg_rate": round(avg_rate, 4) if avg_rate is not None else None,
+        "max_rate": max_rate
+    }
+
+
+def rollup_etag(rows: List[Dict[str, Any]]) -> str:
+    """
+    ETag over rollup content, equal for equal data in any process.
+
+    Weak, because response envelopes around the rows carry a timestamp.
+    """
+    digest = hashlib.sha256(json.dumps(rows, sort_keys=True).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+class TariffSnapshot:
+    """
+    Immutable tariff schedule at one version.
+
+    Holds active HTS codes by code, countries by ISO code, and the
+    HTS x country rate matrix stored sparsely as (hts_id, country_id) ->
+    rate; pairs without a row take the 0% default, as in the DB path.
+    Every rate version, superseded ones included, is kept in rate_index
+    for effective-dated lookups, and deactivated HTS codes are kept in
+    dated_hts_codes so past entries can still be priced. All mappings
+    are read-only, so any number of readers can share it.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        hts_codes: List[HTSRecord],
+        countries: List[CountryRecord],
+        rates: List[RateRecord],
+        data_version: int = 0
+    ):
+        """Index the records and build the search index, hierarchy and rollups."""
+        active_rates = [rate for rate in rates if rate.is_active]
+        # Inactive codes first, so an active row with the same code wins
+        dated_hts_codes = {
+            hts.hts_code: hts for hts in sorted(hts_codes, key=lambda h: bool(h.is_active))
+        }
+        hts_codes = [hts for hts in hts_codes if hts.is_active]
+        self.version = version
+        # Shared tariff data version the records were read at
+        self.data_version = data_version
+        self.loaded_at = datetime.utcnow()
+        self.hts_codes: Mapping[str, HTSRecord] = MappingProxyType(
+            {hts.hts_code: hts for hts in hts_codes}
+        )
+        self.dated_hts_codes: Mapping[str, HTSRecord] = MappingProxyType(dated_hts_codes)
+        self.countries: Mapping[str, CountryRecord] = MappingProxyType(
+            {country.code.upper(): country for country in countries}
+        )
+        self.rates: Mapping[Tuple[int, int], RateRecord] = MappingProxyType(
+            {(rate.hts_code_id, rate.country_id): rate for rate in active_rates}
+        )
+        self.rate_index = RateIntervalIndex(rates)
+        self.search_index = HTSSearchIndex(hts_codes)
+        self.hierarchy = HTSHierarchy(hts_codes, active_rates)
+        self.rollups: Mapping[str, List[Dict[str, Any]]] = MappingProxyType({
+            level: [
+                rollup_row(
+                    node.code, node.description if level == "chapter" else None,
+                    node.code_count, node.rate_count,
+                    node.min_rate, node.avg_rate, node.max_rate
+                )
+                for node in self.hierarchy.level_nodes(level)
+            ]
+            for level in ROLLUP_LEVELS
+        })
+        self.rollup_etags: Mapping[str, str] = MappingProxyType(
+            {level: rollup_etag(rows) for level, rows in self.rollups.items()}
+        )
+
+    def get_hts_code(self, hts_code: str, include_inactive: bool = False) -> Optional[HTSRecord]:
+        """Look up an HTS code, normalized like get_hts_code_by_code."""
+        codes = self.dated_hts_codes if include_inactive else self.hts_codes
+        return codes.get(str(hts_code).replace(".", "").zfill(10))
+
+    def get_country(self, country_code: str) -> Optional[CountryRecord]:
+        """Look up a country by ISO code."""
+        return self.countries.get(str(country_code).upper())
+
+    def get_rate(self, hts_code_id: int, country_id: int) -> Optional[RateRecord]:
+        """Look up the active rate for an HTS code and country."""
+        return self.rates.get((hts_code_id, country_id))
+
+    def rate_context(self, with_history: bool = False) -> Dict[str, Any]:
+        """Expose the snapshot in TariffCalculationEngine.load_rate_context form."""
+        return {
+            "hts_codes": self.dated_hts_codes if with_history else self.hts_codes,
+            "countries": self.countries,
+            "rates": self.rates,
+            "rate_index": self.rate_index
+        }
+
+
+class TariffSnapshotService:
+    """
+    Holds the current tariff snapshot and swaps in new versions.
+
+    Readers take the snapshot reference once and use it for the whole
+    request, so they never lock and never see a half-loaded schedule.
+    A committed change to HTS codes, countries or rates marks the snapshot
+    stale: readers then fall back to the database while a reload runs in
+    the background, and the rebuilt snapshot replaces the old one with a
+    single reference assignment.
+
+    Other workers learn of the change through a Redis counter, the shared
+    data version: the committing worker bumps it, and every worker
+    compares it with its snapshot's data_version at most once per
+    VERSION_CHECK_INTERVAL seconds of reads, reloading when it has moved.
+    """
+
+    DATA_VERSION_KEY = "tariff:data_version"
+    VERSION_CHECK_INTERVAL = 1.0
+
+    def __init__(self):
+        """Initialize without a snapshot; call reload() at startup."""
+        self._snapshot: Optional[TariffSnapshot] = None
+        self._version = 0
+        self._stale = False
+        self._changes = 0
+        self._unpublished = 0
+        self._checked_at = 0.0
+        self._reload_lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+        self._check_task: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> Optional[int]:
+        """Version of the loaded snapshot, or None before the first load."""
+        return self._snapshot.version if self._snapshot else None
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether tariff data changed since the snapshot was loaded."""
+        return self._stale
+
+    def mark_stale(self) -> None:
+        """
+        Stop serving the current snapshot until it has been reloaded.
+
+        Called after this process committed tariff changes; the background
+        reload first bumps the shared data version for the other workers.
+        """
+        self._stale = True
+        self._changes += 1
+        self._unpublished += 1
+        self._schedule_reload()
+
+    async def read_data_version(self) -> Optional[int]:
+        """Current shared data version, or None when Redis is unavailable."""
+        from core.database import get_cache
+
+        cache = get_cache()
+        if cache is None:
+            return None
+        return int(await cache.get(self.DATA_VERSION_KEY) or 0)
+
+    async def publish_change(self) -> Optional[int]:
+        """
+        Bump the shared data version so every worker reloads.
+
+        Returns:
+            The new data version, or None when Redis is unavailable
+        """
+        from core.database import get_cache
+
+        cache = get_cache()
+        if cache is None:
+            return None
+        return await cache.increment(self.DATA_VERSION_KEY)
+
+    def get(self, allow_stale: bool = False) -> Optional[TariffSnapshot]:
+        """
+        Get the current snapshot for reading.
+
+        Args:
+            allow_stale: Return a stale snapshot while it reloads, for
+                readers that must not fall back to the database
+
+        Returns:
+            The snapshot, or None if none is loaded or it is stale, in which
+            case callers should read from the database
+        """
+        if self._snapshot is not None:
+            now = time.monotonic()
+            if now - self._checked_at >= self.VERSION_CHECK_INTERVAL:
+                self._checked_at = now
+                self._schedule_version_check()
+        if self._stale and self._snapshot is not None:
+            self._schedule_reload()
+            if not allow_stale:
+                return None
+        return self._snapshot
+
+    async def reload(self, db: AsyncSession) -> TariffSnapshot:
+        """
+        Load the tariff schedule into a new snapshot and swap it in.
+
+        Args:
+            db: Database session
+
+        Returns:
+            The new snapshot
+        """
+        async with self._reload_lock:
+            # Changes committed while loading leave it stale after the swap;
+            # the version is read first, so a later bump triggers another reload
+            changes = self._changes
+            data_version = await self.read_data_version() or 0
+
+            # Inactive codes too, for pricing entries made before deactivation
+            hts_result = await db.execute(select(HTSCode))
+            hts_codes = [self._hts_record(hts) for hts in hts_result.scalars().all()]
+
+            country_result = await db.execute(select(Country))
+            countries = [self._country_record(c) for c in country_result.scalars().all()]
+
+            # Superseded versions too, for effective-dated lookups
+            rate_result = await db.execute(select(TariffRate))
+            rates = [self._rate_record(rate) for rate in rate_result.scalars().all()]
+
+            # Indexing runs off the event loop so requests keep being served
+            version = self._version + 1
+            snapshot = await asyncio.to_thread(
+                TariffSnapshot, version, hts_codes, countries, rates, data_version
+            )
+            self._version = version
+            self._snapshot = snapshot
+            self._stale = self._changes != changes
+            self._checked_at = time.monotonic()
+
+        logger.info(
+            f"Tariff snapshot v{version} loaded: {len(snapshot.hts_codes)} HTS codes, "
+            f"{len(snapshot.countries)} countries, {len(snapshot.rates)} rates"
+        )
+        return snapshot
+
+    def _schedule_reload(self) -> None:
+        """Start a background reload unless one is already running."""
+        if self._reload_task and not self._reload_task.done():
+            return
+        try:
+            self._reload_task = asyncio.get_running_loop().create_task(self._reload_in_background())
+        except RuntimeError:
+            pass  # No running loop; the next async caller will schedule it
+
+    async def _reload_in_background(self) -> None:
+        """
+        Publish local changes, then reload with a dedicated session until
+        current, keeping the old snapshot on failure.
+        """
+        from core.database import db_manager
+
+        try:
+            while self._unpublished or self._stale:
+                unpublished = self._unpublished
+                if unpublished:
+                    await self.publish_change()
+                    self._unpublished -= unpublished
+                async with db_manager.get_session() as session:
+                    await self.reload(session)
+        except Exception as e:
+            logger.error(f"Tariff snapshot reload failed: {e}")
+
+    def _schedule_version_check(self) -> None:
+        """Compare the shared data version with the snapshot's in the background."""
+        if self._check_task and not self._check_task.done():
+            return
+        try:
+            self._check_task = asyncio.get_running_loop().create_task(self._check_data_version())
+        except RuntimeError:
+            pass
+
+    async def _check_data_version(self) -> None:
+        """Mark the snapshot stale when another worker changed tariff data."""
+        try:
+            data_version = await self.read_data_version()
+        except Exception as e:
+            logger.warning(f"Tariff data version check failed: {e}")
+            return
+        snapshot = self._snapshot
+        if data_version is None or snapshot is None or data_version == snapshot.data_version:
+            return
+        logger.info(
+            f"Tariff data version moved to {data_version} "
+            f"(snapshot v{snapshot.version} has {snapshot.data_version}); reloading"
+        )
+        self._stale = True
+        self._schedule_reload()
+
+    @staticmethod
+    def _hts_record(hts: HTSCode) -> HTSRecord:
+        return HTSRecord(
+            id=hts.id,
+            hts_code=hts.hts_code,
+            description=hts.description,
+            brief_description=hts.brief_description,
+            chapter_description=hts.chapter_description,
+            unit_of_quantity=hts.unit_of_quantity,
+            hts_2=hts.hts_2,
+            hts_4=hts.hts_4,
+            hts_6=hts.hts_6,
+            hts_8=hts.hts_8,
+            effective_date=hts.effective_date,
+            is_active=hts.is_active
+        )
+
+    @staticmethod
+    def _country_record(country: Country) -> CountryRecord:
+        return CountryRecord(
+            id=country.id,
+            code=country.code,
+            name=country.name,
+            risk_level=country.risk_level,
+            trade_preferences=tuple(country.get_trade_preferences() or ())
+        )
+
+    @staticmethod
+    def _rate_record(rate: TariffRate) -> RateRecord:
+        return RateRecord(
+            hts_code_id=rate.hts_code_id,
+            country_id=rate.country_id,
+            mfn_rate=rate.mfn_rate,
+            specific_rate=rate.specific_rate,
+            fta_rate=rate.fta_rate,
+            gsp_rate=rate.gsp_rate,
+            antidumping_duty=rate.antidumping_duty,
+            countervailing_duty=rate.countervailing_duty,
+            effective_rate=rate.effective_rate,
+            total_duty_rate=rate.total_duty_rate,
+            effective_date=rate.effective_date,
+            is_active=rate.is_active
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get snapshot statistics."""
+        snapshot = self._snapshot
+        if not snapshot:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "version": snapshot.version,
+            "data_version": snapshot.data_version,
+            "stale": self._stale,
+            "loaded_at": snapshot.loaded_at.isoformat(),
+            "hts_code_count": len(snapshot.hts_codes),
+            "country_count": len(snapshot.countries),
+            "rate_count": len(snapshot.rates),
+            "rate_version_count": snapshot.rate_index.version_count,
+            "vocabulary_size": len(snapshot.search_index._vocabulary),
+            "rollup_sizes": {level: len(rows) for level, rows in snapshot.rollups.items()},
+            "hierarchy_nodes": len(snapshot.hierarchy)
+        }
+
+
+# Global instance
+tariff_snapshot_service = TariffSnapshotService()
+
+
+def _track_tariff_changes(session: Session, flush_context, instances) -> None:
+    """Remember that this transaction wrote tariff data."""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _WATCHED_MODELS):
+            session.info[_DIRTY_FLAG] = True
+            return
+
+
+def _mark_snapshot_stale(session: Session) -> None:
+    """Invalidate the snapshot once tariff changes are committed."""
+    if session.info.pop(_DIRTY_FLAG, False):
+        tariff_snapshot_service.mark_stale()
+
+
+def _discard_tariff_changes(session: Session) -> None:
+    session.info.pop(_DIRTY_FLAG, None)
+
+
+# Mark stale after commit, not flush, so a reload never reads pre-commit data
+event.listen(Session, "before_flush", _track_tariff_changes)
+event.listen(Session, "after_commit", _mark_snapshot_stale)
+event.listen(Session, "after_rollback", _discard_tariff_changes)
@@ -0,0 +1,294 @@
+"""
+Tariff Workbook Cache for ATLAS Enterprise
+Columnar NumPy copy of the local tariff workbook, memory-mapped on later loads.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the bundle layout changes; old bundles are then rebuilt
+CACHE_FORMAT_VERSION = 2
+
+_MANIFEST = "manifest.json"
+
+
+def _encode_value(value: Any) -> Any:
+    """A cell of a mixed-type column as JSON, tagging types JSON lacks."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else {"float": repr(value)}
+    if value is pd.NaT:
+        return {"nat": None}
+    if isinstance(value, pd.Timestamp):
+        return {"timestamp": value.isoformat()}
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"date": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"time": value.isoformat()}
+    if isinstance(value, pd.Timedelta):
+        return {"timedelta": value.value}
+    if isinstance(value, timedelta):
+        return {"timedelta": pd.Timedelta(value).value}
+    return str(value)
+
+
+def _decode_value(value: Any) -> Any:
+    """Inverse of _encode_value."""
+    if not isinstance(value, dict):
+        return value
+    (tag, payload), = value.items()
+    if tag == "float":
+        return float(payload)
+    if tag == "nat":
+        return pd.NaT
+    if tag == "timestamp":
+        return pd.Timestamp(payload)
+    if tag == "datetime":
+        return datetime.fromisoformat(payload)
+    if tag == "date":
+        return date.fromisoformat(payload)
+    if tag == "time":
+        return dt_time.fromisoformat(payload)
+    return pd.Timedelta(payload)
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TariffWorkbookCache:
+    """
+    One-time conversion of an Excel workbook into .npy column bundles.
+
+    A bundle lives in <cache_dir>/<workbook stem>-<sha256 prefix>/ with a
+    manifest and one file per column, so a changed workbook gets a new
+    bundle and the old one is removed. Numeric, boolean and datetime
+    columns are loaded with mmap_mode="r": the pages come from the OS
+    page cache and are shared by every uvicorn and Celery worker on the
+    host. Text columns are stored as fixed-width unicode arrays with a
+    null mask and turned back into Python strings in one vectorized pass;
+    columns mixing value types are stored as JSON with the non-JSON types
+    tagged. Nothing is pickled, so loading a bundle never runs code.
+
+    Bundles are written to a temporary directory and renamed into place,
+    so processes converting the same workbook at once never see a partial
+    bundle.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        """Initialize TariffWorkbookCache; the directory defaults to settings."""
+        self.cache_dir = Path(cache_dir or settings.tariff_cache_dir)
+        self.hits = 0
+        self.conversions = 0
+
+    def read_excel(
+        self,
+        workbook: Union[str, Path],
+        sheet_name: Optional[Union[int, str]] = 0
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """
+        Read a workbook like pd.read_excel, from its column bundle when one exists.
+
+        Blocking; async callers run it with asyncio.to_thread.
+
+        Args:
+            workbook: Path to the .xlsx file
+            sheet_name: Sheet position or name, or None for every sheet
+
+        Returns:
+            One DataFrame, or a dict of sheet name -> DataFrame for None
+        """
+        workbook = Path(workbook)
+        start = time.perf_counter()
+        bundle_dir = self.bundle_dir(workbook)
+
+        frames = self._read_bundle(bundle_dir)
+        if frames is not None:
+            self.hits += 1
+            logger.info(
+                f"Loaded {workbook.name} from column cache in "
+                f"{(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+        else:
+            frames = pd.read_excel(workbook, sheet_name=None)
+            try:
+                self._write_bundle(bundle_dir, frames)
+                self._remove_stale_bundles(workbook.stem, bundle_dir)
+                self.conversions += 1
+                logger.info(
+                    f"Converted {workbook.name} to column cache in "
+                    f"{(time.perf_counter() - start) * 1000:.0f}ms"
+                )
+            except OSError as e:
+                # A read-only or full disk only costs the speed-up
+                logger.warning(f"Could not write column cache for {workbook.name}: {e}")
+
+        if sheet_name is None:
+            return frames
+        if isinstance(sheet_name, int):
+            return list(frames.values())[sheet_name]
+        return frames[sheet_name]
+
+    def bundle_dir(self, workbook: Union[str, Path]) -> Path:
+        """
+        Directory of the workbook's current bundle.
+
+        Derived data (such as indexes) saved here is discarded together
+        with the bundle when the workbook changes.
+        """
+        workbook = Path(workbook)
+        return self.cache_dir / f"{workbook.stem}-{file_digest(workbook)[:24]}"
+
+    @staticmethod
+    def _manifest(bundle_dir: Path) -> Optional[Dict[str, Any]]:
+        """A bundle's manifest, or None if it is missing or from another format version."""
+        try:
+            manifest = json.loads((bundle_dir / _MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("format") == CACHE_FORMAT_VERSION else None
+
+    def _read_bundle(self, bundle_dir: Path) -> Optional[Dict[str, pd.DataFrame]]:
+        """Load a bundle, or None if it is missing or from another format version."""
+        manifest = self._manifest(bundle_dir)
+        if manifest is None:
+            return None
+
+        frames = {}
+        for sheet_index, sheet in enumerate(manifest["sheets"]):
+            sheet_dir = bundle_dir / f"sheet_{sheet_index}"
+            # Keyed by position until the end, in case labels repeat
+            columns = {
+                column_index: self._load_column(sheet_dir / f"col_{column_index}", column["kind"])
+                for column_index, column in enumerate(sheet["columns"])
+            }
+            frame = pd.DataFrame(columns, copy=False)
+            frame.columns = [column["name"] for column in sheet["columns"]]
+            frames[sheet["name"]] = frame
+        return frames
+
+    @staticmethod
+    def _load_column(path: Path, kind: str) -> np.ndarray:
+        if kind == "numeric":
+            return np.load(f"{path}.npy", mmap_mode="r", allow_pickle=False)
+        if kind == "text":
+            values = np.load(f"{path}.npy", mmap_mode="r", allow_pickle=False).astype(object)
+            values[np.load(f"{path}.mask.npy", allow_pickle=False)] = None
+            return values
+        cells = json.loads(Path(f"{path}.json").read_text(encoding="utf-8"))
+        values = np.empty(len(cells), dtype=object)
+        values[:] = [_decode_value(cell) for cell in cells]
+        return values
+
+    def _write_bundle(self, bundle_dir: Path, frames: Dict[str, pd.DataFrame]) -> None:
+        """Write every sheet to a temporary directory, then rename it into place."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.cache_dir / f".{bundle_dir.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        tmp_dir.mkdir()
+        try:
+            sheets = []
+            for sheet_index, (name, frame) in enumerate(frames.items()):
+                sheet_dir = tmp_dir / f"sheet_{sheet_index}"
+                sheet_dir.mkdir()
+                columns = []
+                for column_index, (column, series) in enumerate(frame.items()):
+                    kind = self._save_column(sheet_dir / f"col_{column_index}", series)
+                    columns.append({"name": self._json_name(column), "kind": kind})
+                sheets.append({"name": name, "rows": len(frame), "columns": columns})
+
+            (tmp_dir / _MANIFEST).write_text(json.dumps({
+                "format": CACHE_FORMAT_VERSION,
+                "sheets": sheets
+            }))
+            try:
+                tmp_dir.rename(bundle_dir)
+            except OSError:
+                # Another process finished the same bundle first
+                if self._manifest(bundle_dir) is not None:
+                    return
+                # A bundle written in an older format: replace it
+                shutil.rmtree(bundle_dir, ignore_errors=True)
+                try:
+                    tmp_dir.rename(bundle_dir)
+                except OSError:
+                    if self._manifest(bundle_dir) is None:
+                        raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _save_column(path: Path, series: pd.Series) -> str:
+        """Save one column; returns its kind (numeric, text or mixed)."""
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            np.save(f"{path}.npy", series.to_numpy(), allow_pickle=False)
+            return "numeric"
+
+        values = series.to_numpy(dtype=object)
+        mask = pd.isna(values)
+        present = values[~mask]
+        if all(isinstance(value, str) for value in present):
+            text = values.copy()
+            text[mask] = ""
+            np.save(f"{path}.npy", text.astype(str), allow_pickle=False)
+            np.save(f"{path}.mask.npy", mask, allow_pickle=False)
+            return "text"
+
+        Path(f"{path}.json").write_text(
+            json.dumps([_encode_value(value) for value in values]), encoding="utf-8"
+        )
+        return "mixed"
+
+    @staticmethod
+    def _json_name(column: Any) -> Any:
+        """Column labels from Excel are usually strings; anything else is stringified."""
+        return column if isinstance(column, (str, int, float, bool)) or column is None else str(column)
+
+    def _remove_stale_bundles(self, stem: str, current: Path) -> None:
+        """Delete bundles of earlier versions of the same workbook."""
+        for bundle_dir in self.cache_dir.glob(f"{stem}-*"):
+            if bundle_dir != current and bundle_dir.is_dir():
+                shutil.rmtree(bundle_dir, ignore_errors=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        bundles: List[str] = (
+            [p.name for p in self.cache_dir.iterdir() if p.is_dir() and not p.name.startswith(".")]
+            if self.cache_dir.exists() else []
+        )
+        return {
+            "cache_dir": str(self.cache_dir),
+            "bundles": bundles,
+            "hits": self.hits,
+            "conversions": self.conversions
+        }
+
+
+# Global instance
+tariff_workbook_cache = TariffWorkbookCache()
@@ -4,7 +4,9 @@ ChromaDB integration for document search and AI capabilities.
 """
 
 import asyncio
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import chromadb
@@ -17,10 +19,34 @@ from core.config import settings
 from core.logging import get_logger, log_business_event
 from models.document import Document, DocumentEmbedding
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from services.embedding_cache import embedding_cache
+from services.embedding_pipeline import EmbeddingBatch, EmbeddingPipeline
+from sqlalchemy import select, delete, insert, update, bindparam
 
 logger = get_logger(__name__)
 
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Model instance of a process-pool worker, loaded on its first batch
+_worker_embeddings = None
+
+
+def _create_embedding_model() -> HuggingFaceEmbeddings:
+    """HuggingFace embeddings (free alternative to OpenAI)."""
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    """Embed texts inside a process-pool worker."""
+    global _worker_embeddings
+    if _worker_embeddings is None:
+        _worker_embeddings = _create_embedding_model()
+    return _worker_embeddings.embed_documents(texts)
+
 
 class VectorService:
     """Service for vector operations and document embeddings using ChromaDB."""
@@ -31,6 +57,8 @@ class VectorService:
         self.chroma_client = None
         self.collection = None
         self._initialized = False
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.pipeline = EmbeddingPipeline(self.create_embeddings)
     
     async def initialize(self):
         """Initialize ChromaDB connection and embeddings."""
@@ -57,11 +85,14 @@ class VectorService:
             )
             
             # Initialize HuggingFace embeddings (free alternative to OpenAI)
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
+            self.embeddings = _create_embedding_model()
+            
+            if settings.embedding_process_pool:
+                # spawn: forking a process that has loaded torch can deadlock
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=settings.embedding_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
             
             self._initialized = True
             logger.info("VectorService initialized successfully with ChromaDB")
@@ -78,6 +109,9 @@ class VectorService:
         """
         Create embeddings for a list of texts.
         
+        Vectors are looked up in the persistent embedding cache first; only
+        texts missing from it are embedded, each distinct text once.
+        
         Args:
             texts: List of texts to embed
             metadatas: Optional metadata for each text
@@ -88,18 +122,91 @@ class VectorService:
         await self.initialize()
         
         try:
-            # Create embeddings using HuggingFace
-            embeddings = await asyncio.to_thread(
-                self.embeddings.embed_documents, texts
-            )
+            try:
+                cached = await asyncio.to_thread(embedding_cache.get_many, EMBEDDING_MODEL, texts)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+                cached = [None] * len(texts)
+            embeddings = [vector.tolist() if vector is not None else None for vector in cached]
+            hits = len(texts) - embeddings.count(None)
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, embeddings) if vector is None))
+            
+            if missing:
+                # Create embeddings using HuggingFace
+                if self._process_pool is not None:
+                    computed = await asyncio.get_running_loop().run_in_executor(
+                        self._process_pool, _embed_in_worker, missing
+                    )
+                else:
+                    computed = await asyncio.to_thread(
+                        self.embeddings.embed_documents, missing
+                    )
+                
+                try:
+                    await asyncio.to_thread(embedding_cache.put_many, EMBEDDING_MODEL, missing, computed)
+                except (OSError, ValueError) as e:
+                    # A read-only or full disk only costs the cache
+                    logger.warning(f"Could not write embedding cache: {e}")
+                
+                by_text = dict(zip(missing, computed))
+                embeddings = [
+                    vector if vector is not None else by_text[text]
+                    for text, vector in zip(texts, embeddings)
+                ]
             
-            logger.info(f"Created {len(embeddings)} embeddings")
+            logger.info(f"Created {len(embeddings)} embeddings ({hits} from cache)")
             return embeddings
             
         except Exception as e:
             logger.error(f"Error creating embeddings: {e}")
             raise
     
+    async def _write_embedding_batch(
+        self,
+        db: AsyncSession,
+        document_id: int,
+        batch: EmbeddingBatch,
+        replace: bool
+    ) -> None:
+        """
+        Bulk-write one embedded batch to ChromaDB and document_embeddings.
+        
+        Rows are flushed, not committed: the caller commits once the whole
+        run has been written, so a failed run leaves no rows behind.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        write = self.collection.upsert if replace else self.collection.add
+        await asyncio.to_thread(
+            write,
+            ids=batch.vector_ids,
+            embeddings=batch.embeddings,
+            metadatas=[
+                {**metadata, "document_id": document_id, "timestamp": timestamp}
+                for metadata in batch.metadatas
+            ],
+            documents=[text[:1000] for text in batch.texts]  # ChromaDB stores document text
+        )
+        
+        if replace:
+            await db.execute(
+                delete(DocumentEmbedding).where(DocumentEmbedding.vector_id.in_(batch.vector_ids))
+            )
+        # One multi-row INSERT per batch instead of an ORM object per chunk
+        await db.execute(
+            insert(DocumentEmbedding.__table__).values([
+                {
+                    "document_id": document_id,
+                    "vector_id": vector_id,
+                    "chunk_index": metadata.get("chunk_index", 0),
+                    "text_content": text,
+                    "embedding_model": EMBEDDING_MODEL,
+                    "metadata": metadata
+                }
+                for vector_id, text, metadata in zip(batch.vector_ids, batch.texts, batch.metadatas)
+            ])
+        )
+        await db.flush()
+    
     async def store_document_embeddings(
         self,
         db: AsyncSession,
@@ -110,6 +217,11 @@ class VectorService:
         """
         Store document embeddings in both database and ChromaDB.
         
+        Chunks go through the embedding pipeline, so batches are embedded
+        in parallel while earlier batches are being written. All chunks are
+        stored or none: rows are committed once at the end, and vectors
+        already added to ChromaDB are removed if the run fails.
+        
         Args:
             db: Database session
             document_id: Document ID
@@ -122,55 +234,34 @@ class VectorService:
         await self.initialize()
         
         try:
-            # Create embeddings
-            embeddings = await self.create_embeddings(text_chunks)
-            
-            # Prepare data for ChromaDB
-            vector_ids = []
-            chroma_ids = []
-            chroma_embeddings = []
-            chroma_metadatas = []
-            chroma_documents = []
-            
-            for i, (chunk, embedding, metadata) in enumerate(
-                zip(text_chunks, embeddings, chunk_metadatas)
-            ):
-                vector_id = f"doc_{document_id}_chunk_{i}_{datetime.utcnow().timestamp()}"
-                vector_ids.append(vector_id)
-                
-                # Prepare ChromaDB data
-                chroma_ids.append(vector_id)
-                chroma_embeddings.append(embedding)
-                chroma_metadatas.append({
-                    **metadata,
-                    "document_id": document_id,
-                    "chunk_index": i,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                chroma_documents.append(chunk[:1000])  # ChromaDB stores document text
-                
-                # Store in database
-                doc_embedding = DocumentEmbedding(
-                    document_id=document_id,
-                    vector_id=vector_id,
-                    chunk_index=i,
-                    text_content=chunk,
-                    embedding_model="sentence-transformers/all-MiniLM-L6-v2",
-                    metadata=metadata
+            timestamp = datetime.utcnow().timestamp()
+            vector_ids = [
+                f"doc_{document_id}_chunk_{i}_{timestamp}" for i in range(len(text_chunks))
+            ]
+            chunks = (
+                (vector_id, chunk, {**metadata, "chunk_index": i})
+                for i, (vector_id, chunk, metadata) in enumerate(
+                    zip(vector_ids, text_chunks, chunk_metadatas)
                 )
-                db.add(doc_embedding)
-            
-            # Add to ChromaDB collection
-            await asyncio.to_thread(
-                self.collection.add,
-                ids=chroma_ids,
-                embeddings=chroma_embeddings,
-                metadatas=chroma_metadatas,
-                documents=chroma_documents
             )
             
-            # Commit database changes
-            await db.commit()
+            written: List[str] = []
+            
+            async def write(batch: EmbeddingBatch) -> None:
+                written.extend(batch.vector_ids)
+                await self._write_embedding_batch(db, document_id, batch, replace=False)
+            
+            try:
+                stats = await self.pipeline.run(chunks, write)
+                await db.commit()
+            except Exception:
+                # The IDs are new, so removing them undoes the run in ChromaDB too
+                if written:
+                    try:
+                        await asyncio.to_thread(self.collection.delete, ids=written)
+                    except Exception as cleanup_error:
+                        logger.warning(f"Could not remove partial vectors of document {document_id}: {cleanup_error}")
+                raise
             
             logger.info(f"Stored {len(vector_ids)} embeddings for document {document_id}")
             
@@ -180,7 +271,8 @@ class VectorService:
                 details={
                     "document_id": document_id,
                     "chunk_count": len(vector_ids),
-                    "model": "sentence-transformers/all-MiniLM-L6-v2"
+                    "model": EMBEDDING_MODEL,
+                    "chunks_per_second": stats["chunks_per_second"]
                 }
             )
             
@@ -191,6 +283,158 @@ class VectorService:
             await db.rollback()
             raise
     
+    async def upsert_embeddings(
+        self,
+        db: AsyncSession,
+        document_id: int,
+        vector_ids: List[str],
+        text_chunks: List[str],
+        chunk_metadatas: List[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Embed chunks and write them under caller-chosen, stable vector IDs.
+        
+        Unlike store_document_embeddings, existing vectors with the same IDs
+        are replaced, as are their DocumentEmbedding rows, so re-ingesting
+        a chunk never duplicates it.
+        
+        Args:
+            db: Database session
+            document_id: Document ID
+            vector_ids: Vector ID for each chunk
+            text_chunks: List of text chunks
+            chunk_metadatas: Metadata for each chunk (chunk_index is read from it)
+            
+        Returns:
+            List of vector IDs
+        """
+        await self.initialize()
+        
+        try:
+            await self.pipeline.run(
+                zip(vector_ids, text_chunks, chunk_metadatas),
+                lambda batch: self._write_embedding_batch(db, document_id, batch, replace=True)
+            )
+            await db.commit()
+            
+            logger.info(f"Upserted {len(vector_ids)} embeddings for document {document_id}")
+            return vector_ids
+            
+        except Exception as e:
+            logger.error(f"Error upserting document embeddings: {e}")
+            await db.rollback()
+            raise
+    
+    async def get_vector_metadata(
+        self,
+        filter_metadata: Dict[str, Any]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the stored metadata of every vector matching a filter.
+        
+        Args:
+            filter_metadata: ChromaDB where filter
+            
+        Returns:
+            Dict of vector ID -> metadata
+        """
+        await self.initialize()
+        
+        result = await asyncio.to_thread(
+            self.collection.get,
+            where=filter_metadata,
+            include=['metadatas']
+        )
+        return {
+            vector_id: metadata or {}
+            for vector_id, metadata in zip(result['ids'], result['metadatas'])
+        }
+    
+    async def update_vector_metadata(
+        self,
+        db: AsyncSession,
+        vector_ids: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Update the metadata of stored vectors without re-embedding them.
+        
+        ChromaDB overwrites the given keys and keeps the others (such as
+        document_id); the matching DocumentEmbedding rows get the new
+        metadata and chunk_index.
+        
+        Args:
+            db: Database session
+            vector_ids: Vector IDs to update
+            metadatas: New metadata for each vector
+            
+        Returns:
+            Number of vectors updated
+        """
+        if not vector_ids:
+            return 0
+        await self.initialize()
+        
+        try:
+            await asyncio.to_thread(self.collection.update, ids=vector_ids, metadatas=metadatas)
+            table = DocumentEmbedding.__table__
+            await db.execute(
+                update(table)
+                .where(table.c.vector_id == bindparam("b_vector_id"))
+                .values(chunk_index=bindparam("b_chunk_index"), metadata=bindparam("b_metadata")),
+                [
+                    {
+                        "b_vector_id": vector_id,
+                        "b_chunk_index": metadata.get("chunk_index", 0),
+                        "b_metadata": metadata
+                    }
+                    for vector_id, metadata in zip(vector_ids, metadatas)
+                ]
+            )
+            await db.commit()
+            
+            logger.info(f"Updated metadata of {len(vector_ids)} vectors")
+            return len(vector_ids)
+            
+        except Exception as e:
+            logger.error(f"Error updating vector metadata: {e}")
+            await db.rollback()
+            raise
+    
+    async def delete_vectors(
+        self,
+        db: AsyncSession,
+        vector_ids: List[str]
+    ) -> int:
+        """
+        Delete vectors by ID from ChromaDB and their DocumentEmbedding rows.
+        
+        Args:
+            db: Database session
+            vector_ids: Vector IDs to delete
+            
+        Returns:
+            Number of vector IDs deleted
+        """
+        if not vector_ids:
+            return 0
+        await self.initialize()
+        
+        try:
+            await asyncio.to_thread(self.collection.delete, ids=vector_ids)
+            await db.execute(
+                delete(DocumentEmbedding).where(DocumentEmbedding.vector_id.in_(vector_ids))
+            )
+            await db.commit()
+            
+            logger.info(f"Deleted {len(vector_ids)} vectors")
+            return len(vector_ids)
+            
+        except Exception as e:
+            logger.error(f"Error deleting vectors: {e}")
+            await db.rollback()
+            raise
+    
     async def similarity_search(
         self,
         query: str,
@@ -383,14 +627,22 @@ class VectorService:
             return {
                 "total_vector_count": count,
                 "collection_name": settings.chroma_collection_name,
-                "embedding_model": "sentence-transformers/all-MiniLM-L6-v2",
-                "database_path": settings.chroma_db_path
+                "embedding_model": EMBEDDING_MODEL,
+                "database_path": settings.chroma_db_path,
+                "ingest_pipeline": self.pipeline.get_stats(),
+                "embedding_cache": embedding_cache.get_stats()
             }
             
         except Exception as e:
             logger.error(f"Error getting collection stats: {e}")
             return {}
     
+    async def close(self) -> None:
+        """Shut down the embedding process pool, if one was started."""
+        if self._process_pool is not None:
+            await asyncio.to_thread(self._process_pool.shutdown)
+            self._process_pool = None
+    
     def split_text(
         self,
         text: str,
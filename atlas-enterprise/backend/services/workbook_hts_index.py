@@ -0,0 +1,165 @@
+"""
+Workbook HTS Index for ATLAS Enterprise
+Sorted code -> (sheet, row) index over every sheet of the tariff workbook.
+"""
+
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Candidate HTS code columns, in the order a row's match is reported
+HTS_COLUMNS = ("HTS", "HTS_Code", "HS_Code", "Code", "hts", "hts_code")
+
+# Materialized row dicts kept for repeat lookups
+_RECORD_MEMO_SIZE = 4096
+
+_ARRAYS = ("codes", "sheets", "rows", "columns")
+
+
+def normalize_hts_code(code: Any) -> str:
+    """Strip the dots and spaces in an HTS code, as the sheet scan did."""
+    return str(code).replace(".", "").replace(" ", "")
+
+
+class WorkbookHTSIndex:
+    """
+    Normalized HTS code -> (sheet, row, column) index over a workbook.
+
+    Entries are kept as parallel arrays sorted by code, then sheet and
+    row, so a lookup is two binary searches. Each row appears once per
+    code, under the first of HTS_COLUMNS that holds it, which is the
+    order the original row scan reported matches in. The arrays are
+    saved as .npy files and memory-mapped when loaded again, and row
+    dicts are only built for rows that are actually returned.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], arrays: Dict[str, np.ndarray]):
+        """Wrap loaded sheets and their index arrays."""
+        self.frames = frames
+        self.sheet_names = list(frames)
+        self._codes = arrays["codes"]
+        self._sheets = arrays["sheets"]
+        self._rows = arrays["rows"]
+        self._columns = arrays["columns"]
+        self._records: "OrderedDict[Tuple[int, int], Dict[str, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @classmethod
+    def build(cls, frames: Dict[str, pd.DataFrame]) -> "WorkbookHTSIndex":
+        """Index every HTS code column of every sheet."""
+        parts = []
+        for sheet_index, frame in enumerate(frames.values()):
+            for column_index, column in enumerate(HTS_COLUMNS):
+                if column not in frame.columns:
+                    continue
+                values = frame[column]
+                present = values.notna().to_numpy()
+                codes = [normalize_hts_code(value) for value in values[present]]
+                if not codes:
+                    continue
+                parts.append(pd.DataFrame({
+                    "codes": codes,
+                    "sheets": sheet_index,
+                    "rows": np.flatnonzero(present),
+                    "columns": column_index
+                }))
+
+        if parts:
+            entries = (
+                pd.concat(parts, ignore_index=True)
+                .sort_values(["codes", "sheets", "rows", "columns"], kind="stable")
+                .drop_duplicates(["codes", "sheets", "rows"])
+            )
+            arrays = {
+                "codes": entries["codes"].to_numpy(dtype=str),
+                "sheets": entries["sheets"].to_numpy(dtype=np.int32),
+                "rows": entries["rows"].to_numpy(dtype=np.int64),
+                "columns": entries["columns"].to_numpy(dtype=np.int8)
+            }
+        else:
+            arrays = {
+                "codes": np.array([], dtype="U1"),
+                "sheets": np.array([], dtype=np.int32),
+                "rows": np.array([], dtype=np.int64),
+                "columns": np.array([], dtype=np.int8)
+            }
+        return cls(frames, arrays)
+
+    def save(self, directory: Path) -> None:
+        """Write the index arrays as .npy files, renaming the directory into place."""
+        tmp_dir = directory.with_name(f".{directory.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            for name, values in zip(_ARRAYS, (self._codes, self._sheets, self._rows, self._columns)):
+                np.save(tmp_dir / f"{name}.npy", values)
+            try:
+                tmp_dir.rename(directory)
+            except OSError:
+                # Another process saved the same index first
+                if not directory.exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: Path, frames: Dict[str, pd.DataFrame]) -> Optional["WorkbookHTSIndex"]:
+        """Memory-map saved index arrays; None if they are missing."""
+        try:
+            arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        except (OSError, ValueError):
+            return None
+        return cls(frames, arrays)
+
+    def _record(self, sheet_index: int, row: int) -> Dict[str, Any]:
+        """One row as load_tariff_data reports it (blanks as "")."""
+        key = (sheet_index, row)
+        record = self._records.get(key)
+        if record is None:
+            frame = self.frames[self.sheet_names[sheet_index]]
+            record = {}
+            for column_index, column in enumerate(frame.columns):
+                value = frame.iat[row, column_index]
+                if pd.isna(value):
+                    value = ""
+                elif isinstance(value, np.generic):
+                    value = value.item()
+                record[column] = value
+            self._records[key] = record
+            if len(self._records) > _RECORD_MEMO_SIZE:
+                self._records.popitem(last=False)
+        else:
+            self._records.move_to_end(key)
+        return record
+
+    def lookup(self, hts_code: str) -> List[Dict[str, Any]]:
+        """
+        Find every row holding an HTS code.
+
+        Args:
+            hts_code: HTS code (dots and spaces optional)
+
+        Returns:
+            Matches in sheet and row order, each with sheet, data and hts_code
+        """
+        code = normalize_hts_code(hts_code)
+        lo = int(np.searchsorted(self._codes, code, side="left"))
+        hi = int(np.searchsorted(self._codes, code, side="right"))
+
+        results = []
+        for i in range(lo, hi):
+            sheet_index, row = int(self._sheets[i]), int(self._rows[i])
+            record = self._record(sheet_index, row)
+            results.append({
+                "sheet": self.sheet_names[sheet_index],
+                "data": record,
+                "hts_code": str(record[HTS_COLUMNS[self._columns[i]]])
+            })
+        return results
@@ -3,12 +3,12 @@ Analytics Tasks for ATLAS Enterprise
 Background tasks for generating reports and calculating metrics.
 """
 
-import asyncio
 from typing import Dict, Any
 from datetime import datetime
 
 from .celery_app import celery_app
 from ..core.database import get_async_session
+from ..core.http_client import http_clients
 from ..core.logging import get_logger
 from ..services.analytics_service import analytics_service
 
@@ -43,7 +43,7 @@ def generate_daily_reports() -> Dict[str, Any]:
                     "generated_at": datetime.utcnow().isoformat()
                 }
         
-        result = asyncio.run(_generate_reports())
+        result = http_clients.run(_generate_reports())
         logger.info("Daily reports generated successfully")
         return result
         
@@ -75,7 +75,7 @@ def calculate_user_metrics() -> Dict[str, Any]:
                     "timestamp": datetime.utcnow().isoformat()
                 }
         
-        result = asyncio.run(_calculate_metrics())
+        result = http_clients.run(_calculate_metrics())
         return result
         
     except Exception as e:
@@ -3,12 +3,12 @@ Data Update Tasks for ATLAS Enterprise
 Background tasks for updating exchange rates and tariff data.
 """
 
-import asyncio
 from typing import Dict, Any
 from datetime import datetime
 
 from .celery_app import celery_app
 from ..core.database import get_async_session
+from ..core.http_client import http_clients
 from ..core.logging import get_logger
 from ..services.exchange_rate_service import ExchangeRateService
 
@@ -29,7 +29,7 @@ def update_exchange_rates_task() -> Dict[str, Any]:
                 result = await ExchangeRateService.update_exchange_rates(db)
                 return result
         
-        result = asyncio.run(_update_rates())
+        result = http_clients.run(_update_rates())
         
         if result["success"]:
             logger.info(f"Exchange rates updated: {result['updated_count']} rates")
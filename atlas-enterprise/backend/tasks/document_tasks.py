@@ -3,7 +3,6 @@ Document Processing Tasks for ATLAS Enterprise
 Background tasks for document processing and cleanup.
 """
 
-import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any
 from celery import current_task
@@ -11,6 +10,7 @@ from sqlalchemy import select, and_
 
 from .celery_app import celery_app
 from ..core.database import get_async_session
+from ..core.http_client import http_clients
 from ..core.logging import get_logger
 from ..services.document_processor import document_processor
 from ..models.document import Document
@@ -69,7 +69,7 @@ def process_document_async(
                 return result
         
         # Run async processing
-        result = asyncio.run(_process())
+        result = http_clients.run(_process())
         
         # Update final status
         if result["success"]:
@@ -150,7 +150,7 @@ def cleanup_old_documents(days_old: int = 90) -> Dict[str, Any]:
                     "cutoff_date": cutoff_date.isoformat()
                 }
         
-        result = asyncio.run(_cleanup())
+        result = http_clients.run(_cleanup())
         logger.info(f"Document cleanup completed: {result['deleted_count']} deleted, {result['failed_count']} failed")
         return result
         
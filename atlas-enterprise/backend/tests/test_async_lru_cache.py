@@ -0,0 +1,120 @@
+"""
+Tests for the single-flight async LRU cache.
+"""
+
+import asyncio
+
+import pytest
+
+import services.async_lru_cache as cache_module
+from services.async_lru_cache import AsyncLRUCache
+
+
+class SlowFetch:
+    """A fetch that waits for release() and counts its calls."""
+
+    def __init__(self, value="rate"):
+        self.value = value
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.released.wait()
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def make_cache(**kwargs):
+    options = {"max_entries": 10, "ttl_seconds": 60, "negative_ttl_seconds": 5}
+    options.update(kwargs)
+    return AsyncLRUCache(**options)
+
+
+async def test_concurrent_callers_share_one_fetch():
+    cache = make_cache()
+    fetch = SlowFetch()
+    callers = [asyncio.create_task(cache.get_or_fetch("k", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    fetch.released.set()
+
+    assert await asyncio.gather(*callers) == ["rate"] * 5
+    assert fetch.calls == 1
+    assert await cache.get_or_fetch("k", fetch) == "rate"
+    stats = cache.get_stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["in_flight"]) == (1, 4, 1, 0)
+
+
+async def test_cancelling_first_caller_keeps_fetch_for_others():
+    cache = make_cache()
+    fetch = SlowFetch()
+    first = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    await asyncio.sleep(0)
+    others = [asyncio.create_task(cache.get_or_fetch("k", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    fetch.released.set()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await asyncio.gather(*others) == ["rate"] * 3
+    assert fetch.calls == 1
+
+
+async def test_fetch_completes_when_every_caller_is_cancelled():
+    cache = make_cache()
+    fetch = SlowFetch()
+    caller = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    await asyncio.sleep(0)
+    caller.cancel()
+    fetch.released.set()
+    await asyncio.sleep(0.01)
+
+    assert await cache.get_or_fetch("k", fetch) == "rate"
+    assert fetch.calls == 1
+
+
+async def test_errors_are_shared_but_not_cached():
+    cache = make_cache()
+    fetch = SlowFetch(ConnectionError("upstream down"))
+    callers = [asyncio.create_task(cache.get_or_fetch("k", fetch)) for _ in range(2)]
+    await asyncio.sleep(0)
+    fetch.released.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert len(cache) == 0
+
+    fetch.value = "rate"
+    assert await cache.get_or_fetch("k", fetch) == "rate"
+    assert fetch.calls == 2
+
+
+async def test_negative_entries_and_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = make_cache()
+    fetch = SlowFetch(None)
+    fetch.released.set()
+
+    assert await cache.get_or_fetch("unknown", fetch) is None
+    assert await cache.get_or_fetch("unknown", fetch) is None
+    assert (fetch.calls, cache.negative_hits) == (1, 1)
+
+    now[0] += 6
+    assert await cache.get_or_fetch("unknown", fetch) is None
+    assert fetch.calls == 2
+
+
+def test_least_recently_used_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache._lookup("a") == (True, 1)
+    cache.set("c", 3)
+
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.evictions == 1
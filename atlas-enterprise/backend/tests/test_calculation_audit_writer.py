@@ -0,0 +1,93 @@
+"""
+Tests for the write-behind calculation audit writer.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from services.calculation_audit_writer import CalculationAuditWriter
+
+
+class FakeDatabase:
+    """Session factory recording the hts_code_id values of each committed batch."""
+
+    def __init__(self, fail_batches=()):
+        self.batches = []
+        self.fail_batches = set(fail_batches)
+
+    @asynccontextmanager
+    async def session(self):
+        database = self
+
+        class Session:
+            def __init__(self):
+                self.rows = []
+
+            async def execute(self, stmt):
+                params = stmt.compile().params
+                self.rows += [v for k, v in params.items() if k.startswith("hts_code_id")]
+
+            async def commit(self):
+                if len(database.batches) in database.fail_batches:
+                    database.fail_batches.discard(len(database.batches))
+                    raise RuntimeError("database unavailable")
+                database.batches.append(self.rows)
+
+        yield Session()
+
+
+def row(i):
+    return {"hts_code_id": i, "country_id": 1}
+
+
+async def test_stop_flushes_queued_rows():
+    database = FakeDatabase()
+    writer = CalculationAuditWriter(batch_size=4, flush_interval_ms=60_000, max_queue_size=100)
+    await writer.start(database.session)
+    for i in range(10):
+        await writer.enqueue(row(i))
+    await writer.stop()
+
+    assert database.batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert (writer.rows_written, writer.batches_written, writer.is_running) == (10, 3, False)
+
+
+async def test_partial_batch_is_flushed_after_interval():
+    database = FakeDatabase()
+    writer = CalculationAuditWriter(batch_size=100, flush_interval_ms=20, max_queue_size=100)
+    await writer.start(database.session)
+    await writer.enqueue(row(1))
+    await asyncio.sleep(0.2)
+
+    assert database.batches == [[1]]
+    await writer.stop()
+
+
+async def test_failed_batch_is_counted_and_writer_continues():
+    database = FakeDatabase(fail_batches={0})
+    writer = CalculationAuditWriter(batch_size=2, flush_interval_ms=60_000, max_queue_size=100)
+    await writer.start(database.session)
+    for i in range(4):
+        await writer.enqueue(row(i))
+    await writer.stop()
+
+    assert database.batches == [[2, 3]]
+    assert (writer.rows_written, writer.rows_failed) == (2, 2)
+
+
+async def test_full_queue_applies_backpressure():
+    database = FakeDatabase()
+    writer = CalculationAuditWriter(batch_size=1, flush_interval_ms=60_000, max_queue_size=2)
+    writer._session_factory = database.session
+    writer._queue = asyncio.Queue(maxsize=writer.max_queue_size)
+    await writer.enqueue(row(0))
+    await writer.enqueue(row(1))
+
+    blocked = asyncio.create_task(writer.enqueue(row(2)))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+
+    writer._task = asyncio.create_task(writer._run())
+    await asyncio.wait_for(blocked, 1)
+    await writer.stop()
+    assert [r for batch in database.batches for r in batch] == [0, 1, 2]
@@ -0,0 +1,144 @@
+"""
+Tests for the disk-backed embedding cache, including concurrent writers.
+"""
+
+import hashlib
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+import services.embedding_cache as embedding_cache_module
+from services.embedding_cache import EmbeddingCache
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DIM = 8
+
+
+def vector_for(text):
+    """A deterministic embedding, so any process can check what it reads."""
+    digest = hashlib.sha256(text.encode()).digest()
+    return np.frombuffer(digest[:DIM], dtype=np.uint8).astype(np.float32)
+
+
+def put(cache, texts):
+    return cache.put_many(MODEL, texts, [vector_for(text) for text in texts])
+
+
+def assert_cached(cache, texts):
+    vectors = cache.get_many(MODEL, texts)
+    for text, vector in zip(texts, vectors):
+        assert vector is not None, text
+        np.testing.assert_array_equal(vector, vector_for(text))
+
+
+def write_worker(cache_dir, worker, rounds):
+    """Append this worker's texts plus texts every worker writes."""
+    cache = EmbeddingCache(cache_dir, "float32", 10**6)
+    for k in range(rounds):
+        put(cache, [f"w{worker}-{k}-{j}" for j in range(10)] + [f"shared-{k}", f"shared-{k + 1}"])
+
+
+def test_hits_after_restart(tmp_path):
+    cache = EmbeddingCache(tmp_path, "float32", 100)
+    assert cache.get_many(MODEL, ["a", "b"]) == [None, None]
+    assert put(cache, ["a", "b", "a"]) == 2
+    assert put(cache, ["b", "c"]) == 1
+
+    restarted = EmbeddingCache(tmp_path, "float32", 100)
+    assert_cached(restarted, ["a", "b", "c"])
+    assert restarted.get_many(MODEL, ["d"]) == [None]
+    assert restarted.get_many("other-model", ["a"]) == [None]
+    stats = restarted.get_stats()
+    assert (stats["hits"], stats["misses"], stats["models"][MODEL]) == (3, 2, 3)
+
+
+def test_float16_store(tmp_path):
+    cache = EmbeddingCache(tmp_path, "float16", 100)
+    put(cache, ["a"])
+    (vector,) = EmbeddingCache(tmp_path, "float16", 100).get_many(MODEL, ["a"])
+    assert vector.dtype == np.float32
+    np.testing.assert_allclose(vector, vector_for("a"), rtol=1e-3)
+
+
+def test_torn_append_is_overwritten(tmp_path):
+    cache = EmbeddingCache(tmp_path, "float32", 100)
+    put(cache, ["a", "b"])
+    store = cache._store(MODEL)
+    # A writer died after part of its vectors and none of its keys
+    with open(store._vectors_path, "ab") as f:
+        f.write(b"\x00" * 13)
+
+    restarted = EmbeddingCache(tmp_path, "float32", 100)
+    put(restarted, ["c"])
+    assert_cached(EmbeddingCache(tmp_path, "float32", 100), ["a", "b", "c"])
+
+
+def test_stops_growing_at_max_rows(tmp_path):
+    cache = EmbeddingCache(tmp_path, "float32", 5)
+    assert put(cache, [f"t{i}" for i in range(8)]) == 5
+    assert put(cache, ["more"]) == 0
+    assert_cached(cache, [f"t{i}" for i in range(5)])
+    assert cache.get_many(MODEL, ["t5", "more"]) == [None, None]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    cache = EmbeddingCache(tmp_path, "float32", 100)
+    put(cache, ["a"])
+    with pytest.raises(ValueError):
+        cache.put_many(MODEL, ["b"], [[0.0] * (DIM + 1)])
+
+
+def test_concurrent_threads_and_instances(tmp_path):
+    caches = [EmbeddingCache(tmp_path, "float32", 10**6) for _ in range(2)]
+    errors = []
+
+    def work(worker):
+        cache = caches[worker % 2]
+        try:
+            for k in range(40):
+                texts = [f"t{worker}-{k}-{j}" for j in range(5)] + [f"shared-{k}"]
+                put(cache, texts)
+                assert_cached(cache, texts)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    texts = [f"t{w}-{k}-{j}" for w in range(6) for k in range(40) for j in range(5)]
+    texts += [f"shared-{k}" for k in range(40)]
+    fresh = EmbeddingCache(tmp_path, "float32", 10**6)
+    assert_cached(fresh, texts)
+    # Each text is stored once, however many writers offered it
+    assert fresh._store(MODEL).rows == len(texts)
+
+
+@pytest.mark.skipif(
+    embedding_cache_module.fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+    reason="cross-process locking needs fcntl and fork"
+)
+def test_concurrent_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=write_worker, args=(str(tmp_path), worker, 30))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    texts = [f"w{w}-{k}-{j}" for w in range(4) for k in range(30) for j in range(10)]
+    texts += [f"shared-{k}" for k in range(31)]
+    cache = EmbeddingCache(tmp_path, "float32", 10**6)
+    assert_cached(cache, texts)
+    store = cache._store(MODEL)
+    assert store.rows == len(texts)
+    assert store._vectors_path.stat().st_size == len(texts) * DIM * 4
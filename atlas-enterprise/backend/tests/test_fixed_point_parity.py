@@ -0,0 +1,194 @@
+"""
+Parity of the fixed-point landed-cost engine with the original Decimal engine.
+"""
+
+import random
+from decimal import Decimal, ROUND_HALF_UP
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from services.tariff_calculation_engine import TariffCalculationEngine
+
+MPF_RATE_FORMAL = Decimal("0.003464")
+MPF_MIN_FORMAL = Decimal("27.23")
+MPF_MAX_FORMAL = Decimal("528.33")
+MPF_INFORMAL = Decimal("2.22")
+HMF_RATE = Decimal("0.00125")
+
+
+def reference_costs(product_value, freight_cost, insurance_cost, other_costs,
+                    quantity, effective_rate, ad_rate, cvd_rate):
+    """The Decimal calculation calculate_landed_cost used before fixed point."""
+    def round_decimal(val):
+        return float(val.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+    product_val = Decimal(str(product_value))
+    freight_val = Decimal(str(freight_cost))
+    insurance_val = Decimal(str(insurance_cost))
+    other_val = Decimal(str(other_costs))
+
+    cif_value = product_val + freight_val + insurance_val
+    duty_amount = cif_value * Decimal(str(effective_rate / 100))
+    ad_amount = cif_value * Decimal(str(ad_rate / 100))
+    cvd_amount = cif_value * Decimal(str(cvd_rate / 100))
+
+    if cif_value < 2500:
+        mpf_amount = MPF_INFORMAL
+    else:
+        mpf_amount = min(max(cif_value * MPF_RATE_FORMAL, MPF_MIN_FORMAL), MPF_MAX_FORMAL)
+    hmf_amount = cif_value * HMF_RATE
+
+    total_landed_cost = (
+        product_val + freight_val + insurance_val + other_val +
+        duty_amount + ad_amount + cvd_amount + mpf_amount + hmf_amount
+    )
+    unit_price = product_val / Decimal(str(quantity))
+    unit_landed_cost = total_landed_cost / Decimal(str(quantity))
+    duty_percentage = (duty_amount / product_val * 100) if product_val > 0 else 0
+    total_additional_percentage = (
+        ((total_landed_cost - product_val) / product_val * 100) if product_val > 0 else 0
+    )
+
+    return {
+        "cif_value": round_decimal(cif_value),
+        "duty_amount": round_decimal(duty_amount),
+        "ad_amount": round_decimal(ad_amount),
+        "cvd_amount": round_decimal(cvd_amount),
+        "mpf_amount": round_decimal(mpf_amount),
+        "hmf_amount": round_decimal(hmf_amount),
+        "total_landed_cost": round_decimal(total_landed_cost),
+        "unit_price": round_decimal(unit_price),
+        "unit_landed_cost": round_decimal(unit_landed_cost),
+        "unit_additional_cost": round_decimal(unit_landed_cost - unit_price),
+        "duty_percentage": round_decimal(Decimal(duty_percentage)),
+        "total_additional_percentage": round_decimal(Decimal(total_additional_percentage))
+    }
+
+
+def random_inputs(rng: random.Random):
+    """One shipment with realistic magnitudes and decimal places."""
+    def money(high):
+        return round(rng.uniform(0, high), rng.choice([0, 1, 2, 2, 2, 3]))
+
+    return (
+        money(rng.choice([1000, 2600, 50_000, 5_000_000])),
+        money(5000),
+        money(500),
+        money(1000),
+        rng.choice([1, 2, 3, 6, 7, 12, 0.5, 2.5, round(rng.uniform(0.1, 1000), 2)]),
+        rng.choice([0.0, 2.5, 3.3, 6.5, 7.5, 16.5, 25.0, round(rng.uniform(0, 40), 2)]),
+        rng.choice([0.0, 0.0, 25.5, 100.5, round(rng.uniform(0, 300), 2)]),
+        rng.choice([0.0, 0.0, 3.1, 3.3, round(rng.uniform(0, 50), 2)])
+    )
+
+
+def tie_prone_inputs(rng: random.Random):
+    """Whole-dollar values over small quantities, where half-cent ties are common."""
+    return (
+        float(rng.randrange(1, 20_000)),
+        float(rng.choice([0, rng.randrange(0, 500)])),
+        0.0,
+        0.0,
+        rng.choice([3, 6, 7, 9, 11, 12]),
+        rng.choice([0.0, 2.5, 3.3, 6.5, 7.5]),
+        rng.choice([0.0, 25.5, 100.5]),
+        rng.choice([0.0, 3.1, 3.3])
+    )
+
+
+EDGE_CASES = [
+    # Half-cent tie in unit_additional_cost after 28-digit division
+    (2500, 0, 0, 0, 3, 6.5, 100.5, 3.3),
+    # CIF exactly at the informal MPF threshold, and just under it
+    (2500, 0, 0, 0, 1, 0.0, 0.0, 0.0),
+    (2499.99, 0, 0, 0, 1, 0.0, 0.0, 0.0),
+    # MPF clamped to its minimum and maximum
+    (3000, 0, 0, 0, 1, 5.0, 0.0, 0.0),
+    (500_000, 0, 0, 0, 1, 5.0, 0.0, 0.0),
+    # Rates whose shortest repr has many digits, amounts beyond 28 digits
+    (123456789012.34, 987.65, 12.3, 0, 7, 2.9, 0.0, 0.0),
+    (98765432.123, 1.1, 2.2, 3.3, 0.3, 2.9, 1.7, 0.1),
+    # No product value: percentages fall back to zero
+    (0, 100, 10, 0, 1, 5.0, 0.0, 0.0),
+]
+
+
+@pytest.mark.parametrize("inputs", EDGE_CASES)
+def test_compute_costs_edge_cases(inputs):
+    expected = reference_costs(*inputs)
+    actual = TariffCalculationEngine._compute_costs(*inputs)
+    assert {name: actual[name] for name in expected} == expected
+
+
+@pytest.mark.parametrize("generate, count", [(random_inputs, 20_000), (tie_prone_inputs, 100_000)])
+def test_compute_costs_matches_decimal_engine(generate, count):
+    rng = random.Random(20240101)
+    for _ in range(count):
+        inputs = generate(rng)
+        expected = reference_costs(*inputs)
+        actual = TariffCalculationEngine._compute_costs(*inputs)
+        assert {name: actual[name] for name in expected} == expected, inputs
+
+
+def test_compute_costs_decimal_matches_reference():
+    rng = random.Random(7)
+    for inputs in EDGE_CASES + [random_inputs(rng) for _ in range(2_000)]:
+        expected = reference_costs(*inputs)
+        actual = TariffCalculationEngine._compute_costs_decimal(*inputs)
+        assert {name: actual[name] for name in expected} == expected, inputs
+
+
+def test_vectorized_matches_decimal_engine():
+    rng = random.Random(42)
+    rows = (
+        EDGE_CASES +
+        [random_inputs(rng) for _ in range(20_000)] +
+        [tie_prone_inputs(rng) for _ in range(20_000)]
+    )
+    columns = [np.array(column, dtype=float) for column in zip(*rows)]
+
+    costs = TariffCalculationEngine._compute_costs_vectorized(*columns)
+
+    for i, inputs in enumerate(rows):
+        expected = reference_costs(*inputs)
+        for name, values in costs.items():
+            assert values[i] == expected[name], (inputs, name)
+
+
+def test_price_batch_matches_decimal_engine():
+    rng = random.Random(99)
+    rows = [random_inputs(rng) for _ in range(5_000)] + [tie_prone_inputs(rng) for _ in range(5_000)]
+    rate_rows = sorted({(row[5], row[6], row[7]) for row in rows})
+
+    hts_codes = {}
+    rates = {}
+    country = SimpleNamespace(id=1, code="CN")
+    for i, (effective, ad, cvd) in enumerate(rate_rows, start=1):
+        code = f"{i:010d}"
+        hts_codes[code] = SimpleNamespace(id=i, hts_code=code, effective_date=None, is_active=True)
+        rates[(i, 1)] = SimpleNamespace(
+            effective_rate=effective, antidumping_duty=ad, countervailing_duty=cvd
+        )
+    code_by_rates = {rate: f"{i:010d}" for i, rate in enumerate(rate_rows, start=1)}
+
+    result = TariffCalculationEngine.price_batch(
+        {"hts_codes": hts_codes, "countries": {"CN": country}, "rates": rates},
+        {"USD": 1.0},
+        [code_by_rates[(row[5], row[6], row[7])] for row in rows],
+        ["CN"] * len(rows),
+        [row[0] for row in rows],
+        quantities=[row[4] for row in rows],
+        freight_costs=[row[1] for row in rows],
+        insurance_costs=[row[2] for row in rows],
+        other_costs=[row[3] for row in rows]
+    )
+
+    assert result["failed_count"] == 0
+    columns = result["columns"]
+    for i, inputs in enumerate(rows):
+        expected = reference_costs(*inputs)
+        for name in ("cif_value", "duty_amount", "ad_amount", "cvd_amount", "mpf_amount",
+                     "hmf_amount", "total_landed_cost", "unit_price", "unit_landed_cost"):
+            assert columns[name][i] == expected[name], (inputs, name)
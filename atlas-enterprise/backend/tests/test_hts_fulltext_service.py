@@ -0,0 +1,144 @@
+"""
+Tests for HTSFullTextService, searching the FTS5 index built by the migration.
+"""
+
+import importlib.util
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from models.tariff import HTSCode
+from services.hts_fulltext_service import HTSFullTextService, build_fts5_query
+
+MIGRATION = Path(__file__).parent.parent / "migrations" / "versions" / "20261016_0001_hts_fulltext_index.py"
+
+HTS_ROWS = [
+    ("0101210010", "Horses", "Live horse, purebred breeding animal", True),
+    ("0101290010", "Other", "Live horses other than purebred, for slaughter", True),
+    ("0101300000", "Asses", "Live asses", True),
+    ("0102210010", "Cattle", "Live bovine animals, purebred breeding", True),
+    ("0102290000", "Horses", "Discontinued horse entry", False),
+    ("9503000010", "Toy horse", "Rocking horses and ride-on toys", True),
+]
+
+
+@asynccontextmanager
+async def hts_database():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with AsyncSession(engine) as session:
+        await session.execute(text(
+            "CREATE TABLE hts_codes (id INTEGER PRIMARY KEY, hts_code TEXT, "
+            "brief_description TEXT, description TEXT)"
+        ))
+        yield session
+    await engine.dispose()
+
+
+async def test_missing_index_is_reported_not_created():
+    service = HTSFullTextService()
+    async with hts_database() as db:
+        with pytest.raises(RuntimeError, match="alembic upgrade head"):
+            await service.check_index(db)
+
+        result = await db.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'hts_codes_fts%'"))
+        assert result.all() == []
+
+
+async def test_index_created_by_migration_is_accepted():
+    service = HTSFullTextService()
+    async with hts_database() as db:
+        await db.execute(text(
+            "CREATE VIRTUAL TABLE hts_codes_fts USING fts5("
+            "hts_code, brief_description, description, content='hts_codes', content_rowid='id')"
+        ))
+        await service.check_index(db)
+    assert service._index_ready
+
+
+def apply_migration(connection):
+    """Run the revision's upgrade() through Alembic, as 'alembic upgrade head' does."""
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    spec = importlib.util.spec_from_file_location("hts_fulltext_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with Operations.context(MigrationContext.configure(connection)):
+        migration.upgrade()
+
+
+@asynccontextmanager
+async def migrated_database(tmp_path):
+    pytest.importorskip("alembic")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'atlas.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(HTSCode.__table__.create)
+        # Rows inserted before the migration are backfilled by its 'rebuild'
+        await connection.execute(insert(HTSCode.__table__), [hts_row(*HTS_ROWS[0])])
+        await connection.run_sync(apply_migration)
+    async with AsyncSession(engine) as session:
+        # Rows inserted afterwards reach the index through the triggers
+        await session.execute(insert(HTSCode.__table__), [hts_row(*row) for row in HTS_ROWS[1:]])
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+def hts_row(hts_code, brief_description, description, is_active):
+    return {
+        "hts_code": hts_code,
+        "brief_description": brief_description,
+        "description": description,
+        "hts_2": hts_code[:2],
+        "hts_4": hts_code[:4],
+        "hts_6": hts_code[:6],
+        "hts_8": hts_code[:8],
+        "is_active": is_active
+    }
+
+
+async def search(db, query, chapter=None):
+    return [c.hts_code for c in await HTSFullTextService().search(db, query, chapter=chapter)]
+
+
+async def test_brief_description_matches_rank_first(tmp_path):
+    async with migrated_database(tmp_path) as db:
+        codes = await search(db, "horses")
+    # Both brief "horse" rows outrank the description-only match; inactive rows never show
+    assert sorted(codes[:2]) == ["0101210010", "9503000010"]
+    assert codes[2:] == ["0101290010"]
+
+
+async def test_porter_stemming(tmp_path):
+    async with migrated_database(tmp_path) as db:
+        assert await search(db, "horse") == await search(db, "horses")
+        assert sorted(await search(db, "breed")) == ["0101210010", "0102210010"]
+
+
+async def test_phrases_exclusions_and_chapter(tmp_path):
+    async with migrated_database(tmp_path) as db:
+        assert sorted(await search(db, '"purebred breeding"')) == ["0101210010", "0102210010"]
+        # Same words, wrong order: only the unquoted query matches
+        assert await search(db, '"slaughter purebred"') == []
+        assert await search(db, "slaughter purebred") == ["0101290010"]
+        assert await search(db, "live purebred -horse") == ["0102210010"]
+        assert await search(db, "live -horses -bovine") == ["0101300000"]
+        assert await search(db, "horses", chapter="95") == ["9503000010"]
+        assert await search(db, "-horses") == []
+
+
+async def test_migration_requires_the_hts_table(tmp_path):
+    pytest.importorskip("alembic")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'empty.db'}")
+    async with engine.begin() as connection:
+        with pytest.raises(RuntimeError, match="start the application once"):
+            await connection.run_sync(apply_migration)
+    await engine.dispose()
+
+
+def test_fts5_query_quotes_terms():
+    assert build_fts5_query('live "pure bred" -mules') == '"live" AND "pure bred" NOT "mules"'
+    assert build_fts5_query("-only") is None
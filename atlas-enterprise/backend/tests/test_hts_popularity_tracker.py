@@ -0,0 +1,162 @@
+"""
+Tests for the HTS popularity sketch and its shared state.
+
+Trackers sharing one fake cache stand in for workers; the fake applies
+update() atomically, as the WATCH/MULTI loop does against Redis.
+"""
+
+import math
+import random
+
+import pytest
+
+import core.database
+import services.hts_popularity_tracker as tracker_module
+from services.hts_popularity_tracker import HTSPopularityTracker
+
+NO_DECAY = 1e9  # Half-life in hours
+
+
+class FakeCache:
+    """The subset of CacheManager used by the tracker."""
+
+    def __init__(self):
+        self.values = {}
+        self.fail_updates = False
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def update(self, key, func, ttl=None):
+        if self.fail_updates:
+            return None
+        self.values[key] = func(self.values.get(key))
+        return self.values[key]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(core.database, "get_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the tracker module."""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(tracker_module.time, "time", lambda: now[0])
+    return now
+
+
+def code(i):
+    return f"{i:010d}"
+
+
+def zipf_stream(codes, events, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(codes)]
+    return rng.choices([code(i) for i in range(codes)], weights=weights, k=events)
+
+
+def test_estimates_never_undercount_and_stay_within_bound():
+    tracker = HTSPopularityTracker(width=512, depth=4, half_life_hours=NO_DECAY)
+    stream = zipf_stream(codes=2000, events=20000, seed=7)
+    tracker.record_many(stream)
+
+    truth = {}
+    for c in stream:
+        truth[c] = truth.get(c, 0) + 1
+    weight = tracker._weight(tracker_module.time.time())
+    # Count-min: error <= e/width * N with probability >= 1 - e**-depth per code
+    bound = math.e / tracker.width * len(stream)
+    over = 0
+    for c, count in truth.items():
+        columns = tracker_module._sketch_columns(c, tracker.depth, tracker.width)
+        estimate = tracker._sketch[tracker._rows, columns].min() / weight
+        assert estimate >= count - 1e-6
+        over += estimate - count > bound
+    assert over <= len(truth) * 2 * math.exp(-tracker.depth)
+
+
+def test_top_finds_heavy_hitters():
+    tracker = HTSPopularityTracker(width=2048, depth=4, capacity=50, half_life_hours=NO_DECAY)
+    tracker.record_many(zipf_stream(codes=5000, events=50000, seed=3))
+
+    top = [c for c, _ in tracker.top(5)]
+    assert top == [code(i) for i in range(5)]
+    scores = [score for _, score in tracker.top(50)]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_counts_decay_with_half_life(clock):
+    tracker = HTSPopularityTracker(half_life_hours=1)
+    tracker.record(code(1), count=8)
+    clock[0] += 3600
+    tracker.record(code(2), count=6)
+
+    assert dict(tracker.top(2)) == pytest.approx({code(1): 4.0, code(2): 6.0})
+    clock[0] += 7200
+    assert dict(tracker.top(2)) == pytest.approx({code(1): 1.0, code(2): 1.5})
+
+
+async def test_workers_merge_instead_of_overwriting(cache):
+    first = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    second = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    first.record(code(1), count=5)
+    second.record(code(2), count=3)
+
+    assert await first.persist()
+    assert await second.persist()
+    await first.load()
+
+    expected = {code(1): 5.0, code(2): 3.0}
+    assert dict(first.top(2)) == pytest.approx(expected)
+    assert dict(second.top(2)) == pytest.approx(expected)
+    assert cache.values[HTSPopularityTracker.STATE_KEY]["events"] == 8
+
+    # Saving again only adds new uses
+    first.record(code(2), count=4)
+    assert await first.persist()
+    await second.load()
+    assert dict(second.top(2)) == pytest.approx({code(1): 5.0, code(2): 7.0})
+
+
+async def test_unsaved_uses_survive_a_load(cache):
+    shared = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    shared.record(code(1), count=2)
+    await shared.persist()
+
+    tracker = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    tracker.record(code(3), count=4)
+    assert await tracker.load()
+
+    assert dict(tracker.top(2)) == pytest.approx({code(1): 2.0, code(3): 4.0})
+    assert tracker.get_stats()["unsaved_events"] == 4
+
+
+async def test_failed_save_keeps_pending_uses(cache):
+    tracker = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    tracker.record(code(1), count=3)
+
+    cache.fail_updates = True
+    assert not await tracker.persist()
+    assert tracker.get_stats()["unsaved_events"] == 3
+
+    cache.fail_updates = False
+    assert await tracker.persist()
+    assert tracker.get_stats()["unsaved_events"] == 0
+
+    reader = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    await reader.load()
+    assert dict(reader.top(1)) == pytest.approx({code(1): 3.0})
+
+
+async def test_ignores_state_of_another_layout(cache):
+    other = HTSPopularityTracker(width=1024, half_life_hours=NO_DECAY)
+    other.record(code(1))
+    await other.persist()
+
+    tracker = HTSPopularityTracker(half_life_hours=NO_DECAY)
+    assert not await tracker.load()
+    assert tracker.top(1) == []
@@ -0,0 +1,73 @@
+"""
+Tests for the in-memory HTS search index behind /hts/search.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services.hts_search_index import HTSSearchIndex
+
+
+def row(hts_code, description, brief_description=None):
+    return SimpleNamespace(hts_code=hts_code, description=description, brief_description=brief_description)
+
+
+@pytest.fixture
+def index():
+    return HTSSearchIndex([
+        row("0101210010", "Live horses, purebred breeding", "Horses"),
+        row("0101290010", "Live horses, other", "Horses"),
+        row("0101300000", "Asses"),
+        row("0101100010", "Live asses for breeding"),
+        row("0201100000", "Carcasses of bovine animals, fresh or chilled", "Beef 12-kg"),
+        row("8471300100", "Portable automatic data processing machines"),
+        row("8507600010", "Lithium-ion batteries, 12 volts"),
+    ])
+
+
+def ilike(index, query, chapter=None):
+    """The substring matches of the SQL path, in code order."""
+    needle = query.lower()
+    return [
+        c.hts_code for c in index.codes
+        if (not chapter or c.hts_code.startswith(chapter))
+        and any(needle in (field or "").lower() for field in (c.hts_code, c.description, c.brief_description))
+    ]
+
+
+def codes(results):
+    return [c.hts_code for c in results]
+
+
+def test_code_prefix_and_exact_match_first(index):
+    assert codes(index.search("0101")) == ["0101100010", "0101210010", "0101290010", "0101300000"]
+    assert codes(index.search("0101.21")) == ["0101210010"]
+    assert codes(index.search("0101290010"))[0] == "0101290010"
+
+
+def test_description_words_and_prefixes(index):
+    assert codes(index.search("live hor")) == ["0101210010", "0101290010"]
+    assert codes(index.search("12")) == ["0201100000", "8507600010"]
+    assert codes(index.search("breeding", chapter="1")) == ["0101100010", "0101210010"]
+
+
+@pytest.mark.parametrize("query", ["0110", "1100", "30010", "ive hor", "ion batt", "s, p", "bovine animals, fresh"])
+def test_substring_fallback_matches_ilike(index, query):
+    expected = ilike(index, query.replace(".", ""))
+    assert expected
+    assert codes(index.search(query)) == expected
+
+
+def test_substring_fallback_respects_chapter_and_limit(index):
+    assert codes(index.search("0110", chapter="01")) == ["0101100010"]
+    assert codes(index.search("0110", chapter="84")) == []
+    assert codes(index.search("0010", chapter="01")) == ilike(index, "0010", chapter="01")
+    assert len(index.search("0010", limit=2)) == 2
+
+
+def test_fallback_only_when_index_finds_nothing(index):
+    # "asses" is a word, so the carcasses row does not come back with it
+    assert codes(index.search("asses")) == ["0101100010", "0101300000"]
+    assert index.search("zebra") == []
+    assert HTSSearchIndex([]).search("0110") == []
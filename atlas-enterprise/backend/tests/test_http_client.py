@@ -0,0 +1,94 @@
+"""
+Tests for the per-loop, per-host HTTP client registry.
+"""
+
+import asyncio
+import http.server
+import threading
+
+import pytest
+
+from core.http_client import HTTPClientRegistry
+
+
+class OkHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled sockets stay open
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_repeated_runs_leave_no_open_clients(url):
+    registry = HTTPClientRegistry()
+    clients = []
+
+    async def task():
+        response = await registry.get(url)
+        clients.extend(entry.client for entry in registry._hosts.values())
+        return response.text
+
+    for _ in range(5):
+        assert registry.run(task()) == "ok"
+        assert registry._hosts == {}
+
+    assert len(clients) == 5
+    assert all(client.is_closed for client in clients)
+
+
+def test_repeated_asyncio_run_does_not_accumulate_clients(url):
+    registry = HTTPClientRegistry()
+
+    async def task():
+        await registry.get(url)
+        return len(registry._hosts)
+
+    # Without run(), a dead loop's entry is dropped rather than kept beside the new one
+    assert [asyncio.run(task()) for _ in range(5)] == [1] * 5
+    assert len(registry._hosts) == 1
+
+
+def test_close_only_touches_the_running_loop(url):
+    registry = HTTPClientRegistry()
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(registry.get(url))
+        ((owner, host), entry), = registry._hosts.items()
+        assert owner is loop
+
+        # Another loop's shutdown must neither close nor forget this client
+        asyncio.run(registry.close())
+        assert registry._hosts == {(loop, host): entry}
+        assert not entry.client.is_closed
+
+        loop.run_until_complete(registry.close())
+        assert registry._hosts == {}
+        assert entry.client.is_closed
+    finally:
+        loop.close()
+
+
+async def test_requests_on_one_loop_share_a_client(url):
+    registry = HTTPClientRegistry()
+    responses = await asyncio.gather(*(registry.get(url) for _ in range(10)))
+
+    assert [r.status_code for r in responses] == [200] * 10
+    (entry,) = registry._hosts.values()
+    assert entry.requests == 10
+    assert registry.get_stats()["hosts"]["127.0.0.1"]["requests"] == 10
+    await registry.close()
@@ -0,0 +1,72 @@
+"""
+Tests for the stable vector IDs of knowledge base entries.
+"""
+
+import copy
+
+from services.data_ingestion_service import DataIngestionService
+
+FAQ = [
+    {"question": "What is an HTS code?", "category": "basics"},
+    {"question": "How is duty calculated?", "category": "duty"},
+    {"id": 7, "question": "Renamed later", "answer": "..."},
+    {"answer": "An entry without a natural key"},
+    {"answer": "An entry without a natural key"}
+]
+
+
+def entries(file_name, data):
+    return {
+        vector_id: (text, metadata)
+        for vector_id, text, metadata in DataIngestionService._knowledge_entries(file_name, data)
+    }
+
+
+def test_ids_survive_inserts_and_removals():
+    before = entries("faq", FAQ)
+    changed = copy.deepcopy(FAQ)
+    changed.insert(0, {"question": "New first question"})
+    del changed[2]  # "How is duty calculated?"
+    after = entries("faq", changed)
+
+    assert len(before) == len(FAQ)
+    assert len(set(after) - set(before)) == 1
+    assert len(set(before) - set(after)) == 1
+    for vector_id in set(before) & set(after):
+        text, metadata = after[vector_id]
+        assert text == before[vector_id][0]
+        # Shifted entries keep their content hash, so they are not re-embedded
+        assert metadata["content_hash"] == before[vector_id][1]["content_hash"]
+
+    first = next(v for v, (_, m) in before.items() if m.get("question") == "What is an HTS code?")
+    assert (before[first][1]["item_index"], after[first][1]["item_index"]) == (0, 1)
+
+
+def test_id_prefers_the_entry_id():
+    before = entries("faq", FAQ)
+    changed = copy.deepcopy(FAQ)
+    changed[2]["question"] = "Renamed"
+    after = entries("faq", changed)
+
+    assert set(after) == set(before)
+    changed_ids = [
+        vector_id for vector_id, (_, metadata) in after.items()
+        if metadata["content_hash"] != before[vector_id][1]["content_hash"]
+    ]
+    assert len(changed_ids) == 1
+
+
+def test_duplicate_entries_get_distinct_ids():
+    ids = list(entries("faq", FAQ))
+    assert len(ids) == len(set(ids)) == len(FAQ)
+    assert all(vector_id.startswith("kb:faq:") for vector_id in ids)
+
+
+def test_entries_and_direct_dicts():
+    guide = entries("guide", {"entries": [{"title": "Classification"}, {"title": "Valuation"}]})
+    moved = entries("guide", {"entries": [{"title": "Valuation"}, {"title": "Classification"}]})
+    assert set(guide) == set(moved)
+
+    direct = entries("rules", {"de_minimis": 800})
+    assert list(direct) == ["kb:rules"]
+    assert direct["kb:rules"][1]["chunk_index"] == 0
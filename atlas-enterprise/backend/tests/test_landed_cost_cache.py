@@ -0,0 +1,145 @@
+"""
+Tests for landed-cost cache key versioning.
+
+Two TariffSnapshotService instances sharing one fake Redis stand in for
+two workers.
+"""
+
+from datetime import datetime
+
+import pytest
+
+import core.database
+import services.landed_cost_cache as landed_cost_module
+from services.landed_cost_cache import LandedCostCache
+from services.tariff_snapshot import TariffSnapshot, TariffSnapshotService
+
+REQUEST = ("0101.21.00.10", "cn", 1000.0, 10.0, 50.0, 5.0, 0.0, "usd")
+
+
+class FakeCache:
+    """The subset of CacheManager used by the cache and snapshot service."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.values[key] = value
+        return True
+
+    async def increment(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+def worker(data_version):
+    """A snapshot service holding a current snapshot read at data_version."""
+    service = TariffSnapshotService()
+    service._snapshot = TariffSnapshot(1, [], [], [], data_version)
+    service._checked_at = float("inf")  # No background version checks
+    return service
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(core.database, "get_cache", lambda: cache)
+    monkeypatch.setattr(landed_cost_module, "get_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def use_worker(monkeypatch):
+    def use(service):
+        monkeypatch.setattr(landed_cost_module, "tariff_snapshot_service", service)
+        return service
+    return use
+
+
+async def test_key_uses_snapshot_data_version(redis, use_worker):
+    cache = LandedCostCache()
+    redis.values[TariffSnapshotService.DATA_VERSION_KEY] = 4
+
+    use_worker(worker(3))
+    key = await cache.build_key(*REQUEST)
+
+    assert key.startswith("landed_cost:3:base:")
+
+
+async def test_stale_worker_does_not_write_under_new_version(redis, use_worker):
+    cache = LandedCostCache()
+    behind, current = worker(0), worker(1)
+    redis.values[TariffSnapshotService.DATA_VERSION_KEY] = 1
+
+    # The worker that has not noticed the change yet stores an old-rate result
+    use_worker(behind)
+    old_key = await cache.build_key(*REQUEST)
+    await cache.set(old_key, {"result": "old rates"})
+
+    use_worker(current)
+    new_key = await cache.build_key(*REQUEST)
+
+    assert new_key != old_key
+    assert await cache.get(new_key) is None
+
+
+async def test_stale_snapshot_keys_on_shared_version(redis, use_worker):
+    cache = LandedCostCache()
+    service = use_worker(worker(2))
+    service._schedule_reload = lambda: None  # Keep it stale
+    redis.values[TariffSnapshotService.DATA_VERSION_KEY] = 5
+
+    service.mark_stale()
+    key = await cache.build_key(*REQUEST)
+
+    assert key.startswith("landed_cost:5:")
+
+
+async def test_invalidate_bumps_version_before_returning(redis, use_worker):
+    cache = LandedCostCache()
+    use_worker(TariffSnapshotService())  # No snapshot: rates come from the database
+
+    before = await cache.build_key(*REQUEST)
+    assert await cache.invalidate() == 1
+    assert redis.values[TariffSnapshotService.DATA_VERSION_KEY] == 1
+    after = await cache.build_key(*REQUEST)
+
+    assert before.startswith("landed_cost:0:")
+    assert after.startswith("landed_cost:1:")
+
+
+async def test_key_normalizes_request(redis, use_worker):
+    cache = LandedCostCache()
+    use_worker(worker(0))
+
+    key = await cache.build_key(*REQUEST)
+    assert await cache.build_key("0101210010", "CN", 1000, 10, 50, 5, 0, "USD") == key
+    assert await cache.build_key("0101210010", "CN", 1000.01, 10, 50, 5, 0, "USD") != key
+    assert await cache.build_key(*REQUEST, as_of=datetime(2024, 1, 1)) != key
+
+
+async def test_counts_hits_and_misses(redis, use_worker):
+    cache = LandedCostCache()
+    use_worker(worker(0))
+    key = await cache.build_key(*REQUEST)
+
+    assert await cache.get(key) is None
+    await cache.set(key, {"result": {}})
+    assert await cache.get(key) == {"result": {}}
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 50.0)
+
+
+async def test_no_redis_disables_cache(monkeypatch, use_worker):
+    monkeypatch.setattr(core.database, "get_cache", lambda: None)
+    monkeypatch.setattr(landed_cost_module, "get_cache", lambda: None)
+    cache = LandedCostCache()
+    use_worker(worker(0))
+
+    assert await cache.build_key(*REQUEST) is None
+    assert await cache.get(None) is None
+    assert await cache.invalidate() is None
@@ -0,0 +1,56 @@
+"""
+Tests for reading and validating uploaded shipment manifests.
+"""
+
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from services.manifest_pricing_service import REQUIRED_COLUMNS, ManifestPricingService
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def xlsx_file(*rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def service():
+    return ManifestPricingService()
+
+
+@pytest.mark.parametrize("text, missing", [
+    ("HTS_Code,Country_Code,Product_Value\n0101210010,CN,100\n", []),
+    ("﻿hts_code, country_code ,product_value\n", []),
+    ("hts_code,product_value\n", ["country_code"]),
+    ("hts_code,quantity\n0101210010,2\n", ["country_code", "product_value"]),
+    ("", list(REQUIRED_COLUMNS)),
+])
+def test_csv_header_is_checked_without_data_rows(service, text, missing):
+    file = csv_file(text)
+    assert service.missing_columns(file, "manifest.csv") == missing
+    assert file.tell() == 0
+
+
+def test_excel_header_is_checked_without_data_rows(service):
+    assert service.missing_columns(xlsx_file(["HTS_Code", "Country_Code"]), "manifest.xlsx") == ["product_value"]
+    assert service.missing_columns(xlsx_file(["hts_code", "country_code", "product_value"]), "m.xlsx") == []
+    assert service.missing_columns(xlsx_file(), "manifest.xlsx") == list(REQUIRED_COLUMNS)
+
+
+def test_rows_are_keyed_by_normalized_header(service):
+    rows = list(service.iter_rows(csv_file(" HTS_Code ,Country_Code,Product_Value\n0101.21.00.10,cn,100\n"), "m.csv"))
+    assert rows == [{"hts_code": "0101.21.00.10", "country_code": "cn", "product_value": "100"}]
+
+    rows = list(service.iter_rows(xlsx_file(["HTS_Code", "Product_Value"], [101210010, 5], [None, None]), "m.xlsx"))
+    assert rows == [{"hts_code": 101210010, "product_value": 5}]
@@ -0,0 +1,113 @@
+"""
+Tests for RealTariffService lookups against USITC and the local workbook.
+"""
+
+import httpx
+import pandas as pd
+import pytest
+
+import services.real_tariff_service as real_tariff_module
+from services.real_tariff_service import RealTariffService
+
+
+class FakeUSITC:
+    """Stands in for http_clients.session(); answers from a status or raises."""
+
+    def __init__(self):
+        self.status = 200
+        self.error = None
+        self.calls = 0
+
+    def session(self, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def get(self, url, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        body = {"description": "Upstream product", "general_rate": 4.5}
+        return httpx.Response(self.status, json=body, request=httpx.Request("GET", url))
+
+
+@pytest.fixture
+def usitc(monkeypatch):
+    fake = FakeUSITC()
+    monkeypatch.setattr(real_tariff_module, "http_clients", fake)
+    return fake
+
+
+@pytest.fixture
+def service():
+    service = RealTariffService()
+    df = pd.DataFrame({
+        "hts8": ["01012100", "84713001", "84713099", "85171300"],
+        "brief_description": ["Horses", "Laptops", "Other computers", "Smartphones"],
+        "general_rate": [0.0, 2.5, 3.0, 0.0],
+        "special_rate": [0.0, 0.0, 1.0, 0.0],
+        "column_2_rate": [20.0, 35.0, 35.0, 35.0]
+    })
+    service._build_code_index(df)
+    service._build_token_index(df)
+    service._local_tariff_data = df
+    return service
+
+
+async def test_usitc_answer_is_cached(service, usitc):
+    first = await service.get_real_tariff_rate("9999.99.99")
+    second = await service.get_real_tariff_rate("9999.99.99")
+
+    assert first["source"] == second["source"] == "USITC"
+    assert first["general_rate"] == 4.5
+    assert usitc.calls == 1
+
+
+async def test_unknown_code_is_cached_as_miss(service, usitc):
+    usitc.status = 404
+    result = await service.get_real_tariff_rate("9999.99.99")
+    await service.get_real_tariff_rate("9999.99.99")
+
+    assert result["source"] == "Estimated"
+    assert usitc.calls == 1
+    assert service.cache.get_stats()["negative_hits"] == 1
+
+
+@pytest.mark.parametrize("failure", [{"status": 503}, {"error": httpx.ConnectTimeout("timed out")}])
+async def test_upstream_failure_is_not_cached(service, usitc, failure):
+    for name, value in failure.items():
+        setattr(usitc, name, value)
+
+    assert (await service.get_real_tariff_rate("9999.99.99"))["source"] == "Estimated"
+    # Codes the workbook knows still come back, without caching the outage
+    assert (await service.get_real_tariff_rate("8471.30.01"))["source"] == "Local Database"
+    assert len(service.cache) == 0
+
+    usitc.status, usitc.error = 200, None
+    assert (await service.get_real_tariff_rate("9999.99.99"))["source"] == "USITC"
+
+
+async def test_local_batch_matches_exact_prefix_and_miss(service, usitc):
+    rates = await service.get_local_tariff_rates(
+        ["8471.30.01", "84713050", "8517.13.00", "9999.99.99", "8471.30.01"]
+    )
+
+    assert list(rates) == ["8471.30.01", "84713050", "8517.13.00", "9999.99.99"]
+    assert rates["8471.30.01"]["description"] == "Laptops"
+    # No exact row: the first row under subheading 847130 answers
+    assert (rates["84713050"]["description"], rates["84713050"]["general_rate"]) == ("Laptops", 2.5)
+    assert rates["84713050"]["hts_code"] == "84713050"
+    assert rates["8517.13.00"]["source"] == "Local Database"
+    assert rates["9999.99.99"] is None
+    assert usitc.calls == 0
+
+
+async def test_local_batch_without_workbook_misses_everything():
+    service = RealTariffService()
+    service._local_tariff_data = pd.DataFrame()
+
+    assert await service.get_local_tariff_rates(["8471.30.01"]) == {"8471.30.01": None}
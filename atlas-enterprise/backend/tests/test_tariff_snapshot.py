@@ -0,0 +1,292 @@
+"""
+Tests for the tariff snapshot swap and staleness tracking.
+
+The database and Redis are replaced by in-memory fakes: the session
+answers select(Model) with the rows registered for that model, and the
+cache holds the shared data version counter.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import core.database
+from models.country import Country
+from models.tariff import HTSCode, TariffRate
+import services.tariff_calculation_engine as engine_module
+from services.tariff_calculation_engine import TariffCalculationEngine
+from services.tariff_snapshot import TariffSnapshotService
+
+
+class FakeCache:
+    """The subset of CacheManager used by the snapshot service."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def increment(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+
+class FakeSession:
+    """Answers select(Model) from a shared table of rows; can be made to fail."""
+
+    def __init__(self, tables, fail=False, on_execute=None):
+        self.tables = tables
+        self.fail = fail
+        self.on_execute = on_execute
+
+    async def execute(self, statement):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        if self.on_execute:
+            self.on_execute()
+        entity = statement.column_descriptions[0]["entity"]
+        return FakeResult(self.tables.get(entity, []))
+
+
+def hts_row(row_id, code, description="Live horses"):
+    return SimpleNamespace(
+        id=row_id,
+        hts_code=code,
+        description=description,
+        brief_description=description,
+        chapter_description="Live animals",
+        unit_of_quantity="No.",
+        hts_2=code[:2],
+        hts_4=code[:4],
+        hts_6=code[:6],
+        hts_8=code[:8],
+        effective_date=datetime(2024, 1, 1),
+        is_active=True
+    )
+
+
+def country_row(row_id, code):
+    return SimpleNamespace(
+        id=row_id,
+        code=code,
+        name=code,
+        risk_level="low",
+        get_trade_preferences=lambda: []
+    )
+
+
+def rate_row(hts_id, country_id, rate):
+    return SimpleNamespace(
+        hts_code_id=hts_id,
+        country_id=country_id,
+        mfn_rate=rate,
+        specific_rate=None,
+        fta_rate=None,
+        gsp_rate=None,
+        antidumping_duty=0.0,
+        countervailing_duty=0.0,
+        effective_rate=rate,
+        total_duty_rate=rate,
+        effective_date=datetime(2024, 1, 1),
+        is_active=True
+    )
+
+
+@pytest.fixture
+def tables():
+    return {
+        HTSCode: [hts_row(1, "0101210010"), hts_row(2, "0101290010", "Other horses")],
+        Country: [country_row(1, "CN"), country_row(2, "MX")],
+        TariffRate: [rate_row(1, 1, 5.0), rate_row(2, 2, 0.0)]
+    }
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(core.database, "get_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def sessions(monkeypatch, tables):
+    """Sessions handed out by db_manager for background reloads."""
+    state = SimpleNamespace(fail=False, opened=0)
+
+    @asynccontextmanager
+    async def get_session():
+        state.opened += 1
+        yield FakeSession(tables, fail=state.fail)
+
+    monkeypatch.setattr(core.database, "db_manager", SimpleNamespace(get_session=get_session))
+    return state
+
+
+@pytest.fixture
+def service():
+    return TariffSnapshotService()
+
+
+async def settle(service):
+    """Wait for the background version check and reload to finish."""
+    for _ in range(3):
+        for task in (service._check_task, service._reload_task):
+            if task is not None:
+                await task
+        await asyncio.sleep(0)
+
+
+async def test_reload_swaps_in_new_snapshot(service, cache, tables):
+    first = await service.reload(FakeSession(tables))
+    assert service.get() is first
+    assert first.version == 1
+    assert first.get_rate(1, 1).effective_rate == 5.0
+
+    tables[TariffRate][0] = rate_row(1, 1, 7.5)
+    second = await service.reload(FakeSession(tables))
+
+    assert service.get() is second
+    assert second.version == 2
+    assert second.get_rate(1, 1).effective_rate == 7.5
+    # Readers holding the old reference keep a consistent schedule
+    assert first.get_rate(1, 1).effective_rate == 5.0
+
+
+async def test_local_change_publishes_and_reloads(service, cache, sessions, tables):
+    old = await service.reload(FakeSession(tables))
+    assert old.data_version == 0
+
+    tables[TariffRate][0] = rate_row(1, 1, 9.0)
+    service.mark_stale()
+
+    assert service.is_stale
+    assert service.get() is None
+    assert service.get(allow_stale=True) is old
+
+    await settle(service)
+
+    assert cache.values[service.DATA_VERSION_KEY] == 1
+    assert not service.is_stale
+    snapshot = service.get()
+    assert snapshot.version == 2
+    assert snapshot.data_version == 1
+    assert snapshot.get_rate(1, 1).effective_rate == 9.0
+
+
+async def test_failed_reload_stays_stale(service, cache, sessions, tables):
+    old = await service.reload(FakeSession(tables))
+
+    sessions.fail = True
+    service.mark_stale()
+    await settle(service)
+
+    assert service.is_stale
+    assert service.get() is None
+    assert service.get(allow_stale=True) is old
+    with pytest.raises(RuntimeError):
+        await service.reload(FakeSession(tables, fail=True))
+    assert service.is_stale
+
+    sessions.fail = False
+    service.get()
+    await settle(service)
+
+    assert not service.is_stale
+    assert service.get().version == 2
+
+
+async def test_change_committed_during_reload_keeps_it_stale(service, cache, tables):
+    await service.reload(FakeSession(tables))
+
+    # A commit lands after the reload has started reading
+    session = FakeSession(tables, on_execute=service.mark_stale)
+    service._schedule_reload = lambda: None
+    snapshot = await service.reload(session)
+
+    assert service.get(allow_stale=True) is snapshot
+    assert service.is_stale
+    assert service.get() is None
+
+
+async def test_reload_when_another_worker_changes_data(service, cache, sessions, tables):
+    old = await service.reload(FakeSession(tables))
+
+    # Another process committed a change and bumped the shared version
+    tables[HTSCode].append(hts_row(3, "0102210010", "Purebred cattle"))
+    await cache.increment(service.DATA_VERSION_KEY)
+
+    # Within the check interval the snapshot is trusted as is
+    assert service.get() is old
+    await settle(service)
+    assert service._check_task is None
+
+    service._checked_at -= service.VERSION_CHECK_INTERVAL
+    assert service.get() is old
+    await settle(service)
+
+    snapshot = service.get()
+    assert snapshot is not old
+    assert snapshot.data_version == 1
+    assert snapshot.get_hts_code("0102.21.00.10") is not None
+    # Only the committing worker bumps the version
+    assert cache.values[service.DATA_VERSION_KEY] == 1
+
+
+async def test_unchanged_version_keeps_snapshot(service, cache, sessions, tables):
+    old = await service.reload(FakeSession(tables))
+    opened = sessions.opened
+
+    service._checked_at -= service.VERSION_CHECK_INTERVAL
+    service.get()
+    await settle(service)
+
+    assert service.get() is old
+    assert sessions.opened == opened
+
+
+async def test_deactivated_code_prices_past_entries_only(service, cache, tables, monkeypatch):
+    retired = hts_row(3, "0102210010", "Purebred cattle")
+    retired.is_active = False
+    tables[HTSCode].append(retired)
+    old_rate = rate_row(3, 1, 6.0)
+    old_rate.is_active = False
+    tables[TariffRate].append(old_rate)
+    snapshot = await service.reload(FakeSession(tables))
+    monkeypatch.setattr(engine_module, "tariff_snapshot_service", service)
+
+    # Current lookups, search and rollups only see active codes
+    assert snapshot.get_hts_code("0102210010") is None
+    assert snapshot.search_index.search("cattle") == []
+    assert snapshot.get_hts_code("0102210010", include_inactive=True).id == 3
+
+    hts_obj, _, rate = await TariffCalculationEngine._resolve_rate(None, "0102.21.00.10", "CN", datetime(2024, 6, 1))
+    assert (hts_obj.id, rate.effective_rate) == (3, 6.0)
+    with pytest.raises(ValueError, match="HTS code not found"):
+        await TariffCalculationEngine._resolve_rate(None, "0102.21.00.10", "CN")
+
+    result = TariffCalculationEngine.price_batch(
+        snapshot.rate_context(with_history=True), {"USD": 1.0},
+        ["0102210010"] * 3, ["CN"] * 3, [100.0] * 3,
+        as_of_dates=["2024-06-01", None, "2023-06-01"]
+    )
+    assert result["columns"]["tariff_rate"][0] == 6.0
+    assert result["columns"]["status"] == ["completed", "failed", "failed"]
+    assert [e["error"] for e in result["errors"]] == [
+        "HTS code not found: 0102210010",
+        "HTS code 0102210010 not in effect on 2023-06-01"
+    ]
@@ -0,0 +1,123 @@
+"""
+Tests for the .npy column bundles of TariffWorkbookCache.
+"""
+
+import json
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.tariff_workbook_cache import CACHE_FORMAT_VERSION, TariffWorkbookCache
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    frames = {
+        "Rates": pd.DataFrame({
+            "HTS": ["0101.21.00.10", "0101.29.00", None, "0102.21.00"],
+            "Rate": [0.0, 4.5, np.nan, 2.25],
+            "Units": [1, 2, 3, 4],
+            "Active": [True, False, True, True],
+            "Effective": pd.to_datetime(["2024-01-01", "2024-07-01", None, "2025-01-01"]),
+            "Notes": ["free", 12, 3.5, datetime(2024, 5, 1, 8, 30)]
+        }),
+        "Chapters": pd.DataFrame({"Chapter": [1, 2], "Title": ["Live animals", "Meat"]})
+    }
+    path = tmp_path / "tariff.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        for name, frame in frames.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return path
+
+
+def assert_same_frames(actual, expected):
+    assert list(actual) == list(expected)
+    for name in expected:
+        # Copied, as memory-mapped columns are np.memmap rather than ndarray
+        pd.testing.assert_frame_equal(
+            actual[name].copy(), expected[name], check_dtype=False, check_index_type=False
+        )
+        for column in expected[name]:
+            assert [type(v) for v in actual[name][column]] == [type(v) for v in expected[name][column]]
+
+
+def test_round_trip_matches_read_excel(tmp_path, workbook):
+    cache = TariffWorkbookCache(tmp_path / "cache")
+    expected = pd.read_excel(workbook, sheet_name=None)
+
+    converted = cache.read_excel(workbook, sheet_name=None)
+    loaded = cache.read_excel(workbook, sheet_name=None)
+
+    assert (cache.conversions, cache.hits) == (1, 1)
+    assert_same_frames(converted, expected)
+    assert_same_frames(loaded, expected)
+    pd.testing.assert_frame_equal(cache.read_excel(workbook, "Chapters").copy(), expected["Chapters"])
+    pd.testing.assert_frame_equal(cache.read_excel(workbook, 0).copy(), expected["Rates"], check_dtype=False)
+
+
+def test_numeric_columns_are_memory_mapped(tmp_path, workbook):
+    cache = TariffWorkbookCache(tmp_path / "cache")
+    cache.read_excel(workbook)
+    frame = cache.read_excel(workbook)
+
+    assert isinstance(cache._load_column(cache.bundle_dir(workbook) / "sheet_0" / "col_1", "numeric"), np.memmap)
+    assert frame["Rate"].iloc[1] == 4.5
+
+
+def test_mixed_columns_round_trip_without_pickle(tmp_path):
+    cache = TariffWorkbookCache(tmp_path / "cache")
+    values = [
+        "free", 7, 2.5, float("nan"), float("inf"), None, True,
+        datetime(2024, 1, 2, 3, 4, 5), pd.Timestamp("2024-06-30 12:00"),
+        date(2023, 12, 31), time(8, 15), pd.NaT, pd.Timedelta(hours=36), np.int64(9)
+    ]
+    frames = {"Sheet1": pd.DataFrame({"mixed": pd.Series(values, dtype=object)})}
+    bundle_dir = tmp_path / "cache" / "book-0"
+    cache._write_bundle(bundle_dir, frames)
+
+    manifest = json.loads((bundle_dir / "manifest.json").read_text())
+    assert manifest["sheets"][0]["columns"][0]["kind"] == "mixed"
+    for path in bundle_dir.rglob("*.npy"):
+        np.load(path, allow_pickle=False)
+
+    loaded = cache._read_bundle(bundle_dir)["Sheet1"]["mixed"].tolist()
+    assert loaded[:3] == ["free", 7, 2.5]
+    assert np.isnan(loaded[3]) and loaded[4] == float("inf") and loaded[5] is None
+    assert loaded[6] is True
+    assert loaded[7] == datetime(2024, 1, 2, 3, 4, 5) and type(loaded[7]) is datetime
+    assert loaded[8] == pd.Timestamp("2024-06-30 12:00") and isinstance(loaded[8], pd.Timestamp)
+    assert loaded[9] == date(2023, 12, 31) and loaded[10] == time(8, 15)
+    assert loaded[11] is pd.NaT
+    assert loaded[12] == pd.Timedelta(hours=36)
+    assert loaded[13] == 9 and type(loaded[13]) is int
+
+
+def test_bundle_of_older_format_is_replaced(tmp_path, workbook):
+    cache = TariffWorkbookCache(tmp_path / "cache")
+    cache.read_excel(workbook)
+    bundle_dir = cache.bundle_dir(workbook)
+    manifest_path = bundle_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["format"] = CACHE_FORMAT_VERSION - 1
+    manifest_path.write_text(json.dumps(manifest))
+
+    cache.read_excel(workbook)
+    assert json.loads(manifest_path.read_text())["format"] == CACHE_FORMAT_VERSION
+    cache.read_excel(workbook)
+
+    assert (cache.conversions, cache.hits) == (2, 1)
+
+
+def test_changed_workbook_replaces_bundle(tmp_path, workbook):
+    cache = TariffWorkbookCache(tmp_path / "cache")
+    cache.read_excel(workbook)
+    old_bundle = cache.bundle_dir(workbook)
+
+    pd.DataFrame({"HTS": ["0201.10.00"]}).to_excel(workbook, index=False)
+    frame = cache.read_excel(workbook)
+
+    assert frame["HTS"].tolist() == ["0201.10.00"]
+    assert not old_bundle.exists()
+    assert cache.get_stats()["bundles"] == [cache.bundle_dir(workbook).name]
@@ -0,0 +1,106 @@
+"""
+Tests for the sorted multi-sheet HTS index behind /data/tariff/{hts_code}.
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.workbook_hts_index import HTS_COLUMNS, WorkbookHTSIndex
+
+
+def scan(frames, hts_code):
+    """The row scan the index replaced."""
+    wanted = hts_code.replace(".", "").replace(" ", "")
+    results = []
+    for sheet_name, frame in frames.items():
+        for row in frame.fillna("").to_dict("records"):
+            for column in HTS_COLUMNS:
+                if column in row and str(row[column]).replace(".", "").replace(" ", "") == wanted:
+                    results.append({"sheet": sheet_name, "data": row, "hts_code": str(row[column])})
+                    break
+    return results
+
+
+def dotted(code):
+    return f"{code[:4]}.{code[4:6]}.{code[6:8]}.{code[8:]}"
+
+
+@pytest.fixture
+def frames():
+    rng = random.Random(11)
+    codes = [f"{rng.randrange(10**9, 10**10):010d}" for _ in range(60)]
+    rates = pd.DataFrame({
+        "HTS": [dotted(rng.choice(codes)) if rng.random() > 0.1 else None for _ in range(400)],
+        "Rate": [round(rng.random() * 20, 2) for _ in range(400)],
+        "Units": [rng.randrange(1, 5) for _ in range(400)]
+    })
+    # Two candidate columns: a row matches under the first that holds the code
+    aliases = pd.DataFrame({
+        "Code": [rng.choice(codes) for _ in range(200)],
+        "hts_code": [dotted(rng.choice(codes)) for _ in range(200)],
+        "Note": [rng.choice(["", "see chapter 99", None]) for _ in range(200)]
+    })
+    notes = pd.DataFrame({"Title": ["no HTS column here"]})
+    return {"Rates": rates, "Aliases": aliases, "Notes": notes}
+
+
+def test_lookup_matches_row_scan(frames):
+    index = WorkbookHTSIndex.build(frames)
+    queries = set()
+    for frame in (frames["Rates"]["HTS"], frames["Aliases"]["hts_code"]):
+        queries |= set(frame.dropna())
+    queries |= {"0000000000", "12", "9999.99.99.99"}
+
+    for query in sorted(queries):
+        for spelling in (query, query.replace(".", ""), query.replace(".", " ")):
+            assert index.lookup(spelling) == scan(frames, spelling)
+
+
+def test_index_is_sorted_for_binary_search(frames):
+    index = WorkbookHTSIndex.build(frames)
+    codes = np.asarray(index._codes)
+    assert (codes[:-1] <= codes[1:]).all()
+    # One entry per distinct code of a row, whichever column holds it
+    aliases = frames["Aliases"]
+    alias_entries = sum(
+        len({code.replace(".", "") for code in pair})
+        for pair in zip(aliases["Code"], aliases["hts_code"])
+    )
+    assert len(index) == frames["Rates"]["HTS"].notna().sum() + alias_entries
+
+
+def test_saved_index_is_memory_mapped(tmp_path, frames):
+    built = WorkbookHTSIndex.build(frames)
+    built.save(tmp_path / "hts_index")
+    loaded = WorkbookHTSIndex.load(tmp_path / "hts_index", frames)
+
+    assert isinstance(loaded._codes, np.memmap)
+    code = frames["Aliases"]["Code"].iloc[0]
+    assert loaded.lookup(code) == built.lookup(code) == scan(frames, code)
+    assert WorkbookHTSIndex.load(tmp_path / "missing", frames) is None
+
+
+def test_records_use_plain_values_and_blanks():
+    frames = {"Rates": pd.DataFrame({
+        "HTS": ["0101.21.00.10"],
+        "Rate": [np.nan],
+        "Units": np.array([3], dtype=np.int64)
+    })}
+    index = WorkbookHTSIndex.build(frames)
+    (match,) = index.lookup("0101210010")
+
+    assert match == {
+        "sheet": "Rates",
+        "data": {"HTS": "0101.21.00.10", "Rate": "", "Units": 3},
+        "hts_code": "0101.21.00.10"
+    }
+    assert type(match["data"]["Units"]) is int
+
+
+def test_empty_workbook():
+    index = WorkbookHTSIndex.build({"Sheet1": pd.DataFrame({"Title": ["x"]})})
+    assert len(index) == 0
+    assert index.lookup("0101210010") == []